@@ -415,6 +415,39 @@ app.post('/api/auth/login', authLimiter, async (req, res) => {
   }
 });
 
+// Tests en cours par utilisateur (échéance en ms) : les panneaux de solution
+// des visuels sont refusés tant qu'un test n'est ni soumis ni expiré
+const activeTests = new Map();
+
+const isTestInProgress = (user) => {
+  const expiresAt = activeTests.get(user.userId);
+  if (expiresAt && expiresAt <= Date.now()) {
+    activeTests.delete(user.userId);
+  }
+  return Boolean(expiresAt && expiresAt > Date.now());
+};
+
+// Vrai si la question (« Q<questionIndex> ») figure dans un test soumis par l'utilisateur
+const hasCompletedQuestion = async (user, questionId) => {
+  const match = /^Q(\d+)$/.exec(String(questionId || ''));
+  if (!match) {
+    return false;
+  }
+  const questionIndex = parseInt(match[1]);
+  const owner = user.role === 'demo'
+    ? await User.findOne({ email: 'demo@testiq.app' })
+    : await User.findById(user.userId);
+  if (!owner) {
+    return false;
+  }
+  // Anciennes réponses sans questionIndex : identifiées par l'ObjectID de la question
+  const question = await Question.findOne({ questionIndex }, '_id');
+  const legacyId = question ? question._id.toString() : null;
+  return owner.testHistory.some(test => (test?.answers || []).some(answer =>
+    answer && (answer.questionIndex === questionIndex || (legacyId && answer.questionId === legacyId))
+  ));
+};
+
 // Routes des tests (protégées)
 app.post('/api/tests/start', authenticateToken, async (req, res) => {
   try {
@@ -474,6 +507,9 @@ app.post('/api/tests/start', authenticateToken, async (req, res) => {
       return res.status(404).json({ error: 'Aucune question trouvée pour ce type de test' });
     }
     
+    const timeLimit = questions.reduce((total, q) => total + (q.timeLimit || 60), 0);
+    activeTests.set(req.user.userId, Date.now() + timeLimit * 1000);
+    
     res.json({ questions });
   } catch (error) {
     console.error('Erreur lors du démarrage du test:', error);
@@ -594,6 +630,7 @@ app.post('/api/tests/submit', authenticateToken, async (req, res) => {
     if (!updatedUser) {
       return res.status(404).json({ error: 'Utilisateur non trouvé' });
     }
+    activeTests.delete(req.user.userId);
     
     if (isDemoMode) {
       console.log('🎭 Mode démo : test sauvegardé en BD démo');
@@ -1462,9 +1499,18 @@ app.post('/api/explanation', authenticateToken, async (req, res) => {
 // Route pour générer des visuels professionnels
 app.post('/api/visual', authenticateToken, async (req, res) => {
   try {
-    const { questionId, questionContent, category } = req.body;
+    const { questionId, questionContent, category, panel = 'stem' } = req.body;
     console.log(`🎨 Demande de visuel pour questionId: ${questionId}, contenu: "${questionContent?.substring(0, 50)}..."`);
     
+    // La solution n'est rendue que sur demande explicite (revue)
+    if (!visualService.isValidPanel(panel)) {
+      return res.status(400).json({ success: false, error: `Panneau inconnu: ${panel}` });
+    }
+    // ... et seulement pour une question d'un test terminé, hors test en cours
+    if (panel !== 'stem' && (isTestInProgress(req.user) || !(await hasCompletedQuestion(req.user, questionId)))) {
+      return res.status(403).json({ success: false, error: 'Solution disponible après la fin du test' });
+    }
+    
     const questionData = {
       content: questionContent,
       category: category || 'general'
@@ -1480,7 +1526,7 @@ app.post('/api/visual', authenticateToken, async (req, res) => {
     }
     
     // Générer le visuel via Python
-    const visualBase64 = await visualService.generateVisual(questionId, questionData);
+    const visualBase64 = await visualService.generateVisual(questionId, questionData, panel);
     
     if (visualBase64) {
       console.log(`✅ Visuel généré pour ${questionId}`);
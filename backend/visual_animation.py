@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+🎞️ VISUELS ANIMÉS TESTIQ (APNG / WebP)
+=====================================
+
+Animations recommandées par analyze_visual_needs.get_visual_recommendation :
+rotation de la matrice, transformations 3D/4D, construction des suites.
+
+Le fond statique (grille, titres, légendes) est rendu une seule fois puis
+recopié (blit) à chaque image ; seuls les artistes mobiles sont redessinés.
+Une animation coûte ainsi à peu près un rendu statique plus de petits deltas.
+
+Comme pour les visuels statiques, la matrice avec rotation a un volet
+énoncé (seules les cases connues s'animent, la case « ? » reste fermée)
+et un volet solution/explication (la flèche manquante pivote).
+"""
+
+import base64
+import io
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.patches import FancyBboxPatch, Polygon
+from PIL import Image
+
+from visual_generator import (RENDER_CONTEXT, STEM_PANEL, VISUAL_PANELS, VisualConfig,
+                              VisualGenerator)
+from visual_themes import DEFAULT_THEME, get_theme
+
+@dataclass(frozen=True)
+class AnimationProfile:
+    """Nombre d'images, cadence et taille d'une animation"""
+    frames: int = 24
+    fps: int = 24
+    width: float = 6.0
+    height: float = 4.5
+    dpi: int = 80
+    palette: bool = True  # palette partagée entre images (fichiers plus petits)
+
+ANIMATION_PROFILES = {
+    'preview': AnimationProfile(frames=12, fps=12, width=4.0, height=3.0, dpi=60),
+    'standard': AnimationProfile(),
+    'hd': AnimationProfile(frames=48, fps=30, width=8.0, height=6.0, dpi=120)
+}
+
+ANIMATION_FORMATS = {
+    'apng': ('PNG', 'image/png'),
+    'webp': ('WEBP', 'image/webp')
+}
+
+# Arêtes d'un hypercube : sommets qui diffèrent d'un seul bit
+TESSERACT_VERTICES = np.array([[(i >> bit) & 1 for bit in range(4)] for i in range(16)], dtype=float) * 2 - 1
+TESSERACT_EDGES = np.array([(i, i | (1 << bit)) for i in range(16) for bit in range(4)
+                            if not i & (1 << bit)])
+CUBE_VERTICES = TESSERACT_VERTICES[:8, :3]
+CUBE_EDGES = np.array([(i, i | (1 << bit)) for i in range(8) for bit in range(3)
+                       if not i & (1 << bit)])
+
+def _rotation(dim: int, axis_a: int, axis_b: int, angle: float) -> np.ndarray:
+    """Matrice de rotation dans le plan (axis_a, axis_b)"""
+    matrix = np.eye(dim)
+    cos_a, sin_a = np.cos(angle), np.sin(angle)
+    matrix[[axis_a, axis_b], [axis_a, axis_b]] = cos_a
+    matrix[axis_a, axis_b], matrix[axis_b, axis_a] = -sin_a, sin_a
+    return matrix
+
+class AnimatedVisualGenerator(VisualGenerator):
+    """Générateur de visuels animés, mêmes couleurs (et thèmes) que VisualGenerator"""
+
+    def __init__(self, config: VisualConfig = None, profile: str = 'standard', fmt: str = 'apng',
+                 theme: str = DEFAULT_THEME):
+        self.theme = get_theme(theme)
+        super().__init__(self.theme.configure(config or VisualConfig()))
+        self.profile = ANIMATION_PROFILES[profile]
+        self.fmt = fmt
+
+    def animate_matrix_rotation(self, question_data: Dict, panel: str = STEM_PANEL) -> str:
+        """
+        Matrice 2×2. Énoncé : les cases connues s'allument tour à tour, la
+        case manquante reste un « ? ». Solution / explication : la flèche
+        manquante pivote de 90° dans le sens horaire.
+        """
+        fig, ax = self._new_figure('🔄 Rotation 90° Horaire')
+
+        for i in range(3):
+            ax.plot([0, 2], [i, i], color=self.config.ink_color, linewidth=2)
+            ax.plot([i, i], [0, 2], color=self.config.ink_color, linewidth=2)
+        known_cells = [(0.5, 1.5, '↗', self.config.accent_color),
+                       (1.5, 1.5, '↓', self.config.accent_color),
+                       (0.5, 0.5, '↑', self.config.success_color)]
+        for x, y, symbol, color in known_cells:
+            ax.text(x, y, symbol, ha='center', va='center', fontsize=28,
+                    fontweight='bold', color=color)
+        ax.add_patch(FancyBboxPatch((1.2, 0.2), 0.6, 0.6, boxstyle="round,pad=0.1",
+                                    facecolor=self.config.error_color, alpha=0.15,
+                                    edgecolor=self.config.error_color, linewidth=2))
+        ax.set_xlim(-0.1, 2.1)
+        ax.set_ylim(-0.1, 2.1)
+
+        if panel == STEM_PANEL:
+            ax.text(1.5, 0.5, '?', ha='center', va='center', fontsize=28,
+                    fontweight='bold', color=self.config.error_color)
+            highlight = FancyBboxPatch((0.2, 1.2), 0.6, 0.6, boxstyle="round,pad=0.1",
+                                       facecolor=self.config.warning_color, alpha=0.0,
+                                       edgecolor=self.config.warning_color, linewidth=3)
+            ax.add_patch(highlight)
+
+            def update_stem(t: float):
+                # Parcours des cases connues dans l'ordre de lecture, une pulsation par case
+                position = min(t * len(known_cells), len(known_cells) - 1e-9)
+                x, y = known_cells[int(position)][:2]
+                highlight.set_x(x - 0.3)
+                highlight.set_y(y - 0.3)
+                highlight.set_alpha(0.35 * np.sin(np.pi * (position - int(position))))
+
+            return self._encode_animation(fig, [highlight], update_stem)
+
+        # Flèche (polygone) partant de ↑, plus l'arc parcouru
+        arrow_shape = np.array([[-0.05, -0.25], [0.05, -0.25], [0.05, 0.08], [0.12, 0.08],
+                                [0.0, 0.25], [-0.12, 0.08], [-0.05, 0.08]])
+        center = np.array([1.5, 0.5])
+        arrow = Polygon(arrow_shape + center, closed=True, color=self.config.error_color)
+        ax.add_patch(arrow)
+        arc, = ax.plot([], [], color=self.config.warning_color, linewidth=3)
+
+        def update(t: float):
+            angle = -np.pi / 2 * t
+            arrow.set_xy(arrow_shape @ _rotation(2, 0, 1, angle).T + center)
+            arc_angles = np.pi / 2 + np.linspace(0, angle, 16)
+            arc.set_data(center[0] + 0.38 * np.cos(arc_angles), center[1] + 0.38 * np.sin(arc_angles))
+
+        return self._encode_animation(fig, [arrow, arc], update)
+
+    def animate_spatial_transformation(self, question_data: Dict) -> str:
+        """Cube 3D ou hypercube 4D en rotation continue, projeté en 2D"""
+        content = question_data.get('content', '').lower()
+        is_4d = '4d' in content or '4 dimension' in content
+
+        fig, ax = self._new_figure('🌌 Rotation 4D (plans xw, yz)' if is_4d else '🌐 Rotation 3D')
+        ax.set_xlim(-2.2, 2.2)
+        ax.set_ylim(-2.2, 2.2)
+
+        vertices, edges = (TESSERACT_VERTICES, TESSERACT_EDGES) if is_4d else (CUBE_VERTICES, CUBE_EDGES)
+        wireframe = LineCollection([], colors=self.config.accent_color, linewidths=2)
+        ax.add_collection(wireframe)
+
+        def update(t: float):
+            angle = 2 * np.pi * t
+            if is_4d:
+                rotated = vertices @ (_rotation(4, 0, 3, angle) @ _rotation(4, 1, 2, angle / 2)).T
+                # Perspective 4D → 3D selon w, puis projection orthographique
+                points = rotated[:, :3] * (2.5 / (3.5 - rotated[:, 3:4]))
+            else:
+                # Rotation autour de l'axe vertical, puis inclinaison de la caméra
+                points = vertices @ (_rotation(3, 1, 2, np.radians(25)) @ _rotation(3, 0, 2, angle)).T
+            wireframe.set_segments(points[edges][:, :, :2])
+
+        return self._encode_animation(fig, [wireframe], update)
+
+    def animate_sequence(self, sequence_type: str, data: List) -> str:
+        """Construction progressive de la suite, terme après terme"""
+        titles = {'fibonacci': '🌀 Suite de Fibonacci', 'arithmetic': '📈 Suite Arithmétique',
+                  'geometric': '📊 Suite Géométrique'}
+        fig, ax = self._new_figure(titles.get(sequence_type, '🔢 Suite Numérique'), axis_off=False)
+
+        x = np.arange(len(data), dtype=float)
+        y = np.asarray(data, dtype=float)
+        if sequence_type == 'geometric':
+            ax.set_yscale('log')
+        ax.plot(x, y, color=self.config.muted_color, alpha=0.2, linewidth=1)
+        ax.set_xlim(-0.5, len(data) - 0.5)
+        ax.grid(True, alpha=0.3)
+        ax.set_xlabel('Position')
+        ax.set_ylabel('Valeur')
+
+        line, = ax.plot([], [], marker='o', linewidth=3, markersize=7, color=self.config.accent_color)
+        head, = ax.plot([], [], marker='o', markersize=12, color=self.config.error_color)
+
+        def update(t: float):
+            position = t * (len(data) - 1)
+            shown = int(position) + 1
+            head_y = np.interp(position, x, y)
+            line.set_data(np.append(x[:shown], position), np.append(y[:shown], head_y))
+            head.set_data([position], [head_y])
+
+        return self._encode_animation(fig, [line, head], update)
+
+    def _new_figure(self, title: str, axis_off: bool = True):
+        """Figure hors pyplot, dimensionnée par le profil"""
+        fig = Figure(figsize=(self.profile.width, self.profile.height), dpi=self.profile.dpi,
+                     facecolor=self.config.bg_color)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot(111)
+        ax.set_title(title, fontsize=14, fontweight='bold')
+        ax.set_aspect('equal' if axis_off else 'auto')
+        if axis_off:
+            ax.axis('off')
+        return fig, ax
+
+    def _encode_animation(self, fig: Figure, moving: List, update: Callable[[float], None]) -> str:
+        """Rend le fond une fois, puis blit + artistes mobiles à chaque image"""
+        for artist in moving:
+            artist.set_animated(True)
+
+        canvas = fig.canvas
+        canvas.draw()
+        background = canvas.copy_from_bbox(fig.bbox)
+
+        frames = []
+        # Première image à t=0, dernière à t=1 (état final exact)
+        last = max(self.profile.frames - 1, 1)
+        for i in range(self.profile.frames):
+            canvas.restore_region(background)
+            update(i / last)
+            for artist in moving:
+                artist.axes.draw_artist(artist)
+            frames.append(Image.fromarray(np.asarray(canvas.buffer_rgba())[..., :3].copy()))
+
+        # Palette commune calculée sur la première, la médiane et la dernière image
+        if self.profile.palette:
+            samples = [frames[0], frames[len(frames) // 2], frames[-1]]
+            mosaic = Image.new('RGB', (frames[0].width, frames[0].height * len(samples)))
+            for i, sample in enumerate(samples):
+                mosaic.paste(sample, (0, i * frames[0].height))
+            reference = mosaic.quantize(256, method=Image.Quantize.MEDIANCUT)
+            frames = [frame.quantize(palette=reference, dither=Image.Dither.NONE) for frame in frames]
+
+        pil_format, mime = ANIMATION_FORMATS[self.fmt]
+        options = {'lossless': True} if pil_format == 'WEBP' else {}
+        buffer = io.BytesIO()
+        frames[0].save(buffer, format=pil_format, save_all=True, append_images=frames[1:],
+                       duration=int(1000 / self.profile.fps), loop=0, **options)
+
+        return f"data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode()}"
+
+def generate_animated_visual_for_question(question_id: str, question_data: Dict,
+                                          profile: str = 'standard', fmt: str = 'apng',
+                                          theme: str = DEFAULT_THEME, panel: str = STEM_PANEL) -> str:
+    """
+    Équivalent animé de generate_visual_for_question (mêmes thèmes et
+    panneaux : la réponse n'est animée que pour 'solution' et 'explanation').
+    Retourne "" si la question n'a pas de rendu animé.
+    """
+    if panel not in VISUAL_PANELS:
+        raise ValueError(f"Panneau inconnu: {panel} (disponibles: {', '.join(VISUAL_PANELS)})")
+    generator = AnimatedVisualGenerator(profile=profile, fmt=fmt, theme=theme)
+    content = question_data.get('content', '').lower()
+
+    with RENDER_CONTEXT.render(), generator.theme.context():
+        if 'matrice' in content and 'rotation' in content:
+            return generator.animate_matrix_rotation(question_data, panel)
+        elif 'fibonacci' in content:
+            return generator.animate_sequence('fibonacci', [1, 1, 2, 3, 5, 8, 13])
+        elif any(keyword in content for keyword in ['progression', 'suite', 'séquence']):
+            return generator.animate_sequence('arithmetic', [2, 4, 6, 8, 10, 12])
+        elif any(keyword in content for keyword in ['transformation', '3d', '4d', 'spatial']):
+            return generator.animate_spatial_transformation(question_data)
+
+    return ""
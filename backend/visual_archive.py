@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+📦 ARCHIVE COMPACTE DES VISUELS PRÉ-RENDUS TESTIQ
+================================================
+
+Un seul fichier au lieu d'un JSON base64 par visuel (visual_cache/) :
+
+    en-tête (32 o) : magic, version, génération, position et taille de l'index
+    index          : clé → (position, longueur, SHA-256) pour chaque visuel
+    blobs          : octets PNG bruts, un seul exemplaire par SHA-256
+
+La lecture passe par mmap : une recherche est un accès dict puis un
+memoryview sur la zone du fichier, sans copie ni analyse JSON.
+
+Les mises à jour sont en ajout seul : nouveaux blobs + nouvel index en
+fin de fichier, puis réécriture de l'en-tête (qui ne pointe jamais sur un
+index incomplet). L'espace mort (anciens index, blobs orphelins) est
+récupéré par compact(), déclenché automatiquement au-delà d'un seuil.
+Ajouts et compaction prennent un verrou fcntl exclusif (<archive>.lock) :
+plusieurs processus peuvent écrire ; les lecteurs appellent refresh().
+
+Usage: python3 visual_archive.py pack <dossier_store> <archive>
+       python3 visual_archive.py import-cache <visual_cache> <archive>
+       python3 visual_archive.py compact <archive>
+       python3 visual_archive.py stats <archive>
+"""
+
+import base64
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Dict, Iterable, Optional, Tuple
+
+from visual_store import DATA_URI_PREFIX, VisualStore, file_lock
+
+ARCHIVE_MAGIC = b'TIQPACK\x00'
+ARCHIVE_VERSION = 1
+HEADER = struct.Struct('>8sIIQQ')       # magic, version, génération, index (position, taille)
+ENTRY = struct.Struct('>QI32s')         # position, longueur, SHA-256 (précédé de la clé)
+KEY_LENGTH = struct.Struct('>H')
+COMPACT_DEAD_RATIO = 0.5                # compaction auto quand la moitié du fichier est morte
+COMPACT_MIN_BYTES = 1 << 20
+
+class ArchiveFormatError(ValueError):
+    """Fichier qui n'est pas une archive de visuels lisible"""
+
+def _encode_index(entries: Dict[str, Tuple[int, int, bytes]]) -> bytes:
+    parts = []
+    for key, (offset, length, digest) in entries.items():
+        encoded = key.encode('utf-8')
+        parts.append(KEY_LENGTH.pack(len(encoded)) + encoded + ENTRY.pack(offset, length, digest))
+    return b''.join(parts)
+
+def _decode_index(data) -> Dict[str, Tuple[int, int, bytes]]:
+    entries = {}
+    position = 0
+    while position < len(data):
+        (key_length,) = KEY_LENGTH.unpack_from(data, position)
+        position += KEY_LENGTH.size
+        key = bytes(data[position:position + key_length]).decode('utf-8')
+        position += key_length
+        entries[key] = ENTRY.unpack_from(data, position)
+        position += ENTRY.size
+    return entries
+
+class VisualArchive:
+    """
+    Archive mmap des visuels. Compatible avec le paramètre store de
+    generate_visual_for_question (get_data_uri / put_data_uri).
+    """
+
+    def __init__(self, path: str, auto_compact: bool = True):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.auto_compact = auto_compact
+        with file_lock(self.lock_path):
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                self._write_empty(path)
+        self._map: Optional[mmap.mmap] = None
+        self._inode = None
+        self.generation = -1
+        self.refresh()
+
+    @staticmethod
+    def _write_empty(path: str):
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, 0, HEADER.size, 0))
+
+    def refresh(self) -> bool:
+        """Remappe le fichier si un autre écrivain l'a modifié ; True si rechargé"""
+        with open(self.path, 'rb') as f:
+            header = f.read(HEADER.size)
+            magic, version, generation, index_offset, index_length = self._parse_header(header)
+            inode = os.fstat(f.fileno()).st_ino
+            if generation == self.generation and inode == self._inode:
+                return False
+            self._inode = inode
+            # Les memoryview déjà remis aux appelants gardent l'ancien mmap en vie
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.generation = generation
+        self.entries = _decode_index(self._map[index_offset:index_offset + index_length])
+        self._digests = {digest: (offset, length) for offset, length, digest in self.entries.values()}
+        return True
+
+    def _parse_header(self, header: bytes) -> Tuple:
+        if len(header) < HEADER.size:
+            raise ArchiveFormatError(f"{self.path}: en-tête tronqué")
+        fields = HEADER.unpack(header)
+        if fields[0] != ARCHIVE_MAGIC or fields[1] != ARCHIVE_VERSION:
+            raise ArchiveFormatError(f"{self.path}: pas une archive de visuels v{ARCHIVE_VERSION}")
+        return fields
+
+    # === LECTURE ===
+
+    def get_view(self, key: str) -> Optional[memoryview]:
+        """Octets PNG de la clé, sans copie (memoryview sur le mmap), ou None"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        offset, length, _ = entry
+        return memoryview(self._map)[offset:offset + length]
+
+    def get(self, key: str) -> Optional[bytes]:
+        view = self.get_view(key)
+        return None if view is None else bytes(view)
+
+    def get_data_uri(self, key: str) -> Optional[str]:
+        view = self.get_view(key)
+        if view is None:
+            return None
+        return DATA_URI_PREFIX + base64.b64encode(view).decode()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # === ÉCRITURE (ajout seul) ===
+
+    def put(self, key: str, data: bytes) -> str:
+        return self.put_many([(key, data)])[0]
+
+    def put_data_uri(self, key: str, data_uri: str) -> str:
+        """Variante de put() pour les data URI produites par VisualGenerator"""
+        return self.put(key, base64.b64decode(data_uri[len(DATA_URI_PREFIX):]))
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]]) -> list:
+        """
+        Ajoute plusieurs visuels avec un seul nouvel index. Les blobs déjà
+        présents (même SHA-256) ne sont pas réécrits. Retourne les digests.
+        """
+        digests = []
+        with file_lock(self.lock_path):
+            self.refresh()
+            entries = dict(self.entries)
+
+            with open(self.path, 'r+b') as f:
+                f.seek(0, os.SEEK_END)
+                for key, data in items:
+                    digest = hashlib.sha256(data).digest()
+                    if digest in self._digests:
+                        offset, length = self._digests[digest]
+                    else:
+                        offset, length = f.tell(), len(data)
+                        f.write(data)
+                        self._digests[digest] = (offset, length)
+                    entries[key] = (offset, length, digest)
+                    digests.append(digest.hex())
+
+                self._commit(f, entries)
+
+            self._maybe_compact()
+        return digests
+
+    def remove(self, key: str) -> bool:
+        """Retire une clé (l'espace sera récupéré à la compaction)"""
+        with file_lock(self.lock_path):
+            self.refresh()
+            if key not in self.entries:
+                return False
+            entries = dict(self.entries)
+            del entries[key]
+            with open(self.path, 'r+b') as f:
+                f.seek(0, os.SEEK_END)
+                self._commit(f, entries)
+            self._maybe_compact()
+        return True
+
+    def _commit(self, f, entries: Dict[str, Tuple[int, int, bytes]]):
+        """Écrit l'index en fin de fichier puis bascule l'en-tête dessus"""
+        index = _encode_index(entries)
+        index_offset = f.tell()
+        f.write(index)
+        f.flush()
+        os.fsync(f.fileno())
+
+        f.seek(0)
+        f.write(HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, self.generation + 1,
+                            index_offset, len(index)))
+        f.flush()
+        os.fsync(f.fileno())
+        self.refresh()
+
+    # === COMPACTION ===
+
+    def stats(self) -> Dict:
+        file_bytes = os.path.getsize(self.path)
+        blob_sizes = {digest: length for _, length, digest in self.entries.values()}
+        live_bytes = HEADER.size + len(_encode_index(self.entries)) + sum(blob_sizes.values())
+        return {
+            'keys': len(self.entries),
+            'blobs': len(blob_sizes),
+            'file_bytes': file_bytes,
+            'live_bytes': live_bytes,
+            'dead_ratio': round(1 - live_bytes / file_bytes, 3) if file_bytes else 0.0,
+            'generation': self.generation
+        }
+
+    def _maybe_compact(self):
+        """Compaction automatique (appelée sous verrou d'écriture)"""
+        stats = self.stats()
+        if self.auto_compact and stats['file_bytes'] >= COMPACT_MIN_BYTES and \
+                stats['dead_ratio'] >= COMPACT_DEAD_RATIO:
+            self._compact()
+
+    def compact(self) -> Dict:
+        """
+        Réécrit l'archive sans espace mort : en-tête, index, puis blobs
+        uniques. Remplacement atomique ; les lecteurs déjà ouverts gardent
+        l'ancien fichier jusqu'à leur prochain refresh().
+        """
+        with file_lock(self.lock_path):
+            self.refresh()
+            return self._compact()
+
+    def _compact(self) -> Dict:
+        before = os.path.getsize(self.path)
+        blobs: Dict[bytes, Tuple[int, int]] = {}
+        for offset, length, digest in self.entries.values():
+            blobs.setdefault(digest, (offset, length))
+
+        # Positions finales : les blobs suivent directement l'index
+        index_length = len(_encode_index({key: (0, 0, digest) for key, (_, _, digest) in self.entries.items()}))
+        position = HEADER.size + index_length
+        moved = {}
+        for digest, (_, length) in blobs.items():
+            moved[digest] = position
+            position += length
+        entries = {key: (moved[digest], length, digest) for key, (_, length, digest) in self.entries.items()}
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, self.generation + 1,
+                                HEADER.size, index_length))
+            f.write(_encode_index(entries))
+            for digest, (offset, length) in blobs.items():
+                f.write(self._map[offset:offset + length])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        self.refresh()
+        return {'bytes_before': before, 'bytes_after': os.path.getsize(self.path)}
+
+# === CONVERSIONS ===
+
+def pack_store(store: VisualStore, archive: VisualArchive) -> int:
+    """Copie toutes les clés d'un VisualStore dans l'archive (un seul index écrit)"""
+    items = ((key, store.get(key)) for key in store.index)
+    return len(archive.put_many((key, data) for key, data in items if data is not None))
+
+def import_visual_cache(cache_dir: str, archive: VisualArchive) -> int:
+    """Importe les fichiers visual_<hash>.json de visual_service.js"""
+    def items():
+        for name in sorted(os.listdir(cache_dir)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(cache_dir, name), 'r', encoding='utf-8') as f:
+                visual = json.load(f).get('visual', '')
+            if visual.startswith(DATA_URI_PREFIX):
+                yield name[:-len('.json')], base64.b64decode(visual[len(DATA_URI_PREFIX):])
+
+    return len(archive.put_many(items()))
+
+if __name__ == "__main__":
+    commands = {'pack': 3, 'import-cache': 3, 'compact': 2, 'stats': 2}
+    if len(sys.argv) < 2 or commands.get(sys.argv[1]) != len(sys.argv) - 1:
+        print("Usage: python3 visual_archive.py pack <dossier_store> <archive>\n"
+              "       python3 visual_archive.py import-cache <visual_cache> <archive>\n"
+              "       python3 visual_archive.py compact|stats <archive>")
+        sys.exit(1)
+
+    command = sys.argv[1]
+    archive = VisualArchive(sys.argv[-1])
+    if command == 'pack':
+        print(f"📦 {pack_store(VisualStore(sys.argv[2]), archive)} visuels ajoutés")
+    elif command == 'import-cache':
+        print(f"📦 {import_visual_cache(sys.argv[2], archive)} visuels importés")
+    elif command == 'compact':
+        result = archive.compact()
+        print(f"🗜️ {result['bytes_before']:,} → {result['bytes_after']:,} octets")
+
+    stats = archive.stats()
+    print(f"📊 {stats['keys']} clés, {stats['blobs']} blobs, {stats['file_bytes']:,} octets "
+          f"(espace mort {stats['dead_ratio']:.0%}, génération {stats['generation']})")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+⏱️ ÉCHÉANCES DES RENDUS TESTIQ
+=============================
+
+Un rendu lent (figure 4D à 300 DPI, police de repli introuvable...) ne
+bloque plus son appelant indéfiniment : generate_visual_for_question et
+le pool de workers acceptent une échéance.
+
+- Annulation coopérative : le générateur appelle checkpoint() entre ses
+  phases de dessin (panneaux, calculs, encodage). Passé l'échéance du
+  thread courant, RenderTimeout est levée ; les figures ouvertes sont
+  fermées par l'appelant.
+- Dégradation : quand le temps restant ne couvre pas le coût habituel
+  d'un rendu complet, ou que le rendu complet dépasse sa part du budget,
+  le visuel est refait avec un profil économique (DPI réduit, PNG brut).
+  En dernier recours, un placeholder « visuel indisponible » déjà encodé.
+
+Les coûts habituels sont des moyennes glissantes par profil et par
+question (clé de cache), mesurées dans le processus : une figure 4D lente
+ne fait pas dégrader les suites numériques. Un rendu complet interrompu
+n'est pas une mesure : il ne laisse qu'une borne inférieure pour sa
+question, qui décroît à chaque rendu complet non tenté jusqu'à ce qu'un
+nouvel essai passe. Les compteurs sont dans DEADLINE_TRACKER.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+FULL, DEGRADED, PLACEHOLDER = 'full', 'degraded', 'placeholder'
+COST_SMOOTHING = 0.2            # poids d'une nouvelle mesure dans la moyenne glissante
+DEGRADED_RESERVE = 0.35         # part du budget réservée au profil économique (sans mesure)
+SKIP_DECAY = 0.7                # facteur appliqué à une borne de coût à chaque rendu non tenté
+COST_KEYS_MAX = 10000           # coûts par question gardés en mémoire (les plus récents)
+
+class RenderTimeout(TimeoutError):
+    """Échéance dépassée, levée à un point de contrôle du rendu"""
+
+    def __init__(self, phase: str):
+        super().__init__(f"Échéance dépassée avant « {phase} »")
+        self.phase = phase
+
+class Deadline:
+    """
+    Instant limite sur l'horloge monotone. Sous Linux, time.monotonic()
+    est la même horloge pour tous les processus : une échéance peut être
+    transmise telle quelle à un worker.
+    """
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> 'Deadline':
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def earlier(self, seconds: float) -> 'Deadline':
+        """Échéance avancée de `seconds` (part du budget gardée en réserve)"""
+        return Deadline(self.expires_at - seconds)
+
+    def check(self, phase: str):
+        if self.expired():
+            raise RenderTimeout(phase)
+
+_local = threading.local()
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]):
+    """Échéance vue par checkpoint() dans ce thread, pour la durée du bloc"""
+    previous = getattr(_local, 'deadline', None)
+    _local.deadline = deadline
+    try:
+        yield deadline
+    finally:
+        _local.deadline = previous
+
+def checkpoint(phase: str):
+    """Point d'annulation coopérative entre deux phases de dessin"""
+    deadline = getattr(_local, 'deadline', None)
+    if deadline is not None:
+        deadline.check(phase)
+
+@dataclass
+class DeadlineStats:
+    """Compteurs cumulés des rendus avec échéance"""
+    renders: int = 0
+    completed: int = 0          # rendus complets dans les temps
+    timeouts: int = 0           # rendus complets interrompus à un point de contrôle
+    skipped: int = 0            # rendu complet non tenté (temps restant trop court)
+    degraded: int = 0           # servis en profil économique
+    late: int = 0               # terminés après l'échéance (phase non interruptible, ex. rendu Agg)
+    placeholders: int = 0       # ni l'un ni l'autre n'a tenu dans l'échéance
+
+class DeadlineTracker:
+    """Coûts habituels par profil et compteurs, partagés par les threads du processus"""
+
+    def __init__(self):
+        self.stats = DeadlineStats()
+        self._costs: 'OrderedDict[Tuple[str, Optional[str]], float]' = OrderedDict()
+        self._bounds: Set[Tuple[str, Optional[str]]] = set()   # entrées issues d'une interruption
+        self._lock = threading.Lock()
+
+    def estimate(self, profile: str, key: Optional[str] = None) -> Optional[float]:
+        """Durée habituelle d'un rendu du profil pour la question (None sans mesure)"""
+        with self._lock:
+            return self._costs.get((profile, key))
+
+    def observe(self, profile: str, seconds: float, key: Optional[str] = None):
+        """Met à jour la moyenne de la question et celle de tout le profil (key=None)"""
+        with self._lock:
+            for entry in {(profile, key), (profile, None)}:
+                previous = None if entry in self._bounds else self._costs.get(entry)
+                self._bounds.discard(entry)
+                self._store(entry, seconds if previous is None else
+                            previous + COST_SMOOTHING * (seconds - previous))
+
+    def interrupted(self, profile: str, seconds: float, key: Optional[str] = None):
+        """
+        Rendu interrompu après `seconds` : borne inférieure du coût de la
+        question, jamais mêlée aux mesures ni à la moyenne du profil.
+        """
+        if key is None:
+            return
+        with self._lock:
+            entry = (profile, key)
+            if entry in self._costs and entry not in self._bounds:
+                seconds = max(seconds, self._costs[entry])
+            self._bounds.add(entry)
+            self._store(entry, seconds)
+
+    def skipped(self, profile: str, key: Optional[str] = None):
+        """Rendu non tenté : une borne décroît pour qu'un essai finisse par repasser"""
+        with self._lock:
+            entry = (profile, key)
+            if entry in self._bounds:
+                self._store(entry, self._costs[entry] * SKIP_DECAY)
+            self.stats.skipped += 1
+
+    def _store(self, entry: Tuple[str, Optional[str]], seconds: float):
+        """Appelé sous verrou. Entrée la plus récente en fin, les plus anciennes évincées"""
+        self._costs[entry] = seconds
+        self._costs.move_to_end(entry)
+        while len(self._costs) > COST_KEYS_MAX:
+            evicted, _ = self._costs.popitem(last=False)
+            self._bounds.discard(evicted)
+
+    def count(self, name: str):
+        with self._lock:
+            setattr(self.stats, name, getattr(self.stats, name) + 1)
+
+    def reserve(self, deadline: Deadline, key: Optional[str] = None) -> float:
+        """Temps à garder pour un rendu économique si le rendu complet échoue"""
+        degraded = self.estimate(DEGRADED, key)
+        if degraded is None:
+            degraded = self.estimate(DEGRADED)
+        budget = max(deadline.remaining(), 0.0)
+        return DEGRADED_RESERVE * budget if degraded is None else min(degraded, budget)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            snapshot = dict(self.stats.__dict__)
+            snapshot['costs_ms'] = {profile: round(cost * 1000, 1)
+                                    for (profile, key), cost in self._costs.items() if key is None}
+            snapshot['cost_keys'] = len(self._costs)
+        return snapshot
+
+DEADLINE_TRACKER = DeadlineTracker()
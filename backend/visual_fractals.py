@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+🌀 MOTEUR DE CALCUL FRACTAL TESTIQ
+=================================
+
+Calculs vectorisés NumPy sur toute la grille de pixels :
+- ensembles à temps d'échappement (Mandelbrot, Julia)
+- systèmes de fonctions itérées (famille de Sierpinski, fougère de Barnsley)
+- L-systèmes (Koch, dragon, pointe de flèche de Sierpinski)
+
+Les grandes images sont découpées en bandes de lignes réparties sur les
+cœurs, par un pool de processus créé une fois par processus principal
+(jamais dans un worker de rendu, qui calcule sur place). Les tableaux
+d'itérations sont mis en cache, dans une limite en octets : changer de
+carte de couleurs ou revenir à un niveau de zoom déjà vu ne recalcule rien.
+"""
+
+import atexit
+import functools
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+ESCAPE_KINDS = ('mandelbrot', 'julia')
+PARALLEL_PIXEL_THRESHOLD = 1_000_000
+DEFAULT_JULIA_C = (-0.8, 0.156)
+ESCAPE_CACHE_BYTES = 128 * 1024 * 1024
+IFS_CACHE_BYTES = 32 * 1024 * 1024
+LSYSTEM_CACHE_BYTES = 32 * 1024 * 1024
+
+# Transformations affines (A 2×2, b) et probabilités de chaque IFS
+IFS_SYSTEMS: Dict[str, Tuple[List[Tuple[List[List[float]], List[float]]], List[float]]] = {
+    'sierpinski_triangle': (
+        [([[0.5, 0], [0, 0.5]], [0, 0]),
+         ([[0.5, 0], [0, 0.5]], [0.5, 0]),
+         ([[0.5, 0], [0, 0.5]], [0.25, 0.433])],
+        [1 / 3] * 3
+    ),
+    'sierpinski_carpet': (
+        [([[1 / 3, 0], [0, 1 / 3]], [dx / 3, dy / 3])
+         for dx in range(3) for dy in range(3) if (dx, dy) != (1, 1)],
+        [1 / 8] * 8
+    ),
+    'barnsley_fern': (
+        [([[0, 0], [0, 0.16]], [0, 0]),
+         ([[0.85, 0.04], [-0.04, 0.85]], [0, 1.6]),
+         ([[0.2, -0.26], [0.23, 0.22]], [0, 1.6]),
+         ([[-0.15, 0.28], [0.26, 0.24]], [0, 0.44])],
+        [0.01, 0.85, 0.07, 0.07]
+    )
+}
+
+# Axiome, règles et angle (degrés) des L-systèmes sans branchement
+LSYSTEMS: Dict[str, Tuple[str, Dict[str, str], float]] = {
+    'koch': ('F--F--F', {'F': 'F+F--F+F'}, 60),
+    'dragon': ('FX', {'X': 'X+YF+', 'Y': '-FX-Y'}, 90),
+    'sierpinski_arrowhead': ('A', {'A': 'B-A-B', 'B': 'A+B+A'}, 60)
+}
+LSYSTEM_DRAW_SYMBOLS = 'FAB'
+
+# === CACHE BORNÉ EN OCTETS ===
+
+def _nbytes(value) -> int:
+    """Taille des tableaux NumPy d'un résultat (tuples parcourus)"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, tuple):
+        return sum(_nbytes(item) for item in value)
+    return 0
+
+def byte_bounded_cache(max_bytes: int) -> Callable:
+    """
+    Comme functools.lru_cache, mais borné par la taille totale des tableaux
+    gardés : un résultat plus gros que la limite n'est pas conservé.
+    """
+    def decorator(function: Callable) -> Callable:
+        entries: 'OrderedDict[Tuple, object]' = OrderedDict()
+        lock = threading.Lock()
+        state = {'bytes': 0, 'hits': 0, 'misses': 0}
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            with lock:
+                if key in entries:
+                    entries.move_to_end(key)
+                    state['hits'] += 1
+                    return entries[key]
+                state['misses'] += 1
+            result = function(*args, **kwargs)
+            size = _nbytes(result)
+            if size <= max_bytes:
+                with lock:
+                    if key not in entries:
+                        entries[key] = result
+                        state['bytes'] += size
+                    while state['bytes'] > max_bytes:
+                        _, evicted = entries.popitem(last=False)
+                        state['bytes'] -= _nbytes(evicted)
+            return result
+
+        def cache_info() -> Dict:
+            with lock:
+                return dict(state, entries=len(entries), max_bytes=max_bytes)
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+                state.update(bytes=0, hits=0, misses=0)
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+# === POOL DE CALCUL ===
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _band_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Pool partagé par tous les calculs du processus, créé au premier besoin.
+    None sur une seule unité de calcul ou dans un processus enfant (worker
+    de visual_workers) : les cœurs y sont déjà occupés par les autres workers.
+    """
+    global _pool
+    workers = _available_cpus()
+    if workers < 2 or multiprocessing.parent_process() is not None:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            atexit.register(_pool.shutdown)
+        return _pool
+
+# === TEMPS D'ÉCHAPPEMENT ===
+
+def _escape_time_rows(kind: str, x: np.ndarray, y: np.ndarray,
+                      c: complex, max_iter: int) -> np.ndarray:
+    """Nombre d'itérations avant échappement pour une bande de lignes"""
+    grid = x[None, :] + 1j * y[:, None]
+    if kind == 'mandelbrot':
+        z = np.zeros(grid.size, dtype=np.complex128)
+        c_values = grid.ravel()
+    else:
+        z = grid.ravel().copy()
+        c_values = np.full(grid.size, c, dtype=np.complex128)
+
+    counts = np.full(grid.size, max_iter, dtype=np.int32)
+    active = np.arange(grid.size)
+
+    if kind == 'mandelbrot':
+        # Cardioïde principale et bulbe de période 2 : intérieurs connus,
+        # ce sont les points les plus coûteux (ils ne s'échappent jamais)
+        q = (c_values.real - 0.25) ** 2 + c_values.imag ** 2
+        inside = ((q * (q + c_values.real - 0.25) <= 0.25 * c_values.imag ** 2) |
+                  ((c_values.real + 1) ** 2 + c_values.imag ** 2 <= 0.0625))
+        z, c_values, active = z[~inside], c_values[~inside], active[~inside]
+
+    # Seuls les points encore bornés restent dans les tableaux de travail
+    for iteration in range(max_iter):
+        np.multiply(z, z, out=z)
+        z += c_values
+        escaped = z.real * z.real + z.imag * z.imag > 4.0
+        if escaped.any():
+            counts[active[escaped]] = iteration
+            keep = ~escaped
+            z, c_values, active = z[keep], c_values[keep], active[keep]
+            if not active.size:
+                break
+
+    return counts.reshape(grid.shape)
+
+def _escape_time_band(args) -> np.ndarray:
+    return _escape_time_rows(*args)
+
+@byte_bounded_cache(ESCAPE_CACHE_BYTES)
+def escape_time(kind: str, center: Tuple[float, float], width: float, resolution: Tuple[int, int],
+                max_iter: int = 200, c: complex = complex(*DEFAULT_JULIA_C)) -> np.ndarray:
+    """
+    Tableau (lignes × colonnes) des itérations d'échappement, en lecture seule.
+    Mis en cache par paramètres : zoom et couleurs se réaffichent sans calcul.
+    """
+    cols, rows = resolution
+    height = width * rows / cols
+    x = np.linspace(center[0] - width / 2, center[0] + width / 2, cols)
+    y = np.linspace(center[1] + height / 2, center[1] - height / 2, rows)
+
+    pool = _band_pool() if cols * rows >= PARALLEL_PIXEL_THRESHOLD else None
+    if pool is not None:
+        bands = np.array_split(y, _available_cpus() * 2)
+        counts = np.vstack(list(pool.map(
+            _escape_time_band, [(kind, x, band, c, max_iter) for band in bands])))
+    else:
+        counts = _escape_time_rows(kind, x, y, c, max_iter)
+
+    counts.setflags(write=False)
+    return counts
+
+# === IFS ET L-SYSTÈMES ===
+
+@byte_bounded_cache(IFS_CACHE_BYTES)
+def ifs_density(name: str, resolution: int = 400, points: int = 20000,
+                iterations: int = 30, seed: int = 0) -> Tuple[np.ndarray, Tuple[float, float, float, float]]:
+    """
+    Jeu du chaos vectorisé : tous les points avancent ensemble, chacun tirant
+    sa transformation. Retourne l'histogramme de densité et son étendue.
+    """
+    transforms, probabilities = IFS_SYSTEMS[name]
+    matrices = np.array([matrix for matrix, _ in transforms])
+    offsets = np.array([offset for _, offset in transforms])
+
+    rng = np.random.default_rng(seed)
+    current = rng.random((points, 2))
+    trail = []
+    for iteration in range(iterations):
+        choice = rng.choice(len(transforms), size=points, p=probabilities)
+        current = np.einsum('nij,nj->ni', matrices[choice], current) + offsets[choice]
+        # Les premières itérations servent à converger vers l'attracteur
+        if iteration >= 8:
+            trail.append(current)
+
+    cloud = np.vstack(trail)
+    extent = (cloud[:, 0].min(), cloud[:, 0].max(), cloud[:, 1].min(), cloud[:, 1].max())
+    density, _, _ = np.histogram2d(cloud[:, 1], cloud[:, 0], bins=resolution,
+                                   range=[extent[2:], extent[:2]])
+    density = density[::-1]
+    density.setflags(write=False)
+    return density, extent
+
+@byte_bounded_cache(LSYSTEM_CACHE_BYTES)
+def lsystem_path(name: str, iterations: int) -> np.ndarray:
+    """
+    Sommets (N × 2) du tracé d'un L-système. La chaîne est réécrite, puis
+    la tortue est vectorisée : angles cumulés et pas cumulés.
+    """
+    axiom, rules, angle = LSYSTEMS[name]
+    commands = axiom
+    for _ in range(iterations):
+        commands = ''.join(rules.get(symbol, symbol) for symbol in commands)
+
+    symbols = np.frombuffer(commands.encode('ascii'), dtype=np.uint8)
+    turns = np.where(symbols == ord('+'), angle, 0.0) - np.where(symbols == ord('-'), angle, 0.0)
+    headings = np.radians(np.cumsum(turns))
+    draws = np.isin(symbols, np.frombuffer(LSYSTEM_DRAW_SYMBOLS.encode('ascii'), dtype=np.uint8))
+
+    steps = np.column_stack((np.cos(headings[draws]), np.sin(headings[draws])))
+    path = np.vstack((np.zeros((1, 2)), np.cumsum(steps, axis=0)))
+    path.setflags(write=False)
+    return path
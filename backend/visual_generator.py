@@ -14,20 +14,44 @@ Auteur: TestIQ Advanced Visual System
 Version: 1.0
 """
 
+import matplotlib
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from matplotlib.patches import Circle, FancyBboxPatch, Rectangle, Arrow, Polygon
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import ListedColormap
 import numpy as np
-import seaborn as sns
-from typing import Dict, List, Tuple, Optional
+from PIL import Image, ImageDraw
+from typing import Callable, Dict, List, Tuple, Optional
 import json
 import base64
+import gc
+import hashlib
 import io
-from dataclasses import dataclass
+import os
+import random
+import resource
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
 
-# Configuration des styles modernes
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set_palette("husl")
+from visual_deadlines import (DEADLINE_TRACKER, DEGRADED, FULL, PLACEHOLDER, Deadline, RenderTimeout,
+                              checkpoint, deadline_scope)
+from visual_fractals import ESCAPE_KINDS, IFS_SYSTEMS, LSYSTEMS, escape_time, ifs_density, lsystem_path
+from visual_graphs import compute_layout, normalize_graph
+from visual_logic import BooleanSyntaxError, extract_expression, gate_graph, truth_table
+from visual_png import make_placeholder, optimize_image
+from visual_profiling import RENDER_PROFILER
+from visual_store import VisualStore, cache_key
+from visual_themes import DEFAULT_THEME, apply_base_theme, get_theme
+
+# Configuration des styles modernes (thème par défaut, voir visual_themes)
+def _apply_global_style():
+    apply_base_theme()
+
+_apply_global_style()
 
 @dataclass
 class VisualConfig:
@@ -42,29 +66,259 @@ class VisualConfig:
     success_color: str = "#28a745"
     error_color: str = "#dc3545"
     warning_color: str = "#ffc107"
+    ink_color: str = "#333333"    # traits de grille, texte secondaire
+    muted_color: str = "gray"     # flèches, arêtes, repères discrets
+    png_profile: Optional[str] = None  # voir visual_png.PNG_PROFILES, None = PNG brut
+
+# === DSL MATRIX3X3 (miroir de backend/scripts/matrix-dsl.js) ===
+
+DSL_STYLES = {
+    'outline': {'fill': 'none', 'stroke': 'black', 'stroke_width': 2},
+    'filled': {'fill': 'black', 'stroke': 'none', 'stroke_width': 0},
+    'mixed': {'fill': 'lightgray', 'stroke': 'black', 'stroke_width': 2}
+}
+DSL_STYLE_CYCLE = ['outline', 'filled', 'mixed']
+DSL_CIRCLE_SEGMENTS = 48
+
+@lru_cache(maxsize=512)
+def _dsl_glyph_vertices(sides: int, angle: float, scale: float) -> np.ndarray:
+    """
+    Sommets d'un glyphe DSL centré sur l'origine (rayon 0.35 × scale).
+    Mis en cache : les cellules identiques d'une grille (ou de grilles
+    différentes) partagent le même tableau, en lecture seule.
+    """
+    n = sides if 3 <= sides <= 6 else DSL_CIRCLE_SEGMENTS
+    # Sommet initial en haut, rotation horaire comme le transform SVG
+    theta = np.pi / 2 - np.radians(angle) - 2 * np.pi * np.arange(n) / n
+    vertices = 0.35 * scale * np.column_stack((np.cos(theta), np.sin(theta)))
+    vertices.setflags(write=False)
+    return vertices
+
+def apply_dsl_rule(spec: Dict, rule: Dict) -> Dict:
+    """Applique une règle DSL (rotate, sides, style, scale) à une spécification"""
+    new_spec = dict(spec)
+    op = rule.get('op')
+    
+    if op == 'rotate':
+        new_spec['angle'] = new_spec.get('angle', 0) + rule['deg']
+    elif op == 'sides':
+        new_spec['sides'] = max(3, min(6, new_spec.get('sides', 4) + rule['delta']))
+    elif op == 'style':
+        # Style inconnu : traité comme le premier du cycle, comme au dessin (DSL_STYLES)
+        style = new_spec.get('style', DSL_STYLE_CYCLE[0])
+        current = DSL_STYLE_CYCLE.index(style) if style in DSL_STYLE_CYCLE else 0
+        new_spec['style'] = DSL_STYLE_CYCLE[(current + rule['delta']) % len(DSL_STYLE_CYCLE)]
+    elif op == 'scale':
+        new_spec['scale'] = new_spec.get('scale', 1) * rule['factor']
+    
+    return new_spec
+
+def build_dsl_matrix(dsl_spec: Dict) -> List[List[Dict]]:
+    """Construit les 9 spécifications de cellules d'une grille DSL matrix3x3"""
+    rules = dsl_spec.get('rules', {})
+    matrix = []
+    
+    for row in range(3):
+        matrix.append([])
+        for col in range(3):
+            cell = dict(dsl_spec.get('start', {}))
+            for _ in range(row):
+                for rule in rules.get('rows', []):
+                    cell = apply_dsl_rule(cell, rule)
+            for _ in range(col):
+                for rule in rules.get('cols', []):
+                    cell = apply_dsl_rule(cell, rule)
+            matrix[row].append(cell)
+    
+    return matrix
+
+def build_dsl_distractors(correct_spec: Dict, distractor_types: List[str], 
+                          rng: random.Random, count: int = 3) -> List[Dict]:
+    """Génère les spécifications des distracteurs comme matrix-dsl.js"""
+    distractors = []
+    
+    for distractor_type in distractor_types[:count]:
+        spec = dict(correct_spec)
+        if distractor_type == 'wrong_angle':
+            spec['angle'] = spec.get('angle', 0) + 30
+        elif distractor_type == 'wrong_sides':
+            spec['sides'] = 4 if spec.get('sides') == 3 else 3
+        elif distractor_type == 'wrong_style':
+            spec['style'] = 'filled' if spec.get('style') == 'outline' else 'outline'
+        elif distractor_type == 'right_angle_wrong_fill':
+            spec['style'] = 'mixed'
+        elif distractor_type == 'random':
+            spec['angle'] = rng.randrange(360)
+            spec['sides'] = 3 + rng.randrange(4)
+        distractors.append(spec)
+    
+    return distractors
+
+# === FRACTALES ===
+
+FRACTAL_KEYWORDS = {
+    'mandelbrot': 'mandelbrot',
+    'julia': 'julia',
+    'tapis': 'sierpinski_carpet',
+    'sierpinski': 'sierpinski_triangle',
+    'fougère': 'barnsley_fern',
+    'dragon': 'dragon',
+    'koch': 'koch'
+}
+FRACTAL_ROUTE_KEYWORDS = ['fractal', 'auto-similaire', *FRACTAL_KEYWORDS]
+
+# === GRAPHES ===
+
+# Mots propres aux graphes : « sommet » et « arête » reviennent aussi dans les
+# questions de géométrie (cubes, polyèdres), qui ne doivent pas recevoir un
+# graphe d'illustration
+GRAPH_KEYWORDS = ['graphe', 'arbre']
+GRAPH_LABEL_LIMIT = 40
+
+# Graphes d'illustration quand la question ne fournit pas question_data['graph']
+SAMPLE_GRAPHS = {
+    'tree': {'nodes': list('ABCDEFG'),
+             'edges': [('A', 'B'), ('A', 'C'), ('B', 'D'), ('B', 'E'), ('C', 'F'), ('C', 'G')]},
+    'force': {'nodes': list('ABCDEF'),
+              'edges': [('A', 'B'), ('A', 'C'), ('B', 'C'), ('C', 'D'), ('D', 'E'), ('D', 'F'), ('E', 'F')]}
+}
+
+# === LOGIQUE BOOLÉENNE ===
+
+TRUTH_TABLE_KEYWORDS = ['table de vérité', 'booléen', '∧', '∨', '¬', '⊕']
+TRUTH_TABLE_TEXT_ROWS = 16   # au-delà, table en carte de couleurs sans chiffres
+GATE_DIAGRAM_LIMIT = 24      # au-delà, pas de schéma de portes
+TRUTH_TABLE_HEADER_CHARS = 16
+
+# === PANNEAUX ÉNONCÉ / SOLUTION ===
+
+# Les visuels à deux volets sont rendus panneau par panneau : l'énoncé seul
+# pendant le test, la solution (ou les deux côte à côte) seulement en revue.
+STEM_PANEL, SOLUTION_PANEL, EXPLANATION_PANEL = 'stem', 'solution', 'explanation'
+VISUAL_PANELS = (STEM_PANEL, SOLUTION_PANEL, EXPLANATION_PANEL)
+
+# === ÉCHÉANCES (visual_deadlines.py) ===
+
+DEGRADED_DPI = 72                 # profil économique : DPI réduit, PNG brut
+UNAVAILABLE_SIZE = (480, 320)     # placeholder « visuel indisponible »
+
+@lru_cache(maxsize=16)
+def _unavailable_png(bg_color: str, ink_color: str) -> bytes:
+    """Placeholder dessiné avec Pillow (sans matplotlib : coût négligeable)"""
+    image = Image.new('RGB', UNAVAILABLE_SIZE, matplotlib.colors.to_hex(bg_color))
+    draw = ImageDraw.Draw(image)
+    ink = matplotlib.colors.to_hex(ink_color)
+    width, height = UNAVAILABLE_SIZE
+    draw.rectangle((8, 8, width - 9, height - 9), outline=ink, width=2)
+    draw.text((width // 2, height // 2), 'Visuel indisponible', fill=ink, anchor='mm')
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+def _shorten(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+# === CYCLE DE VIE DES FIGURES ===
+
+def current_rss_bytes() -> int:
+    """RSS courant du processus (/proc sous Linux, pic ru_maxrss sinon)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+@dataclass
+class RenderStats:
+    """Compteurs cumulés du RenderContext"""
+    renders: int = 0
+    failures: int = 0
+    figures_reclaimed: int = 0
+    resets: int = 0
+    live_figures: int = 0
+    rss_bytes: int = 0
+    rss_history: List[int] = field(default_factory=list)
+
+class RenderContext:
+    """
+    Possède le cycle de vie des figures matplotlib d'un rendu.
+    
+    Toute figure ouverte pendant le bloc `with context.render():` est fermée
+    à la sortie, en cas de succès comme d'exception : les helpers qui
+    lèvent entre plt.subplots() et _save_to_base64() ne laissent plus de
+    figure dans le gestionnaire global de pyplot.
+    
+    Si le nombre de figures vivantes dépasse max_live_figures malgré tout
+    (figures ouvertes hors contexte), l'état matplotlib est réinitialisé.
+    """
+    
+    def __init__(self, max_live_figures: int = 0, rss_sample_every: int = 100):
+        self.max_live_figures = max_live_figures
+        self.rss_sample_every = rss_sample_every
+        self.stats = RenderStats()
+    
+    @contextmanager
+    def render(self):
+        before = set(plt.get_fignums())
+        self.stats.renders += 1
+        try:
+            yield self
+        except BaseException:
+            self.stats.failures += 1
+            raise
+        finally:
+            leaked = set(plt.get_fignums()) - before
+            for num in leaked:
+                plt.close(num)
+            self.stats.figures_reclaimed += len(leaked)
+            self._check_drift()
+    
+    def _check_drift(self):
+        live = len(plt.get_fignums())
+        if live > self.max_live_figures:
+            self.reset()
+            live = len(plt.get_fignums())
+        self.stats.live_figures = live
+        
+        if self.stats.renders % self.rss_sample_every == 0:
+            self.stats.rss_bytes = current_rss_bytes()
+            self.stats.rss_history.append(self.stats.rss_bytes)
+    
+    def reset(self):
+        """Ferme toutes les figures et restaure l'état global de matplotlib"""
+        plt.close('all')
+        matplotlib.rcdefaults()
+        _apply_global_style()
+        gc.collect()
+        self.stats.resets += 1
+
+RENDER_CONTEXT = RenderContext()
 
 class VisualGenerator:
     """Générateur de visuels professionnels pour TestIQ"""
     
-    def __init__(self, config: VisualConfig = None):
+    def __init__(self, config: VisualConfig = None,
+                 on_placeholder: Optional[Callable[[Dict], None]] = None):
         self.config = config or VisualConfig()
+        # Appelé avec le placeholder (LQIP) avant l'encodage de l'image complète
+        self.on_placeholder = on_placeholder
         
-    def generate_matrix_rotation_visual(self, question_data: Dict) -> str:
+    def generate_matrix_rotation_visual(self, question_data: Dict, panel: str = STEM_PANEL) -> str:
         """
         Génère un visuel professionnel pour les matrices 2x2 avec rotations
         Retourne l'image en base64 pour intégration web
         """
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 7), dpi=self.config.dpi)
-        fig.suptitle('🔄 Matrice 2×2 avec Rotation 90° Horaire', 
-                     fontsize=self.config.title_size, fontweight='bold')
-        
-        # === MATRICE ORIGINALE ===
+        return self._render_panels(panel, '🔄 Matrice 2×2 avec Rotation 90° Horaire', (7, 7),
+                                   self._draw_rotation_matrix, self._draw_rotation_analysis)
+    
+    def _draw_rotation_matrix(self, ax1):
+        """Énoncé : matrice 2×2 avec l'élément manquant"""
         ax1.set_title('🔲 Matrice avec élément manquant', fontsize=16, pad=20)
         
         # Dessiner la grille de la matrice
         for i in range(3):
-            ax1.axhline(i, color='#333', linewidth=2)
-            ax1.axvline(i, color='#333', linewidth=2)
+            ax1.axhline(i, color=self.config.ink_color, linewidth=2)
+            ax1.axvline(i, color=self.config.ink_color, linewidth=2)
         
         # Placement des flèches avec style moderne
         arrows_data = [
@@ -96,8 +350,9 @@ class VisualGenerator:
         ax1.set_ylim(-0.5, 2.5)
         ax1.set_aspect('equal')
         ax1.axis('off')
-        
-        # === ANALYSE DE LA TRANSFORMATION ===
+    
+    def _draw_rotation_analysis(self, ax2):
+        """Solution : analyse de la rotation et réponse"""
         ax2.set_title('🔍 Analyse de la Rotation', fontsize=16, pad=20)
         
         # Cercle pour illustrer la rotation
@@ -157,19 +412,16 @@ class VisualGenerator:
         ax2.set_ylim(-0.8, 2.8)
         ax2.set_aspect('equal')
         ax2.axis('off')
-        
-        # Sauvegarde en base64
-        return self._save_to_base64(fig)
     
-    def generate_venn_diagram_visual(self, question_data: Dict) -> str:
+    def generate_venn_diagram_visual(self, question_data: Dict, panel: str = STEM_PANEL) -> str:
         """
         Génère un diagramme de Venn professionnel pour l'inclusion-exclusion
         """
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8), dpi=self.config.dpi)
-        fig.suptitle('🔢 Principe d\'Inclusion-Exclusion', 
-                     fontsize=self.config.title_size, fontweight='bold')
-        
-        # === DIAGRAMME DE VENN ===
+        return self._render_panels(panel, '🔢 Principe d\'Inclusion-Exclusion', (8, 8),
+                                   self._draw_venn_sets, self._draw_venn_calculation)
+    
+    def _draw_venn_sets(self, ax1):
+        """Énoncé : ensembles A et B, |A∪B| inconnu"""
         ax1.set_title('📊 Ensembles A et B', fontsize=16, pad=20)
         
         # Cercles avec transparence moderne
@@ -209,8 +461,9 @@ class VisualGenerator:
         ax1.set_ylim(0, 1)
         ax1.set_aspect('equal')
         ax1.axis('off')
-        
-        # === CALCUL STEP-BY-STEP ===
+    
+    def _draw_venn_calculation(self, ax2):
+        """Solution : calcul inclusion-exclusion étape par étape"""
         ax2.set_title('🧮 Calcul Inclusion-Exclusion', fontsize=16, pad=20)
         
         # Étapes de calcul avec visualisation
@@ -250,8 +503,6 @@ class VisualGenerator:
         ax2.set_xlim(0, 1)
         ax2.set_ylim(0, 1)
         ax2.axis('off')
-        
-        return self._save_to_base64(fig)
     
     def generate_sequence_visual(self, sequence_type: str, data: List) -> str:
         """Génère des visuels pour les suites numériques"""
@@ -283,9 +534,9 @@ class VisualGenerator:
                      fontsize=self.config.title_size, fontweight='bold', y=0.95)
         
         # Créer une grille de 3 sous-graphiques
-        ax1 = plt.subplot(131)
-        ax2 = plt.subplot(132)  
-        ax3 = plt.subplot(133)
+        ax1 = fig.add_subplot(131)
+        ax2 = fig.add_subplot(132)  
+        ax3 = fig.add_subplot(133)
         
         # === HYPERCUBE 4D (représentation conceptuelle) ===
         ax1.set_title('📐 Hypercube 4D (Tesseract)\nConceptuel', fontsize=14, pad=20)
@@ -327,6 +578,7 @@ class VisualGenerator:
         ax1.set_ylim(-0.5, 2)
         ax1.axis('off')
         
+        checkpoint('rotation 4D')
         # === ROTATION 4D ===
         ax2.set_title('🔄 Rotation 4D\n(axes xy, zw)', fontsize=14, pad=20)
         
@@ -358,7 +610,7 @@ class VisualGenerator:
         # Flèches de progression
         for i in range(3):
             ax2.annotate('', xy=((i+1)*0.3 - 0.1, 0.5), xytext=(i*0.3 + 0.5, 0.5),
-                        arrowprops=dict(arrowstyle='->', lw=2, color='gray'))
+                        arrowprops=dict(arrowstyle='->', lw=2, color=self.config.muted_color))
         
         ax2.text(0.6, -0.8, 'Rotation progressive dans l\'hyperespace', 
                 ha='center', va='center', fontsize=12, fontweight='bold',
@@ -368,6 +620,7 @@ class VisualGenerator:
         ax2.set_ylim(-1, 1.5)
         ax2.axis('off')
         
+        checkpoint('projection 2D')
         # === PROJECTION FINALE 2D ===
         ax3.set_title('📱 Projection 2D finale\n(ce qu\'on voit)', fontsize=14, pad=20)
         
@@ -477,7 +730,7 @@ class VisualGenerator:
         # Flèches de transformation
         for i in range(len(proj_vertices)):
             ax2.annotate('', xy=transformed_vertices[i], xytext=proj_vertices[i],
-                        arrowprops=dict(arrowstyle='->', color='gray', alpha=0.5))
+                        arrowprops=dict(arrowstyle='->', color=self.config.muted_color, alpha=0.5))
         
         ax2.set_aspect('equal')
         ax2.axis('off')
@@ -536,8 +789,8 @@ class VisualGenerator:
         
         # Grille
         for i in range(grid_size + 1):
-            ax.axhline(i * cell_size, color='gray', linewidth=1, alpha=0.5)
-            ax.axvline(i * cell_size, color='gray', linewidth=1, alpha=0.5)
+            ax.axhline(i * cell_size, color=self.config.muted_color, linewidth=1, alpha=0.5)
+            ax.axvline(i * cell_size, color=self.config.muted_color, linewidth=1, alpha=0.5)
         
         # Instructions
         ax.text(grid_size * cell_size / 2, -0.5, 
@@ -596,14 +849,14 @@ class VisualGenerator:
             start_x = i * 2 + 0.5
             end_x = (i + 1) * 2 - 0.5
             ax.annotate('', xy=(end_x, 0), xytext=(start_x, 0),
-                       arrowprops=dict(arrowstyle='->', color='gray', 
+                       arrowprops=dict(arrowstyle='->', color=self.config.muted_color, 
                                      alpha=0.7, lw=2))
         
         # Labels sous chaque position
         positions = ['Position 1', 'Position 2', 'Position 3', 'Position 4']
         for i, pos in enumerate(positions):
             ax.text(i * 2, -1, pos, ha='center', va='center', 
-                   fontsize=12, color='gray')
+                   fontsize=12, color=self.config.muted_color)
         
         # Explication de la règle
         ax.text(3, 1.5, 'Règle: Alternance ◼ → ◻ → ◼ → ?', 
@@ -617,13 +870,13 @@ class VisualGenerator:
         
         return self._save_to_base64(fig)
     
-    def generate_logic_diagram_visual(self, question_data: Dict) -> str:
+    def generate_logic_diagram_visual(self, question_data: Dict, panel: str = STEM_PANEL) -> str:
         """Génère des diagrammes logiques pour raisonnement"""
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8), dpi=self.config.dpi)
-        fig.suptitle('🧠 Diagramme de Raisonnement Logique', 
-                     fontsize=self.config.title_size, fontweight='bold')
-        
-        # === PRÉMISSES ===
+        return self._render_panels(panel, '🧠 Diagramme de Raisonnement Logique', (8, 8),
+                                   self._draw_logic_premises, self._draw_logic_deduction)
+    
+    def _draw_logic_premises(self, ax1):
+        """Énoncé : prémisses en cascade"""
         ax1.set_title('📝 Prémisses', fontsize=16, pad=20)
         
         # Dessiner des boîtes logiques
@@ -650,8 +903,9 @@ class VisualGenerator:
         ax1.set_xlim(0, 4)
         ax1.set_ylim(-0.5, 2.5)
         ax1.axis('off')
-        
-        # === CONCLUSION ===  
+    
+    def _draw_logic_deduction(self, ax2):
+        """Solution : diagramme de transitivité"""
         ax2.set_title('💡 Déduction Logique', fontsize=16, pad=20)
         
         # Diagramme de transitivité
@@ -690,9 +944,394 @@ class VisualGenerator:
         ax2.set_ylim(-0.5, 2.5)
         ax2.set_aspect('equal')
         ax2.axis('off')
+    
+    def generate_fractal_visual(self, question_data: Dict) -> str:
+        """
+        Génère un visuel fractal (temps d'échappement, IFS ou L-système).
+        
+        Paramètres optionnels dans question_data['fractal'] : kind, zoom,
+        center, c (Julia), max_iter, resolution, iterations, cmap.
+        Sans 'kind', le type est déduit du contenu (flocon de Koch par défaut).
+        """
+        spec = question_data.get('fractal', {})
+        content = question_data.get('content', '').lower()
+        kind = spec.get('kind') or next(
+            (name for keyword, name in FRACTAL_KEYWORDS.items() if keyword in content), 'koch')
+        cmap = spec.get('cmap', 'magma')
+        
+        if kind in LSYSTEMS:
+            return self._generate_lsystem_visual(kind, spec.get('iterations', 3))
+        
+        fig, ax = plt.subplots(figsize=(10, 8), dpi=self.config.dpi)
+        
+        if kind in ESCAPE_KINDS:
+            ax.set_title('🌀 Ensemble de Mandelbrot' if kind == 'mandelbrot' else '🌀 Ensemble de Julia',
+                         fontsize=16, pad=20)
+            center = tuple(spec.get('center', (-0.5, 0.0) if kind == 'mandelbrot' else (0.0, 0.0)))
+            width = 3.0 / spec.get('zoom', 1)
+            resolution = tuple(spec.get('resolution', (8 * self.config.dpi, 6 * self.config.dpi)))
+            counts = escape_time(kind, center, width, resolution, spec.get('max_iter', 200),
+                                 complex(*spec.get('c', (-0.8, 0.156))))
+            checkpoint('imshow')
+            height = width * resolution[1] / resolution[0]
+            ax.imshow(counts, cmap=cmap, interpolation='nearest',
+                      extent=(center[0] - width / 2, center[0] + width / 2,
+                              center[1] - height / 2, center[1] + height / 2))
+        else:
+            ax.set_title('🔺 Fractale par Système de Fonctions Itérées', fontsize=16, pad=20)
+            # Résolution carrée : un entier, ou [n, n] venu du JSON (clé de cache hachable)
+            resolution = spec.get('resolution', 4 * self.config.dpi)
+            if isinstance(resolution, (list, tuple)):
+                resolution = max(resolution)
+            density, extent = ifs_density(kind if kind in IFS_SYSTEMS else 'sierpinski_triangle',
+                                          int(resolution))
+            checkpoint('imshow')
+            ax.imshow(np.log1p(density), cmap=cmap, interpolation='nearest', extent=extent)
+        
+        ax.set_aspect('equal')
+        ax.axis('off')
+        
+        return self._save_to_base64(fig)
+    
+    def _generate_lsystem_visual(self, kind: str, iterations: int) -> str:
+        """Itérations successives d'un L-système, la suivante étant à trouver"""
+        iterations = max(1, int(iterations))
+        fig, axes = plt.subplots(1, iterations + 1, figsize=(4 * (iterations + 1), 5),
+                                 dpi=self.config.dpi, squeeze=False)
+        axes = axes[0]
+        fig.suptitle('❄️ Fractale Auto-Similaire : quelle est l\'itération suivante ?',
+                     fontsize=self.config.title_size, fontweight='bold')
+        
+        colors = [self.config.accent_color, self.config.success_color, self.config.warning_color]
+        for level, ax in enumerate(axes[:-1], start=1):
+            checkpoint(f'itération {level}')
+            path = lsystem_path(kind, level)
+            ax.plot(path[:, 0], path[:, 1], color=colors[(level - 1) % len(colors)], linewidth=1.5)
+            ax.set_title(f'Itération {level}', fontsize=14)
+            ax.set_aspect('equal')
+            ax.axis('off')
+        
+        question_ax = axes[-1]
+        question_ax.add_patch(FancyBboxPatch((0.1, 0.1), 0.8, 0.8, boxstyle="round,pad=0.05",
+                                             facecolor=self.config.error_color, alpha=0.2,
+                                             edgecolor=self.config.error_color, linewidth=3))
+        question_ax.text(0.5, 0.5, '?', ha='center', va='center', fontsize=48,
+                         fontweight='bold', color=self.config.error_color)
+        question_ax.set_title(f'Itération {iterations + 1}', fontsize=14)
+        question_ax.set_xlim(0, 1)
+        question_ax.set_ylim(0, 1)
+        question_ax.set_aspect('equal')
+        question_ax.axis('off')
+        
+        return self._save_to_base64(fig)
+    
+    def generate_graph_visual(self, question_data: Dict) -> str:
+        """
+        Génère un graphe (sommets + arêtes) à partir de question_data['graph'] :
+        {'nodes': [...], 'edges': [[a, b], ...], 'layout': 'force'|'tree'|'circular',
+         'highlight': [sommets à mettre en évidence]}
+        Les arêtes sont dessinées en une seule LineCollection.
+        """
+        content = question_data.get('content', '').lower()
+        default_layout = 'tree' if 'arbre' in content else 'force'
+        graph = question_data.get('graph') or SAMPLE_GRAPHS[default_layout]
+        layout = graph.get('layout', default_layout)
+        
+        labels, edges = normalize_graph(graph)
+        positions = compute_layout(len(labels), edges, layout)
+        checkpoint('dessin du graphe')
+        
+        fig, ax = plt.subplots(figsize=(10, 8), dpi=self.config.dpi)
+        ax.set_title('🌳 Arbre' if layout == 'tree' else '🕸️ Graphe', fontsize=16, pad=20)
+        
+        if edges:
+            ax.add_collection(LineCollection(positions[np.asarray(edges)], colors=self.config.muted_color,
+                                             linewidths=1.5 if len(labels) <= GRAPH_LABEL_LIMIT else 0.5,
+                                             alpha=0.8, zorder=1))
+        
+        highlight = {str(node) for node in graph.get('highlight', [])}
+        colors = [self.config.error_color if label in highlight else self.config.accent_color
+                  for label in labels]
+        small = len(labels) <= GRAPH_LABEL_LIMIT
+        ax.scatter(positions[:, 0], positions[:, 1], s=600 if small else 20, c=colors,
+                   edgecolors='white', linewidths=2 if small else 0, zorder=2)
+        
+        if small:
+            for label, (x, y) in zip(labels, positions):
+                ax.text(x, y, label, ha='center', va='center', fontsize=12,
+                       fontweight='bold', color='white', zorder=3)
+        
+        ax.set_xlim(-1.15, 1.15)
+        ax.set_ylim(-1.15, 1.15)
+        ax.set_aspect('equal')
+        ax.axis('off')
+        
+        return self._save_to_base64(fig)
+    
+    def generate_truth_table_visual(self, question_data: Dict, panel: str = STEM_PANEL) -> str:
+        """
+        Table de vérité + schéma de portes d'une expression booléenne
+        (question_data['expression'] ou extraite de l'énoncé).
+        Toutes les cellules forment un seul QuadMesh, les portes une
+        PolyCollection et les fils une LineCollection.
+        Sans expression lisible, diagramme logique générique (panneau demandé).
+        
+        L'énoncé (panel='stem') ne montre que les valeurs des variables : les
+        colonnes calculées (étapes et résultat) sont vides (« ? »). Le schéma
+        de portes ne porte que la structure, jamais de valeur évaluée.
+        """
+        source = question_data.get('expression') or extract_expression(question_data.get('content', ''))
+        if not source:
+            return self.generate_logic_diagram_visual(question_data, panel)
+        
+        try:
+            headers, table = truth_table(source)
+            labels, edges = gate_graph(source)
+        except BooleanSyntaxError:
+            return self.generate_logic_diagram_visual(question_data, panel)
+        n_rows, n_cols = table.shape
+        n_variables = n_rows.bit_length() - 1
+        show_gates = len(labels) <= GATE_DIAGRAM_LIMIT
+        
+        if show_gates:
+            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8), dpi=self.config.dpi,
+                                           gridspec_kw={'width_ratios': [max(n_cols, 3), 4]})
+        else:
+            fig, ax1 = plt.subplots(figsize=(10, 8), dpi=self.config.dpi)
+        fig.suptitle(f'🔣 {_shorten(headers[-1], 60)}', fontsize=self.config.title_size, fontweight='bold')
+        fig.subplots_adjust(top=0.8)
+        
+        # === TABLE DE VÉRITÉ ===
+        # Codes couleur : 2 × rôle de la colonne (variable, étape, résultat) + valeur,
+        # 6 pour une cellule masquée de l'énoncé
+        # (une expression réduite à une variable n'a qu'une colonne, qui est le résultat)
+        roles = np.ones(n_cols, dtype=int)
+        roles[:n_variables] = 0
+        roles[-1] = 2
+        hidden = np.zeros(n_cols, dtype=bool)
+        if panel == STEM_PANEL:
+            hidden[n_variables:] = True
+        codes = np.where(hidden[None, :], 6, roles[None, :] * 2 + table)
+        cmap = ListedColormap(['#ECEFF1', '#B0BEC5', '#FFF3E0', '#FFB74D',
+                               self.config.error_color, self.config.success_color, 'white'])
+        ax1.pcolormesh(codes, cmap=cmap, vmin=0, vmax=6, edgecolors='#CFD8DC' if hidden.any() else 'white',
+                       linewidth=1 if n_rows <= TRUTH_TABLE_TEXT_ROWS else 0)
+        
+        if n_rows <= TRUTH_TABLE_TEXT_ROWS:
+            for (row, col), value in np.ndenumerate(table):
+                if hidden[col]:
+                    text, color = '?', self.config.muted_color
+                else:
+                    text = '1' if value else '0'
+                    color = 'white' if col == n_cols - 1 else self.config.ink_color
+                ax1.text(col + 0.5, row + 0.5, text, ha='center', va='center',
+                        fontsize=12, fontweight='bold', color=color)
+        
+        ax1.set_xticks(np.arange(n_cols) + 0.5)
+        ax1.set_xticklabels([_shorten(header, TRUTH_TABLE_HEADER_CHARS) for header in headers],
+                            fontsize=11 if n_cols <= 6 else 8, fontweight='bold')
+        ax1.xaxis.tick_top()
+        ax1.set_yticks([])
+        ax1.set_xlim(0, n_cols)
+        ax1.set_ylim(n_rows, 0)
+        ax1.grid(False)
+        ax1.set_xlabel(f'📋 Table de vérité ({n_rows} lignes)', fontsize=16, labelpad=12)
+        
+        # === SCHÉMA DE PORTES ===
+        if show_gates:
+            checkpoint('schéma de portes')
+            # Disposition en arbre, sortie à droite ; entrées alignées à gauche
+            tree = compute_layout(len(labels), edges, 'tree')
+            positions = np.column_stack((tree[:, 1], tree[:, 0]))
+            is_input = np.ones(len(labels), dtype=bool)
+            is_input[[gate for gate, _ in edges]] = False
+            positions[is_input, 0] = -1.0
+            
+            if edges:
+                wires = np.array([[positions[b], positions[a]] for a, b in edges])
+                ax2.add_collection(LineCollection(wires, colors=self.config.muted_color, linewidths=2, zorder=1))
+            
+            gates = ~is_input
+            half = np.array([[-0.13, -0.09], [0.13, -0.09], [0.13, 0.09], [-0.13, 0.09]])
+            ax2.add_collection(PolyCollection(positions[gates][:, None, :] + half,
+                                              facecolors=self.config.accent_color,
+                                              edgecolors='white', linewidths=2, zorder=2))
+            ax2.scatter(positions[is_input, 0], positions[is_input, 1], s=700,
+                       c=self.config.warning_color, edgecolors='white', linewidths=2, zorder=2)
+            
+            for label, (x, y) in zip(labels, positions):
+                ax2.text(x, y, label, ha='center', va='center', fontsize=11,
+                        fontweight='bold', color='white', zorder=3)
+            ax2.annotate('', xy=(positions[0, 0] + 0.35, positions[0, 1]),
+                        xytext=(positions[0, 0] + 0.13, positions[0, 1]),
+                        arrowprops=dict(arrowstyle='->', lw=2, color=self.config.success_color))
+            
+            ax2.set_xlim(-1.2, 1.5)
+            ax2.set_ylim(-1.2, 1.2)
+            ax2.axis('off')
+            ax2.set_title('🔌 Schéma de portes', fontsize=16, pad=20)
+        
+        return self._save_to_base64(fig)
+    
+    def generate_matrix_dsl_visual(self, dsl_spec: Dict) -> str:
+        """
+        Génère une grille 3×3 + options à partir d'une spécification DSL
+        (même format que backend/scripts/matrix-dsl.js).
+        
+        Les options sont soit fournies dans dsl_spec['options'] (liste de
+        spécifications déjà mélangées), soit construites à partir de la
+        réponse correcte et des distracteurs, mélangées de façon déterministe.
+        """
+        matrix, target_cell, options = self._prepare_dsl_item(dsl_spec)
+        
+        fig, ax = plt.subplots(figsize=(10, 12), dpi=self.config.dpi)
+        fig.suptitle('🧩 Matrice 3×3', fontsize=self.config.title_size, fontweight='bold')
+        
+        # Options sur une ligne sous la grille, dans le même axe
+        n_options = len(options)
+        option_x = 1.5 + (np.arange(n_options) - (n_options - 1) / 2) * 0.9
+        option_centers = np.column_stack((option_x, np.full(n_options, -1.0)))
+        
+        self._draw_dsl_stem(ax, matrix, target_cell, extra_specs=options,
+                            extra_centers=option_centers)
+        
+        # Cadres et lettres des options
+        for i, (x, y) in enumerate(option_centers):
+            ax.add_patch(Rectangle((x - 0.4, y - 0.4), 0.8, 0.8, fill=False,
+                                   edgecolor=self.config.muted_color, linewidth=1))
+            ax.text(x, y - 0.55, chr(65 + i), ha='center', va='center',
+                   fontsize=14, fontweight='bold')
+        
+        ax.set_xlim(-0.5, 3.5)
+        ax.set_ylim(-1.8, 3.2)
+        ax.set_aspect('equal')
+        ax.axis('off')
         
         return self._save_to_base64(fig)
     
+    def generate_sprite_sheet(self, dsl_spec: Dict) -> Dict:
+        """
+        Rend la matrice et toutes les options dans une seule image (sprite sheet)
+        en une passe, avec la carte des coordonnées en pixels.
+        
+        Retourne {'image': data URI, 'width', 'height',
+                  'map': {'stem': [x, y, w, h], 'A': [...], ...}}
+        avec l'origine en haut à gauche, directement utilisable en CSS
+        (background-position) ou dans un canvas.
+        """
+        matrix, target_cell, options = self._prepare_dsl_item(dsl_spec)
+        n_options = len(options)
+        
+        # Grille carrée en haut, une ligne d'options carrées en dessous
+        fig_width = max(n_options, 3) * 1.5
+        fig_height = 3 * 1.5 + 1.5
+        fig = plt.figure(figsize=(fig_width, fig_height), dpi=self.config.dpi)
+        
+        stem_width = 3 * 1.5 / fig_width
+        stem_ax = fig.add_axes([(1 - stem_width) / 2, 1.5 / fig_height,
+                                stem_width, 3 * 1.5 / fig_height])
+        self._draw_dsl_stem(stem_ax, matrix, target_cell)
+        stem_ax.set_xlim(-0.05, 3.05)
+        stem_ax.set_ylim(-0.05, 3.05)
+        
+        option_axes = {}
+        for i, spec in enumerate(options):
+            option_id = chr(65 + i)
+            ax = fig.add_axes([(i * 1.5 + 0.1) / fig_width, 0.1 / fig_height,
+                               1.3 / fig_width, 1.3 / fig_height])
+            self._draw_dsl_glyphs(ax, [spec], np.array([[0.5, 0.5]]))
+            ax.add_patch(Rectangle((0.05, 0.05), 0.9, 0.9, fill=False,
+                                   edgecolor=self.config.muted_color, linewidth=1))
+            ax.set_xlim(0, 1)
+            ax.set_ylim(0, 1)
+            option_axes[option_id] = ax
+        
+        for ax in [stem_ax, *option_axes.values()]:
+            ax.set_aspect('equal')
+            ax.axis('off')
+        
+        # Pas de bbox_inches='tight' : les positions des axes restent valides
+        width, height = (fig.get_size_inches() * self.config.dpi).round().astype(int)
+        coordinate_map = {
+            name: self._axes_pixel_box(ax, width, height)
+            for name, ax in [('stem', stem_ax), *option_axes.items()]
+        }
+        
+        return {
+            'image': self._save_to_base64(fig, tight=False),
+            'width': int(width),
+            'height': int(height),
+            'map': coordinate_map
+        }
+    
+    def _prepare_dsl_item(self, dsl_spec: Dict) -> Tuple[List[List[Dict]], Tuple[int, int], List[Dict]]:
+        """Construit la grille, la case cible et les options d'un item DSL"""
+        matrix = build_dsl_matrix(dsl_spec)
+        target = dsl_spec.get('target', {'row': 2, 'col': 2})
+        target_cell = (target['row'], target['col'])
+        
+        options = dsl_spec.get('options')
+        if options is None:
+            seed = hashlib.md5(json.dumps(dsl_spec, sort_keys=True).encode()).hexdigest()
+            rng = random.Random(seed)
+            correct = matrix[target_cell[0]][target_cell[1]]
+            options = [correct] + build_dsl_distractors(
+                correct, dsl_spec.get('distractors', ['wrong_angle', 'wrong_sides', 'wrong_style']), rng)
+            rng.shuffle(options)
+        
+        return matrix, target_cell, list(options)
+    
+    def _draw_dsl_stem(self, ax, matrix: List[List[Dict]], target_cell: Tuple[int, int],
+                       extra_specs: List[Dict] = (), extra_centers: np.ndarray = None):
+        """Dessine la grille 3×3 (glyphes, lignes, case manquante) dans l'axe donné"""
+        cells = [matrix[row][col] for row in range(3) for col in range(3)
+                 if (row, col) != target_cell]
+        rows, cols = np.divmod(np.arange(9), 3)
+        keep = (rows != target_cell[0]) | (cols != target_cell[1])
+        centers = np.column_stack((cols[keep] + 0.5, 2.5 - rows[keep]))
+        
+        if len(extra_specs):
+            cells = cells + list(extra_specs)
+            centers = np.vstack((centers, extra_centers))
+        
+        self._draw_dsl_glyphs(ax, cells, centers)
+        
+        for i in range(4):
+            ax.plot([0, 3], [i, i], color=self.config.ink_color, linewidth=2)
+            ax.plot([i, i], [0, 3], color=self.config.ink_color, linewidth=2)
+        
+        target_x, target_y = target_cell[1], 2 - target_cell[0]
+        ax.add_patch(Rectangle((target_x + 0.1, target_y + 0.1), 0.8, 0.8, fill=False,
+                               edgecolor=self.config.error_color, linewidth=2, linestyle='--'))
+        ax.text(target_x + 0.5, target_y + 0.5, '?', ha='center', va='center',
+               fontsize=36, fontweight='bold', color=self.config.error_color)
+    
+    @staticmethod
+    def _axes_pixel_box(ax, width: int, height: int) -> List[int]:
+        """Boîte [x, y, w, h] d'un axe en pixels, origine en haut à gauche"""
+        ax.apply_aspect()
+        box = ax.get_position()
+        x0, x1 = box.x0 * width, box.x1 * width
+        y0, y1 = (1 - box.y1) * height, (1 - box.y0) * height
+        return [int(round(x0)), int(round(y0)), int(round(x1 - x0)), int(round(y1 - y0))]
+    
+    def _draw_dsl_glyphs(self, ax, specs: List[Dict], centers: np.ndarray):
+        """Dessine tous les glyphes DSL en une seule PolyCollection"""
+        polygons = [
+            _dsl_glyph_vertices(spec.get('sides', 4), spec.get('angle', 0) % 360,
+                                spec.get('scale', 1)) + center
+            for spec, center in zip(specs, centers)
+        ]
+        styles = [DSL_STYLES.get(spec.get('style', 'outline'), DSL_STYLES['outline'])
+                  for spec in specs]
+        
+        ax.add_collection(PolyCollection(
+            polygons,
+            facecolors=[style['fill'] for style in styles],
+            edgecolors=[style['stroke'] for style in styles],
+            linewidths=[style['stroke_width'] for style in styles]
+        ))
+    
     def _generate_fibonacci_visual(self, ax, data):
         """Visualisation spéciale pour Fibonacci avec spirale dorée"""
         ax.set_title('🌀 Suite de Fibonacci avec Spirale Dorée', fontsize=16, pad=20)
@@ -734,7 +1373,7 @@ class VisualGenerator:
         ax.set_aspect('equal')
         ax.grid(True, alpha=0.3)
         
-        return self._save_to_base64(plt.gcf())
+        return self._save_to_base64(ax.figure)
     
     def _generate_arithmetic_visual(self, ax, data):
         """Visualisation pour suite arithmétique"""
@@ -760,7 +1399,7 @@ class VisualGenerator:
         ax.set_xlabel('Position')
         ax.set_ylabel('Valeur')
         
-        return self._save_to_base64(plt.gcf())
+        return self._save_to_base64(ax.figure)
     
     def _generate_geometric_visual(self, ax, data):
         """Visualisation pour suite géométrique"""
@@ -775,7 +1414,7 @@ class VisualGenerator:
         ax.set_xlabel('Position')
         ax.set_ylabel('Valeur (log)')
         
-        return self._save_to_base64(plt.gcf())
+        return self._save_to_base64(ax.figure)
     
     def _generate_generic_sequence_visual(self, ax, data):
         """Visualisation générique pour suites"""
@@ -790,7 +1429,7 @@ class VisualGenerator:
         ax.set_xlabel('Position')
         ax.set_ylabel('Valeur')
         
-        return self._save_to_base64(plt.gcf())
+        return self._save_to_base64(ax.figure)
     
     def _draw_cube_wireframe(self, ax, vertices, color, alpha=0.7, linewidth=2):
         """Dessine un cube en fil de fer"""
@@ -822,44 +1461,278 @@ class VisualGenerator:
         # Remplir légèrement
         ax.fill(polygon_x, polygon_y, color=color, alpha=0.1)
     
-    def _save_to_base64(self, fig) -> str:
+    def _render_panels(self, panel: str, title: str, panel_size: Tuple[float, float],
+                       draw_stem: Callable, draw_solution: Callable) -> str:
+        """
+        Figure d'un visuel à deux volets : énoncé seul, solution seule, ou
+        les deux côte à côte (explication, l'ancienne figure complète).
+        """
+        drawers = {STEM_PANEL: [draw_stem], SOLUTION_PANEL: [draw_solution],
+                   EXPLANATION_PANEL: [draw_stem, draw_solution]}[panel]
+        width, height = panel_size
+        fig, axes = plt.subplots(1, len(drawers), figsize=(width * len(drawers), height),
+                                 dpi=self.config.dpi, squeeze=False)
+        fig.suptitle(title, fontsize=self.config.title_size, fontweight='bold')
+        for ax, draw in zip(axes[0], drawers):
+            checkpoint(draw.__name__)
+            draw(ax)
+        return self._save_to_base64(fig)
+    
+    def _save_to_base64(self, fig, tight: bool = True) -> str:
         """Convertit la figure matplotlib en base64 pour intégration web"""
-        buffer = io.BytesIO()
-        fig.savefig(buffer, format='png', bbox_inches='tight', 
-                   facecolor=self.config.bg_color, dpi=self.config.dpi)
-        buffer.seek(0)
+        return self._png_to_visual(self._encode_figure(fig, tight))
+    
+    def _png_to_visual(self, png_data: bytes) -> str:
+        """Forme renvoyée par les generate_* (data URI ; octets bruts dans les workers)"""
+        img_base64 = base64.b64encode(png_data).decode()
         
-        # Encodage base64
-        img_base64 = base64.b64encode(buffer.getvalue()).decode()
+        return f"data:image/png;base64,{img_base64}"
+    
+    def degraded(self) -> 'VisualGenerator':
+        """Même générateur en profil économique (DPI réduit, pas d'optimisation PNG)"""
+        return type(self)(replace(self.config, dpi=min(self.config.dpi, DEGRADED_DPI), png_profile=None),
+                          self.on_placeholder)
+    
+    def unavailable_visual(self) -> str:
+        """Placeholder « visuel indisponible », encodé une fois par couleurs"""
+        return self._png_to_visual(_unavailable_png(self.config.bg_color, self.config.muted_color))
+    
+    def _encode_figure(self, fig, tight: bool = True) -> bytes:
+        """
+        Octets PNG de la figure (encodés selon config.png_profile), puis
+        fermeture. Un seul rendu raster : le placeholder (LQIP) est tiré du
+        tampon Agg avant l'encodage, puis ce même tampon est encodé. Avec
+        ou sans callback, l'image encodée est la même.
+        """
+        checkpoint('rasterisation')
+        image = self._rasterize(fig, tight)
         plt.close(fig)
         
-        return f"data:image/png;base64,{img_base64}"
+        if self.on_placeholder is not None:
+            self.on_placeholder(make_placeholder(image))
+        
+        checkpoint('encodage')
+        if self.config.png_profile:
+            return optimize_image(image, self.config.png_profile)
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        return buffer.getvalue()
+    
+    def _rasterize(self, fig, tight: bool) -> Image.Image:
+        """
+        Tampon RGBA de la figure au DPI de la config. tight recadre comme
+        bbox_inches='tight' (boîte englobante + savefig.pad_inches, arrondie
+        au pixel vers l'extérieur), sans dépasser les bords de la figure.
+        """
+        fig.set_dpi(self.config.dpi)
+        fig.patch.set_facecolor(self.config.bg_color)
+        canvas = fig.canvas if isinstance(fig.canvas, FigureCanvasAgg) else FigureCanvasAgg(fig)
+        canvas.draw()
+        
+        pixels = np.asarray(canvas.buffer_rgba())
+        if tight:
+            height, width = pixels.shape[:2]
+            bbox = fig.get_tightbbox(canvas.get_renderer()).padded(plt.rcParams['savefig.pad_inches'])
+            x0, y0, x1, y1 = np.array(bbox.extents) * self.config.dpi
+            left, right = max(int(np.floor(x0)), 0), min(int(np.ceil(x1)), width)
+            top, bottom = max(int(np.floor(height - y1)), 0), min(int(np.ceil(height - y0)), height)
+            pixels = pixels[top:bottom, left:right]
+        return Image.fromarray(pixels.copy())
 
 # === FONCTIONS D'INTERFACE ===
 
-def generate_visual_for_question(question_id: str, question_data: Dict) -> str:
+def generate_sprite_sheet_for_question(question_id: str, question_data: Dict) -> Optional[Dict]:
+    """
+    Sprite sheet (matrice + options en une image) avec carte des coordonnées.
+    Retourne None si la question n'a pas d'options graphiques (DSL).
+    """
+    dsl_spec = question_data.get('dsl')
+    if dsl_spec is None and question_data.get('type') == 'matrix3x3':
+        dsl_spec = question_data
+    
+    if dsl_spec is None:
+        return None
+    
+    with RENDER_CONTEXT.render():
+        return VisualGenerator().generate_sprite_sheet(dsl_spec)
+
+def generate_visual_for_question(question_id: str, question_data: Dict,
+                                 store: Optional[VisualStore] = None,
+                                 config: Optional[VisualConfig] = None,
+                                 on_placeholder: Optional[Callable[[Dict], None]] = None,
+                                 profile: Optional[bool] = None,
+                                 theme: str = DEFAULT_THEME,
+                                 panel: str = STEM_PANEL,
+                                 deadline: Optional[float] = None) -> str:
     """
     Point d'entrée principal pour générer un visuel selon le type de question
+    
+    Si un VisualStore est fourni, le visuel y est cherché puis enregistré :
+    les questions qui produisent la même image partagent un seul blob.
+    
+    on_placeholder reçoit, avant l'encodage de l'image complète, un dict
+    {'placeholder': data URI < 1 Ko, 'dominant_color', 'width', 'height'}.
+    Il n'est pas appelé si le visuel vient du store.
+    
+    profile=True force le profilage de ce rendu, False l'interdit ; None
+    laisse RENDER_PROFILER décider selon son taux d'échantillonnage.
+    
+    theme choisit un thème précompilé (visual_themes.THEME_SPECS) appliqué
+    à ce seul rendu ; chaque thème a sa propre entrée de cache.
+    
+    panel choisit le volet des visuels énoncé/solution (Venn, logique,
+    matrice avec rotation) : 'stem' (défaut, sans la réponse), 'solution'
+    ou 'explanation' (les deux côte à côte, pour la revue). Chaque panneau
+    a sa propre entrée de cache ; les visuels à un seul volet sont
+    identiques pour tous les panneaux (un seul blob dans le store).
+    
+    deadline (secondes) borne la durée du rendu : au-delà, visuel en
+    profil économique ou placeholder (voir _render_within_deadline),
+    jamais enregistré dans le store.
+    """
+    return generate_visual_with_outcome(question_id, question_data, store, config, on_placeholder,
+                                        profile, theme, panel, deadline)[0]
+
+def generate_visual_with_outcome(question_id: str, question_data: Dict,
+                                 store: Optional[VisualStore] = None,
+                                 config: Optional[VisualConfig] = None,
+                                 on_placeholder: Optional[Callable[[Dict], None]] = None,
+                                 profile: Optional[bool] = None,
+                                 theme: str = DEFAULT_THEME,
+                                 panel: str = STEM_PANEL,
+                                 deadline: Optional[float] = None) -> Tuple[str, str]:
+    """
+    Comme generate_visual_for_question, mais retourne (visuel, issue) avec
+    issue = FULL | DEGRADED | PLACEHOLDER (FULL pour un visuel du store).
+    """
+    if panel not in VISUAL_PANELS:
+        raise ValueError(f"Panneau inconnu: {panel} (disponibles: {', '.join(VISUAL_PANELS)})")
+    visual_theme = get_theme(theme)
+    key = cache_key(question_id, question_data, theme, panel, config)
+    if store is not None:
+        cached = store.get_data_uri(key)
+        if cached is not None:
+            return cached, FULL
+    
+    generator = VisualGenerator(visual_theme.configure(config or VisualConfig()), on_placeholder)
+    with RENDER_PROFILER.profile(question_id, force=profile), RENDER_CONTEXT.render(), \
+            visual_theme.context():
+        visual, outcome = _render_within_deadline(
+            generator, question_data, panel, None if deadline is None else Deadline.after(deadline), key)
+    
+    if store is not None and visual and outcome == FULL:
+        store.put_data_uri(key, visual)
+    
+    return visual, outcome
+
+def _close_figures_since(before: set):
+    for num in set(plt.get_fignums()) - before:
+        plt.close(num)
+
+def _emit_once(callback: Callable[[Dict], None]) -> Callable[[Dict], None]:
+    """Callback de placeholder appelé au plus une fois (rendu complet puis économique)"""
+    sent = []
+    
+    def emit(placeholder: Dict):
+        if not sent:
+            sent.append(True)
+            callback(placeholder)
+    return emit
+
+def _render_within_deadline(generator: VisualGenerator, question_data: Dict, panel: str,
+                            deadline: Optional[Deadline], cost_key: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Rendu complet si le temps restant le permet, sinon profil économique,
+    sinon placeholder. Retourne (visuel, FULL | DEGRADED | PLACEHOLDER).
+    
+    Le rendu complet s'arrête avant l'échéance, en gardant de quoi faire le
+    rendu économique ; il n'est pas tenté si son coût habituel pour cette
+    question (cost_key) dépasse le temps restant. Après une interruption,
+    ce coût n'est qu'une borne qui décroît à chaque rendu non tenté.
     """
-    generator = VisualGenerator()
+    if deadline is None:
+        start = time.perf_counter()
+        visual = _render_visual_for_question(generator, question_data, panel)
+        DEADLINE_TRACKER.observe(FULL, time.perf_counter() - start, cost_key)
+        return visual, FULL
+    
+    DEADLINE_TRACKER.count('renders')
+    if generator.on_placeholder is not None:
+        generator = type(generator)(generator.config, _emit_once(generator.on_placeholder))
+    if deadline.expired():
+        DEADLINE_TRACKER.count('placeholders')
+        return generator.unavailable_visual(), PLACEHOLDER
+    
+    before = set(plt.get_fignums())
+    full_cost = DEADLINE_TRACKER.estimate(FULL, cost_key)
+    if full_cost is None or full_cost <= deadline.remaining():
+        reserve = DEADLINE_TRACKER.reserve(deadline, cost_key)
+        start = time.perf_counter()
+        try:
+            with deadline_scope(deadline.earlier(reserve)):
+                visual = _render_visual_for_question(generator, question_data, panel)
+            DEADLINE_TRACKER.observe(FULL, time.perf_counter() - start, cost_key)
+            DEADLINE_TRACKER.count('completed' if not deadline.expired() else 'late')
+            return visual, FULL
+        except RenderTimeout:
+            # Pas une mesure : borne inférieure, qui décroît à chaque rendu non tenté
+            DEADLINE_TRACKER.interrupted(FULL, time.perf_counter() - start + reserve, cost_key)
+            DEADLINE_TRACKER.count('timeouts')
+            _close_figures_since(before)
+    else:
+        DEADLINE_TRACKER.skipped(FULL, cost_key)
+    
+    start = time.perf_counter()
+    try:
+        with deadline_scope(deadline):
+            visual = _render_visual_for_question(generator.degraded(), question_data, panel)
+        DEADLINE_TRACKER.observe(DEGRADED, time.perf_counter() - start, cost_key)
+        DEADLINE_TRACKER.count('degraded' if not deadline.expired() else 'late')
+        return visual, DEGRADED
+    except RenderTimeout:
+        _close_figures_since(before)
     
+    DEADLINE_TRACKER.count('placeholders')
+    return generator.unavailable_visual(), PLACEHOLDER
+
+def _render_visual_for_question(generator: VisualGenerator, question_data: Dict,
+                                panel: str = STEM_PANEL) -> str:
+    """Sélectionne et exécute le rendu adapté à la question"""
     # Détection automatique du type de visuel nécessaire
     content = question_data.get('content', '').lower()
     category = question_data.get('category', '')
     visual_pattern = question_data.get('visualPattern', '')
     
+    # === GRILLES DSL (matrix-dsl.js) ===
+    dsl_spec = question_data.get('dsl')
+    if dsl_spec is None and question_data.get('type') == 'matrix3x3':
+        dsl_spec = question_data
+    
+    if dsl_spec is not None:
+        return generator.generate_matrix_dsl_visual(dsl_spec)
+    
     # === SÉRIE DE CARRÉS ALTERNÉS (Question 5) ===
-    if visual_pattern == 'alternating_squares_series':
+    elif visual_pattern == 'alternating_squares_series':
         return generator.generate_alternating_squares_visual(question_data)
     
     # === MATRICES ET ROTATIONS ===
     elif 'matrice' in content and 'rotation' in content:
-        return generator.generate_matrix_rotation_visual(question_data)
+        return generator.generate_matrix_rotation_visual(question_data, panel)
+    
+    # === FRACTALES (avant Venn : « ensemble de Mandelbrot ») ===
+    elif 'fractal' in question_data or any(keyword in content for keyword in FRACTAL_ROUTE_KEYWORDS):
+        return generator.generate_fractal_visual(question_data)
+    
+    # === TABLES DE VÉRITÉ (expression booléenne lisible) ===
+    elif 'expression' in question_data or (
+            any(keyword in content for keyword in TRUTH_TABLE_KEYWORDS) and
+            extract_expression(question_data.get('content', ''))):
+        return generator.generate_truth_table_visual(question_data, panel)
     
     # === ENSEMBLES ET DIAGRAMMES DE VENN ===
     elif ('inclusion-exclusion' in content or 'ensemble' in content or 
           '∪' in content or '∩' in content or 'venn' in content):
-        return generator.generate_venn_diagram_visual(question_data)
+        return generator.generate_venn_diagram_visual(question_data, panel)
     
     # === SUITES NUMÉRIQUES ===
     elif 'fibonacci' in content:
@@ -871,18 +1744,22 @@ def generate_visual_for_question(question_id: str, question_data: Dict) -> str:
     elif any(keyword in content for keyword in ['transformation', '3d', '4d', 'géométrique', 'spatial']):
         return generator.generate_spatial_transformation_visual(question_data)
     
+    # === GRAPHES ET ARBRES ===
+    elif 'graph' in question_data or any(keyword in content for keyword in GRAPH_KEYWORDS):
+        return generator.generate_graph_visual(question_data)
+    
     # === COMPLÉTION DE MOTIFS ===
     elif any(keyword in content for keyword in ['motif', 'pattern', 'complétez', 'manque']):
         return generator.generate_pattern_completion_visual(question_data)
     
     # === RAISONNEMENT LOGIQUE ===
     elif any(keyword in content for keyword in ['logique', 'si.*alors', 'déduction', 'raisonnement']):
-        return generator.generate_logic_diagram_visual(question_data)
+        return generator.generate_logic_diagram_visual(question_data, panel)
     
     # === PAR CATÉGORIE ===
     elif category == 'spatial':
         if 'matrice' in content or 'rotation' in content:
-            return generator.generate_matrix_rotation_visual(question_data)
+            return generator.generate_matrix_rotation_visual(question_data, panel)
         elif 'transformation' in content:
             return generator.generate_spatial_transformation_visual(question_data)
         else:
@@ -890,9 +1767,9 @@ def generate_visual_for_question(question_id: str, question_data: Dict) -> str:
     
     elif category == 'logique':
         if 'ensemble' in content or '∪' in content:
-            return generator.generate_venn_diagram_visual(question_data)
+            return generator.generate_venn_diagram_visual(question_data, panel)
         else:
-            return generator.generate_logic_diagram_visual(question_data)
+            return generator.generate_logic_diagram_visual(question_data, panel)
     
     elif category == 'numerique':
         return generator.generate_sequence_visual('arithmetic', [1,2,3,4,5,6])
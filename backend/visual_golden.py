@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+🖼️ IMAGES DE RÉFÉRENCE DES VISUELS TESTIQ
+========================================
+
+Garde-fou des optimisations de VisualGenerator (backends, profils DPI,
+collections, chemins Pillow...) : chaque route de
+generate_visual_for_question (ROUTE_SAMPLES, plus les panneaux solution
+des visuels énoncé/solution) est rendue à bas DPI et comparée à une
+image de référence. Quelques routes repassent aussi par les chemins
+d'optimisation (placeholder LQIP, échéance) et sont comparées à la
+référence du rendu simple : ces chemins doivent donner la même image.
+Un rendu vide, une référence absente ou modifiée (SHA-256 du manifeste)
+sont des échecs.
+
+Comparaison vectorisée NumPy, avec tolérances :
+- part des pixels dont l'écart (max sur R, G, B) dépasse un seuil
+- SSIM moyen en niveaux de gris (fenêtre 7×7, moyennes par image intégrale)
+En cas d'échec, diff/<cas>.png montre référence | rendu | carte des écarts.
+
+Flux de travail : --update sur le commit de départ, puis comparaison après
+chaque modification. Les références dépendent des versions de matplotlib
+et des polices : manifest.json les enregistre et l'écart est signalé.
+
+Usage: python3 visual_golden.py [--update] [--dir visual_golden] [--dpi 30] [--only venn,logic]
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import PIL
+from PIL import Image
+
+from visual_generator import (SOLUTION_PANEL, STEM_PANEL, VisualConfig,
+                              generate_visual_for_question)
+from visual_soak import ROUTE_SAMPLES
+from visual_store import DATA_URI_PREFIX
+
+GOLDEN_DPI = 30
+SSIM_WINDOW = 7
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+SPLIT_ROUTES = ('matrix_rotation', 'venn', 'logic', 'truth_table')    # panneau solution vérifié en plus
+FAST_PATH_ROUTES = ('venn', 'fibonacci', 'logic', 'fractal_escape')   # rendus aussi en LQIP / échéance
+GOLDEN_DEADLINE = 60.0          # échéance assez large pour un rendu complet
+
+@dataclass
+class Tolerance:
+    pixel_threshold: float = 24.0      # écart (0-255) au-delà duquel un pixel diffère
+    max_diff_ratio: float = 0.001      # part maximale de pixels différents
+    min_ssim: float = 0.99
+
+@dataclass
+class Comparison:
+    name: str
+    passed: bool
+    reason: str = ''
+    diff_ratio: float = 0.0
+    max_diff: float = 0.0
+    ssim: float = 1.0
+    heatmap_path: Optional[str] = None
+
+@dataclass
+class GoldenCase:
+    name: str
+    question_id: str
+    data: Dict
+    panel: str = STEM_PANEL
+    placeholder: bool = False           # rendu avec on_placeholder (chemin LQIP)
+    deadline: Optional[float] = None    # rendu avec échéance (chemin _render_within_deadline)
+    reference: Optional[str] = None     # référence d'un autre cas (même image attendue)
+
+    @property
+    def golden_name(self) -> str:
+        return self.reference or self.name
+
+def golden_cases() -> List[GoldenCase]:
+    """
+    Une question par route, le panneau solution des visuels à deux volets,
+    puis les chemins LQIP et échéance de quelques routes (comparés à la
+    référence du rendu simple) et le placeholder d'une échéance expirée.
+    """
+    cases = [GoldenCase(sample['id'], sample['id'], sample['data']) for sample in ROUTE_SAMPLES]
+    cases += [GoldenCase(f"{sample['id']}_{SOLUTION_PANEL}", sample['id'], sample['data'], SOLUTION_PANEL)
+              for sample in ROUTE_SAMPLES if sample['id'] in SPLIT_ROUTES]
+    for sample in ROUTE_SAMPLES:
+        if sample['id'] in FAST_PATH_ROUTES:
+            cases.append(GoldenCase(f"{sample['id']}_lqip", sample['id'], sample['data'],
+                                    placeholder=True, reference=sample['id']))
+            cases.append(GoldenCase(f"{sample['id']}_deadline", sample['id'], sample['data'],
+                                    deadline=GOLDEN_DEADLINE, reference=sample['id']))
+    first = ROUTE_SAMPLES[0]
+    cases.append(GoldenCase('unavailable', first['id'], first['data'], deadline=0.0))
+    return cases
+
+def render_case(case: GoldenCase, config: VisualConfig) -> Tuple[bytes, str]:
+    """
+    Octets PNG du cas, par le point d'entrée public (sans store ni
+    profilage), et motif d'échec propre au chemin ('' si aucun).
+    """
+    placeholders: List[Dict] = []
+    visual = generate_visual_for_question(case.question_id, case.data, config=config, profile=False,
+                                          panel=case.panel, deadline=case.deadline,
+                                          on_placeholder=placeholders.append if case.placeholder else None)
+    data = base64.b64decode(visual[len(DATA_URI_PREFIX):]) if visual else b''
+    if case.placeholder and len(placeholders) != 1:
+        return data, f"{len(placeholders)} placeholder(s) émis au lieu d'un"
+    return data, ''
+
+# === COMPARAISON ===
+
+def load_rgb(data: bytes) -> np.ndarray:
+    """Image (H, W, 3) en float32, transparence composée sur fond blanc"""
+    image = Image.open(io.BytesIO(data)).convert('RGBA')
+    pixels = np.asarray(image, dtype=np.float32)
+    alpha = pixels[..., 3:] / 255
+    return pixels[..., :3] * alpha + 255 * (1 - alpha)
+
+def _box_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Moyenne sur toutes les fenêtres window×window entièrement dans l'image"""
+    integral = np.pad(values, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    return (integral[window:, window:] - integral[:-window, window:]
+            - integral[window:, :-window] + integral[:-window, :-window]) / (window * window)
+
+def ssim(golden: np.ndarray, actual: np.ndarray, window: int = SSIM_WINDOW) -> float:
+    """SSIM moyen en niveaux de gris (fenêtres uniformes)"""
+    weights = np.array([0.299, 0.587, 0.114])
+    x = golden.astype(np.float64) @ weights
+    y = actual.astype(np.float64) @ weights
+    if min(x.shape) < window:
+        return 1.0 if np.array_equal(x, y) else 0.0
+    mean_x, mean_y = _box_mean(x, window), _box_mean(y, window)
+    var_x = _box_mean(x * x, window) - mean_x ** 2
+    var_y = _box_mean(y * y, window) - mean_y ** 2
+    covariance = _box_mean(x * y, window) - mean_x * mean_y
+    index = ((2 * mean_x * mean_y + SSIM_C1) * (2 * covariance + SSIM_C2)) / \
+            ((mean_x ** 2 + mean_y ** 2 + SSIM_C1) * (var_x + var_y + SSIM_C2))
+    return float(index.mean())
+
+def compare_images(name: str, golden: bytes, actual: bytes, tolerance: Tolerance,
+                   diff_dir: Optional[str] = None) -> Comparison:
+    """Compare deux PNG ; écrit la carte des écarts dans diff_dir en cas d'échec"""
+    if not actual:
+        return Comparison(name, False, 'rendu vide')
+    if not golden:
+        return Comparison(name, False, 'référence vide')
+    if golden == actual:
+        return Comparison(name, True, 'identique')
+
+    expected, rendered = load_rgb(golden), load_rgb(actual)
+    reasons = []
+    if expected.shape != rendered.shape:
+        reasons.append(f"taille {expected.shape[1]}×{expected.shape[0]} → {rendered.shape[1]}×{rendered.shape[0]}")
+        height = min(expected.shape[0], rendered.shape[0])
+        width = min(expected.shape[1], rendered.shape[1])
+        expected, rendered = expected[:height, :width], rendered[:height, :width]
+
+    difference = np.abs(expected - rendered).max(axis=2)
+    result = Comparison(name, True,
+                        diff_ratio=float((difference > tolerance.pixel_threshold).mean()),
+                        max_diff=float(difference.max()),
+                        ssim=ssim(expected, rendered))
+    if result.diff_ratio > tolerance.max_diff_ratio:
+        reasons.append(f"{result.diff_ratio:.2%} de pixels différents")
+    if result.ssim < tolerance.min_ssim:
+        reasons.append(f"SSIM {result.ssim:.4f}")
+
+    result.passed = not reasons
+    result.reason = ', '.join(reasons) or 'dans les tolérances'
+    if not result.passed and diff_dir:
+        result.heatmap_path = write_heatmap(os.path.join(diff_dir, f"{name}.png"),
+                                            expected, rendered, difference)
+    return result
+
+def write_heatmap(path: str, expected: np.ndarray, rendered: np.ndarray, difference: np.ndarray) -> str:
+    """Référence | rendu | écarts (palette inferno) côte à côte"""
+    heat = matplotlib.colormaps['inferno'](difference / 255.0)[..., :3] * 255
+    strip = np.concatenate([expected, rendered, heat], axis=1)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.fromarray(np.clip(strip, 0, 255).astype(np.uint8)).save(path)
+    return path
+
+# === RÉFÉRENCES ===
+
+def _environment() -> Dict:
+    return {'matplotlib': matplotlib.__version__, 'numpy': np.__version__, 'pillow': PIL.__version__}
+
+class GoldenSet:
+    """Dossier de références : <cas>.png + manifest.json (DPI, versions, SHA-256)"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self.manifest: Dict = {'images': {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, f"{name}.png")
+
+    def get(self, name: str) -> Tuple[Optional[bytes], str]:
+        """(octets de la référence, '') ou (None, motif) si absente, illisible ou modifiée"""
+        expected = self.manifest['images'].get(name)
+        if expected is None:
+            return None, 'pas de référence (lancer --update)'
+        try:
+            with open(self.path(name), 'rb') as f:
+                data = f.read()
+        except OSError as error:
+            return None, f"référence illisible ({error.strerror}: {self.path(name)})"
+        if hashlib.sha256(data).hexdigest() != expected:
+            return None, 'référence modifiée (SHA-256 différent du manifeste)'
+        return data, ''
+
+    def put(self, name: str, data: bytes):
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.path(name), 'wb') as f:
+            f.write(data)
+        self.manifest['images'][name] = hashlib.sha256(data).hexdigest()
+
+    def save(self, dpi: int):
+        self.manifest.update(dpi=dpi, environment=_environment())
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+
+def run_golden(root: str, dpi: int = GOLDEN_DPI, update: bool = False, only: Optional[List[str]] = None,
+               tolerance: Optional[Tolerance] = None) -> Tuple[List[Comparison], float]:
+    """Rend tous les cas ; met à jour les références ou les compare. Retourne (résultats, secondes)"""
+    tolerance = tolerance or Tolerance()
+    goldens = GoldenSet(root)
+    config = VisualConfig(dpi=dpi)
+    cases = [case for case in golden_cases() if not only or case.name in only]
+    diff_dir = os.path.join(root, 'diff')
+    results = []
+
+    start = time.perf_counter()
+    for case in cases:
+        actual, problem = render_case(case, config)
+        if problem or not actual:
+            results.append(Comparison(case.name, False, problem or 'rendu vide'))
+        elif update and case.reference is None:
+            goldens.put(case.name, actual)
+            results.append(Comparison(case.name, True, 'référence enregistrée'))
+        else:
+            # Avec --update, les chemins LQIP / échéance sont comparés à la référence juste enregistrée
+            golden, problem = goldens.get(case.golden_name)
+            results.append(Comparison(case.name, False, problem) if golden is None
+                           else compare_images(case.name, golden, actual, tolerance, diff_dir))
+
+    if update:
+        goldens.save(dpi)
+    return results, time.perf_counter() - start
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Comparaison des visuels aux images de référence")
+    parser.add_argument('--dir', default='visual_golden')
+    parser.add_argument('--dpi', type=int, default=None, help=f"défaut : celui des références, sinon {GOLDEN_DPI}")
+    parser.add_argument('--update', action='store_true', help="réenregistre les références")
+    parser.add_argument('--only', default=None, help="cas à traiter, séparés par des virgules")
+    parser.add_argument('--pixel-threshold', type=float, default=Tolerance.pixel_threshold)
+    parser.add_argument('--max-diff-ratio', type=float, default=Tolerance.max_diff_ratio)
+    parser.add_argument('--min-ssim', type=float, default=Tolerance.min_ssim)
+    args = parser.parse_args()
+
+    manifest = GoldenSet(args.dir).manifest
+    dpi = args.dpi or manifest.get('dpi', GOLDEN_DPI)
+    if not args.update:
+        if manifest.get('dpi', dpi) != dpi:
+            print(f"❌ Références rendues à {manifest['dpi']} DPI, comparaison demandée à {dpi} DPI")
+            return 1
+        recorded = manifest.get('environment')
+        if recorded and recorded != _environment():
+            print(f"⚠️  Références produites avec {recorded}, environnement actuel {_environment()}")
+
+    only = args.only.split(',') if args.only else None
+    tolerance = Tolerance(args.pixel_threshold, args.max_diff_ratio, args.min_ssim)
+    results, seconds = run_golden(args.dir, dpi, args.update, only, tolerance)
+
+    print(f"🖼️ {len(results)} visuels à {dpi} DPI en {seconds:.1f}s")
+    for result in results:
+        metrics = '' if result.reason in ('identique', 'référence enregistrée') or not result.max_diff else \
+            f"  (écart max {result.max_diff:.0f}, {result.diff_ratio:.3%} px, SSIM {result.ssim:.4f})"
+        print(f"   {'✅' if result.passed else '❌'} {result.name:<22} {result.reason}{metrics}"
+              + (f"\n      ↳ {result.heatmap_path}" if result.heatmap_path else ''))
+
+    failures = sum(1 for result in results if not result.passed)
+    print("✅ Aucune régression visuelle" if not failures else f"❌ {failures} visuel(s) en écart")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+🕸️ DISPOSITION DE GRAPHES TESTIQ
+===============================
+
+Calcule les positions des sommets pour les questions de théorie des
+graphes (graphe, arbre, réseau) avec des itérations NumPy vectorisées :
+- force : Fruchterman-Reingold, toutes les paires traitées en une opération
+- arbre : parcours en largeur par fronts, largeur ∝ nombre de feuilles
+- cercle : sommets régulièrement répartis
+
+Les dispositions sont mises en cache par empreinte du graphe.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+LAYOUTS = ('force', 'tree', 'circular')
+LAYOUT_CACHE_SIZE = 128
+FORCE_ITERATIONS = 60
+
+_layout_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+def graph_hash(n_nodes: int, edges: Sequence[Sequence[int]], layout: str, seed: int = 0) -> str:
+    """Empreinte stable d'un graphe et de sa disposition"""
+    canonical = sorted(tuple(sorted(edge)) for edge in edges)
+    payload = json.dumps([n_nodes, canonical, layout, seed])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def _adjacency(n_nodes: int, edges: np.ndarray) -> np.ndarray:
+    adjacency = np.zeros((n_nodes, n_nodes), dtype=bool)
+    if len(edges):
+        adjacency[edges[:, 0], edges[:, 1]] = True
+        adjacency[edges[:, 1], edges[:, 0]] = True
+    return adjacency
+
+def circular_layout(n_nodes: int) -> np.ndarray:
+    angles = np.pi / 2 - 2 * np.pi * np.arange(n_nodes) / max(n_nodes, 1)
+    return np.column_stack((np.cos(angles), np.sin(angles)))
+
+def force_layout(n_nodes: int, edges: np.ndarray, iterations: int = FORCE_ITERATIONS,
+                 seed: int = 0) -> np.ndarray:
+    """Fruchterman-Reingold : répulsion k²/d entre toutes les paires, attraction d²/k sur les arêtes"""
+    rng = np.random.default_rng(seed)
+    positions = rng.random((n_nodes, 2)) * 2 - 1
+    adjacency = _adjacency(n_nodes, edges).astype(float)
+    k = np.sqrt(4.0 / max(n_nodes, 1))
+    temperature = 0.2
+
+    for _ in range(iterations):
+        delta = positions[:, None, :] - positions[None, :, :]
+        distance = np.maximum(np.linalg.norm(delta, axis=-1), 1e-3)
+        # Force scalaire (répulsion - attraction) projetée sur chaque direction
+        strength = k * k / distance ** 2 - adjacency * distance / k
+        displacement = np.einsum('ij,ijk->ik', strength, delta)
+
+        length = np.maximum(np.linalg.norm(displacement, axis=-1, keepdims=True), 1e-9)
+        positions += displacement / length * np.minimum(length, temperature)
+        temperature *= 0.95
+
+    return positions
+
+def tree_layout(n_nodes: int, edges: np.ndarray, root: int = 0) -> np.ndarray:
+    """
+    Disposition en arbre : niveaux par parcours en largeur, puis chaque
+    sommet reçoit une largeur proportionnelle à son nombre de feuilles.
+    Les deux passes (feuilles vers racine, racine vers feuilles) traitent
+    un niveau entier à la fois.
+    """
+    adjacency = _adjacency(n_nodes, edges)
+    depth = np.full(n_nodes, -1)
+    parent = np.full(n_nodes, -1)
+    levels = []
+
+    frontier = np.zeros(n_nodes, dtype=bool)
+    frontier[root] = True
+    depth[root] = 0
+    while frontier.any():
+        level_nodes = np.flatnonzero(frontier)
+        levels.append(level_nodes)
+        children = adjacency[level_nodes] & (depth == -1)
+        reached = children.any(axis=0)
+        parent[reached] = level_nodes[children[:, reached].argmax(axis=0)]
+        depth[reached] = len(levels)
+        frontier = reached
+
+    # Feuilles cumulées de bas en haut
+    has_children = np.zeros(n_nodes, dtype=bool)
+    has_children[parent[parent >= 0]] = True
+    weight = (~has_children).astype(float)
+    for level_nodes in reversed(levels[1:]):
+        np.add.at(weight, parent[level_nodes], weight[level_nodes])
+
+    # Intervalles de haut en bas : les enfants partagent celui de leur parent
+    left = np.zeros(n_nodes)
+    for level_nodes in levels[1:]:
+        ordered = level_nodes[np.argsort(parent[level_nodes], kind='stable')]
+        offsets = np.cumsum(weight[ordered]) - weight[ordered]
+        _, group_start, group_size = np.unique(parent[ordered], return_index=True, return_counts=True)
+        offsets -= np.repeat(offsets[group_start], group_size)
+        left[ordered] = left[parent[ordered]] + offsets
+
+    x = left + weight / 2
+
+    # Sommets non atteints (forêt) : alignés sur un niveau supplémentaire
+    orphans = depth == -1
+    depth[orphans] = len(levels)
+    x[orphans] = np.linspace(0, weight[root], orphans.sum() + 2)[1:-1]
+
+    return np.column_stack((x, -depth.astype(float)))
+
+def compute_layout(n_nodes: int, edges: Sequence[Sequence[int]], layout: str = 'force',
+                   seed: int = 0) -> np.ndarray:
+    """Positions (N × 2) dans [-1, 1]², depuis le cache si le graphe est connu"""
+    key = graph_hash(n_nodes, edges, layout, seed)
+    if key in _layout_cache:
+        _layout_cache.move_to_end(key)
+        return _layout_cache[key]
+
+    edge_array = np.asarray(edges, dtype=int).reshape(-1, 2)
+    if n_nodes == 0:
+        positions = np.zeros((0, 2))
+        positions.setflags(write=False)
+        return positions
+    if layout == 'tree':
+        positions = tree_layout(n_nodes, edge_array)
+    elif layout == 'circular':
+        positions = circular_layout(n_nodes)
+    else:
+        positions = force_layout(n_nodes, edge_array, seed=seed)
+
+    # Normalisation dans [-1, 1]² pour un cadrage constant
+    span = np.ptp(positions, axis=0)
+    positions = (positions - positions.min(axis=0)) / np.where(span > 0, span, 1) * 2 - 1
+    positions.setflags(write=False)
+
+    _layout_cache[key] = positions
+    if len(_layout_cache) > LAYOUT_CACHE_SIZE:
+        _layout_cache.popitem(last=False)
+    return positions
+
+def normalize_graph(graph: Dict) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """
+    Accepte des arêtes par indices ou par libellés de sommets.
+    Retourne (libellés, arêtes en indices).
+    """
+    labels = [str(node) for node in graph.get('nodes', [])]
+    index = {label: i for i, label in enumerate(labels)}
+    edges = []
+    for a, b in graph.get('edges', []):
+        for endpoint in (a, b):
+            if not isinstance(endpoint, int) and str(endpoint) not in index:
+                index[str(endpoint)] = len(labels)
+                labels.append(str(endpoint))
+        edges.append((a if isinstance(a, int) else index[str(a)],
+                      b if isinstance(b, int) else index[str(b)]))
+
+    n_nodes = max([len(labels)] + [max(edge) + 1 for edge in edges])
+    labels += [str(i) for i in range(len(labels), n_nodes)]
+    return labels, edges
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+📈 TEST DE CHARGE DU SERVICE DE VISUELS TESTIQ
+=============================================
+
+Rejoue un mélange réaliste de questions contre un point d'entrée de rendu
+et balaie la charge pour trouver où le service sature :
+
+- cibles : 'inprocess' (RenderScheduler, sans HTTP), 'workers'
+  (RenderWorkerPool + store) ou 'http' (visual_server.py déjà lancé)
+- charge fermée (--concurrency 1,2,4 : N clients qui enchaînent) ou
+  ouverte (--rate 0.5,1,2 : arrivées de Poisson par seconde) ; en charge
+  ouverte la latence part de l'instant d'arrivée prévu, attente côté
+  client comprise (pas d'omission coordonnée)
+- mélange : les questions du corpus telles que /api/visual les envoie
+  (raven_questions.js lu via node, sinon ROUTE_SAMPLES de visual_soak.py),
+  plus une part de questions inédites (--fresh-rate) qui ratent le cache
+
+Chaque palier démarre avec un cache froid (identifiants préfixés par le
+palier) et rapporte débit, percentiles de latence, taux de succès du
+cache, profils servis (échéances), CPU et RSS échantillonnés dans /proc
+(processus de rendu compris). Le coude de la courbe est le palier de
+puissance maximale (débit / latence moyenne, critère de Kleinrock).
+
+Usage: python3 visual_loadtest.py --target inprocess --concurrency 1,2,4,8 [--duration 15]
+       python3 visual_loadtest.py --target workers --workers 4 --rate 1,2,4,8
+       python3 visual_loadtest.py --target http --url http://127.0.0.1:8765 --server-pid 1234 --rate 1,2,4
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from visual_deadlines import FULL
+from visual_generator import VisualConfig
+from visual_server import RenderScheduler
+from visual_soak import ROUTE_SAMPLES
+from visual_store import VisualStore, cache_key
+from visual_workers import RenderWorkerPool
+
+CORPUS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raven_questions.js')
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+# === CORPUS ===
+
+def load_corpus(path: Optional[str] = None) -> List[Dict]:
+    """
+    Questions [{'id', 'data'}] : fichier JSON fourni, sinon raven_questions.js
+    (charge utile de /api/visual : content + category), sinon ROUTE_SAMPLES.
+    """
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    try:
+        output = subprocess.run(['node', '-e', f"console.log(JSON.stringify(require({json.dumps(CORPUS_SCRIPT)})))"],
+                                capture_output=True, text=True, timeout=30, check=True).stdout
+        questions = json.loads(output)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return ROUTE_SAMPLES
+    return [{'id': f"Q{question.get('questionIndex', index + 1)}",
+             'data': {'content': question.get('content', ''), 'category': question.get('category', 'general')}}
+            for index, question in enumerate(questions)]
+
+# === CIBLES ===
+
+class RenderTarget(ABC):
+    """Point d'entrée de rendu : render() retourne (visuel non vide, servi par le cache, profil)"""
+    name = 'abstract'
+
+    @abstractmethod
+    def render(self, question_id: str, question_data: Dict) -> Tuple[bool, bool, str]:
+        """Rend une question ; bloque jusqu'au résultat"""
+
+    def pids(self) -> List[int]:
+        """Processus dont le CPU et la RSS sont échantillonnés"""
+        return [os.getpid()]
+
+    def close(self):
+        pass
+
+class InProcessTarget(RenderTarget):
+    name = 'inprocess'
+
+    def __init__(self, config: VisualConfig, deadline: Optional[float] = None):
+        self._dir = tempfile.TemporaryDirectory(prefix='visual_loadtest_')
+        self.scheduler = RenderScheduler(VisualStore(self._dir.name), config)
+        self.deadline = deadline
+
+    def render(self, question_id: str, question_data: Dict) -> Tuple[bool, bool, str]:
+        result = self.scheduler.render(question_id, question_data, deadline=self.deadline)
+        return bool(result['visual']), result['cached'], \
+            'timed_out' if result.get('timed_out') else result.get('outcome', FULL)
+
+    def close(self):
+        self._dir.cleanup()
+
+class WorkerPoolTarget(RenderTarget):
+    """Store devant un RenderWorkerPool (comme un serveur multi-processus)"""
+    name = 'workers'
+
+    def __init__(self, config: VisualConfig, workers: Optional[int] = None,
+                 deadline: Optional[float] = None):
+        self._dir = tempfile.TemporaryDirectory(prefix='visual_loadtest_')
+        self.store = VisualStore(self._dir.name)
+        self.config = config
+        self.pool = RenderWorkerPool(workers, config)
+        self.deadline = deadline
+        self._lock = threading.Lock()
+
+    def render(self, question_id: str, question_data: Dict) -> Tuple[bool, bool, str]:
+        key = cache_key(question_id, question_data, config=self.config)
+        with self._lock:
+            if key in self.store:
+                return True, True, FULL
+        with self.pool.render(dict(question_data, id=question_id), deadline=self.deadline) as png:
+            if len(png) and png.outcome == FULL:
+                with self._lock:
+                    self.store.put(key, png.tobytes())
+            return len(png) > 0, False, png.outcome
+
+    def pids(self) -> List[int]:
+        return [os.getpid(), *self.pool.worker_pids()]
+
+    def close(self):
+        self.pool.close()
+        self._dir.cleanup()
+
+class HttpTarget(RenderTarget):
+    """visual_server.py lancé à part ; --server-pid pour échantillonner son CPU et sa RSS"""
+    name = 'http'
+
+    def __init__(self, url: str, server_pid: Optional[int] = None, deadline: Optional[float] = None):
+        self.url = url.rstrip('/')
+        self.server_pid = server_pid
+        self.deadline = deadline
+
+    def render(self, question_id: str, question_data: Dict) -> Tuple[bool, bool, str]:
+        payload = {'id': question_id, 'question': question_data}
+        if self.deadline is not None:
+            payload['deadline_ms'] = self.deadline * 1000
+        request = urllib.request.Request(f"{self.url}/render", json.dumps(payload).encode(),
+                                         {'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=300) as response:
+            result = json.load(response)
+        return bool(result['visual']), result['cached'], \
+            'timed_out' if result.get('timed_out') else result.get('outcome', FULL)
+
+    def pids(self) -> List[int]:
+        return [self.server_pid] if self.server_pid else []
+
+# === ÉCHANTILLONNAGE CPU / RSS ===
+
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+def _process_usage(pid: int) -> Tuple[float, int]:
+    """(secondes CPU utilisateur + système, RSS en octets) d'après /proc"""
+    with open(f'/proc/{pid}/stat', 'r') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    with open(f'/proc/{pid}/statm', 'r') as f:
+        rss_pages = int(f.read().split()[1])
+    return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS, rss_pages * _PAGE_SIZE
+
+class ResourceSampler(threading.Thread):
+    """Relève CPU (% d'un cœur, tous processus cumulés) et RSS à intervalle fixe"""
+
+    def __init__(self, pids: Callable[[], List[int]], interval: float = 0.5):
+        super().__init__(daemon=True, name='loadtest-sampler')
+        self.pids = pids
+        self.interval = interval
+        self.timeline: List[Tuple[float, float, int]] = []      # (t, cpu %, rss)
+        self._done = threading.Event()
+
+    def _usage(self) -> Dict[int, Tuple[float, int]]:
+        usage = {}
+        for pid in self.pids():
+            try:
+                usage[pid] = _process_usage(pid)
+            except (OSError, IndexError, ValueError):
+                pass
+        return usage
+
+    def run(self):
+        start = last_time = time.monotonic()
+        last = self._usage()
+        while not self._done.wait(self.interval):
+            now = time.monotonic()
+            usage = self._usage()
+            cpu = sum(seconds - last[pid][0] for pid, (seconds, _) in usage.items() if pid in last)
+            self.timeline.append((round(now - start, 2), round(100 * cpu / (now - last_time), 1),
+                                  sum(rss for _, rss in usage.values())))
+            last, last_time = usage, now
+
+    def stop(self) -> List[Tuple[float, float, int]]:
+        self._done.set()
+        self.join()
+        return self.timeline
+
+# === PALIERS DE CHARGE ===
+
+@dataclass
+class LevelResult:
+    """Mesures d'un palier (latences en millisecondes)"""
+    mode: str
+    level: float
+    completed: int = 0
+    errors: int = 0
+    unfinished: int = 0
+    empty: int = 0
+    seconds: float = 0.0
+    throughput: float = 0.0
+    latency_ms: Dict[str, float] = field(default_factory=dict)
+    cache_hit_ratio: float = 0.0
+    outcomes: Dict[str, int] = field(default_factory=dict)
+    cpu_percent: Dict[str, float] = field(default_factory=dict)
+    rss_mb: Dict[str, float] = field(default_factory=dict)
+    timeline: List[Tuple[float, float, int]] = field(default_factory=list)
+
+    @property
+    def power(self) -> float:
+        """Débit / latence moyenne : maximal au coude de la courbe de saturation"""
+        mean = self.latency_ms.get('mean', 0)
+        return self.throughput / mean if mean else 0.0
+
+class LoadGenerator:
+    def __init__(self, target: RenderTarget, corpus: List[Dict], fresh_rate: float = 0.2,
+                 seed: int = 0, sample_interval: float = 0.5):
+        self.target = target
+        self.corpus = corpus
+        self.fresh_rate = fresh_rate
+        self.sample_interval = sample_interval
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._levels_run = 0
+
+    def _next_request(self, namespace: str) -> Tuple[str, Dict]:
+        with self._lock:
+            question = self._random.choice(self.corpus)
+            fresh = self._random.random() < self.fresh_rate
+            suffix = f"#{self._random.getrandbits(32):08x}" if fresh else ''
+        return f"{question['id']}@{namespace}{suffix}", question['data']
+
+    def warmup(self, renders: int = 3):
+        """Quelques rendus hors mesure (imports, polices, workers)"""
+        for i in range(renders):
+            self.target.render(*self._next_request(f"warmup{i}"))
+
+    def run_level(self, mode: str, level: float, duration: float, max_in_flight: int = 64,
+                  drain: float = 30.0) -> LevelResult:
+        """Un palier : `level` clients (mode 'concurrency') ou arrivées/s (mode 'rate')"""
+        self._levels_run += 1
+        namespace = f"p{self._levels_run}"
+        records: List[Tuple[float, bool, bool, str]] = []     # (latence, visuel, cache, profil)
+        errors = Counter()
+        stop_at = time.monotonic() + duration
+
+        def send(scheduled: float):
+            question_id, question_data = self._next_request(namespace)
+            try:
+                visual, cached, outcome = self.target.render(question_id, question_data)
+            except Exception as error:
+                with self._lock:
+                    errors[type(error).__name__] += 1
+                return
+            with self._lock:
+                records.append((time.monotonic() - scheduled, visual, cached, outcome))
+
+        sampler = ResourceSampler(self.target.pids, self.sample_interval)
+        sampler.start()
+        start = time.monotonic()
+        unfinished = 0
+
+        if mode == 'concurrency':
+            def client():
+                while time.monotonic() < stop_at:
+                    send(time.monotonic())
+            clients = [threading.Thread(target=client, daemon=True) for _ in range(int(level))]
+            for thread in clients:
+                thread.start()
+            for thread in clients:
+                thread.join()
+        else:
+            executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='loadtest')
+            futures = []
+            arrival = start
+            while True:
+                with self._lock:
+                    arrival += self._random.expovariate(level)
+                if arrival >= stop_at:
+                    break
+                time.sleep(max(0.0, arrival - time.monotonic()))
+                futures.append(executor.submit(send, arrival))
+            # Arrivées terminées : on laisse `drain` secondes à la file pour se vider
+            drain_until = time.monotonic() + drain
+            for future in futures:
+                try:
+                    future.result(timeout=max(0.0, drain_until - time.monotonic()))
+                except Exception:
+                    pass
+            unfinished = sum(1 for future in futures if not future.done())
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        elapsed = time.monotonic() - start
+        timeline = sampler.stop()
+        return self._summarize(mode, level, records, errors, unfinished, elapsed, timeline)
+
+    @staticmethod
+    def _summarize(mode: str, level: float, records: List, errors: Counter, unfinished: int,
+                   elapsed: float, timeline: List) -> LevelResult:
+        result = LevelResult(mode=mode, level=level, completed=len(records),
+                             errors=sum(errors.values()), unfinished=unfinished,
+                             seconds=round(elapsed, 2), timeline=timeline)
+        if records:
+            latencies = np.array([record[0] for record in records]) * 1000
+            result.throughput = round(len(records) / elapsed, 2)
+            result.latency_ms = {f"p{p}": round(float(value), 1)
+                                 for p, value in zip(LATENCY_PERCENTILES, np.percentile(latencies, LATENCY_PERCENTILES))}
+            result.latency_ms.update(mean=round(float(latencies.mean()), 1), max=round(float(latencies.max()), 1))
+            result.cache_hit_ratio = round(sum(1 for record in records if record[2]) / len(records), 3)
+            result.empty = sum(1 for record in records if not record[1])
+            result.outcomes = dict(Counter(record[3] for record in records))
+        if timeline:
+            cpu = np.array([sample[1] for sample in timeline])
+            rss = np.array([sample[2] for sample in timeline]) / 2**20
+            result.cpu_percent = {'mean': round(float(cpu.mean()), 1), 'max': round(float(cpu.max()), 1)}
+            result.rss_mb = {'start': round(float(rss[0]), 1), 'max': round(float(rss.max()), 1)}
+        return result
+
+def find_knee(results: List[LevelResult]) -> Optional[LevelResult]:
+    """Palier de puissance maximale (au-delà, la latence croît plus vite que le débit)"""
+    candidates = [result for result in results if result.completed]
+    return max(candidates, key=lambda result: result.power) if candidates else None
+
+def _levels(text: str) -> List[float]:
+    return [float(value) for value in text.split(',') if value.strip()]
+
+def _print_level(result: LevelResult):
+    latency = result.latency_ms
+    unit = 'clients' if result.mode == 'concurrency' else 'req/s'
+    print(f"   {result.level:>6g} {unit:<7} {result.throughput:7.2f} req/s  "
+          f"p50 {latency.get('p50', 0):8.1f}  p95 {latency.get('p95', 0):8.1f}  p99 {latency.get('p99', 0):8.1f} ms  "
+          f"cache {result.cache_hit_ratio:5.1%}  CPU {result.cpu_percent.get('mean', 0):6.1f}%  "
+          f"RSS {result.rss_mb.get('max', 0):7.1f} Mo"
+          + (f"  erreurs {result.errors}" if result.errors else '')
+          + (f"  inachevées {result.unfinished}" if result.unfinished else '')
+          + (f"  {result.outcomes}" if set(result.outcomes) - {FULL} else ''))
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Test de charge du rendu des visuels")
+    parser.add_argument('--target', choices=['inprocess', 'workers', 'http'], default='inprocess')
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument('--concurrency', help="paliers de clients simultanés, ex. 1,2,4,8")
+    load.add_argument('--rate', help="paliers d'arrivées par seconde, ex. 0.5,1,2,4")
+    parser.add_argument('--duration', type=float, default=15.0, help="secondes par palier")
+    parser.add_argument('--fresh-rate', type=float, default=0.2, help="part de questions inédites (cache raté)")
+    parser.add_argument('--max-in-flight', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--dpi', type=int, default=VisualConfig.dpi)
+    parser.add_argument('--deadline-ms', type=float, default=None)
+    parser.add_argument('--url', default='http://127.0.0.1:8765')
+    parser.add_argument('--server-pid', type=int, default=None)
+    parser.add_argument('--corpus', default=None, help="JSON [{'id', 'data'}] au lieu de raven_questions.js")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', default=None, help="écrit les résultats détaillés (chronologies comprises)")
+    args = parser.parse_args()
+
+    mode, levels = ('rate', _levels(args.rate)) if args.rate else \
+        ('concurrency', _levels(args.concurrency or '1,2,4,8'))
+    config = VisualConfig(dpi=args.dpi)
+    deadline = None if args.deadline_ms is None else args.deadline_ms / 1000
+    if args.target == 'inprocess':
+        target = InProcessTarget(config, deadline)
+    elif args.target == 'workers':
+        target = WorkerPoolTarget(config, args.workers, deadline)
+    else:
+        target = HttpTarget(args.url, args.server_pid, deadline)
+
+    corpus = load_corpus(args.corpus)
+    print(f"📈 TEST DE CHARGE - cible {target.name}, {len(corpus)} questions, "
+          f"{len(levels)} paliers de {args.duration:g}s ({mode})")
+    results = []
+    try:
+        generator = LoadGenerator(target, corpus, args.fresh_rate, args.seed)
+        generator.warmup()
+        for level in levels:
+            results.append(generator.run_level(mode, level, args.duration, args.max_in_flight))
+            _print_level(results[-1])
+    finally:
+        target.close()
+
+    knee = find_knee(results)
+    if knee is not None:
+        best = max(results, key=lambda result: result.throughput)
+        print(f"🎯 Coude : {knee.level:g} ({knee.throughput:.2f} req/s, p95 {knee.latency_ms['p95']:.0f} ms) ; "
+              f"débit max {best.throughput:.2f} req/s à {best.level:g}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'target': target.name, 'mode': mode,
+                       'knee': None if knee is None else knee.level,
+                       'levels': [dict(result.__dict__, power=round(result.power, 5)) for result in results]},
+                      f, indent=2)
+        print(f"💾 Résultats détaillés: {args.json}")
+    return 0 if all(result.completed for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+🔣 LOGIQUE BOOLÉENNE TESTIQ
+==========================
+
+Analyse une expression booléenne (notation ∧ ∨ ¬ ⊕ → ↔, ou ET/OU/NON
+en majuscules, &, |, !, ^) et l'évalue sur les 2^n affectations en une seule passe :
+chaque variable est un plan de bits empaqueté (np.packbits) et chaque
+opérateur devient une opération bit à bit NumPy sur ces plans.
+
+Les expressions compilées et leurs tables de vérité sont mises en cache.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+MAX_VARIABLES = 12
+
+# Opérateurs binaires par priorité croissante
+BINARY_PRECEDENCE = [('iff',), ('implies',), ('or',), ('xor',), ('and',)]
+
+ASSOCIATIVE_OPERATORS = ('and', 'or', 'xor')
+
+OPERATOR_SYMBOLS = {
+    'not': '¬', 'and': '∧', 'or': '∨', 'xor': '⊕', 'implies': '→', 'iff': '↔'
+}
+
+# Graphie des portes dans le schéma
+GATE_LABELS = {
+    'not': 'NON', 'and': 'ET', 'or': 'OU', 'xor': 'OUX', 'implies': '⇒', 'iff': '⇔'
+}
+
+_TOKEN_ALIASES = {
+    '¬': 'not', '!': 'not', '~': 'not', 'NOT': 'not', 'NON': 'not',
+    '∧': 'and', '&': 'and', '&&': 'and', '·': 'and', 'AND': 'and', 'ET': 'and',
+    '∨': 'or', '|': 'or', '||': 'or', '+': 'or', 'OR': 'or', 'OU': 'or',
+    '⊕': 'xor', '^': 'xor', 'XOR': 'xor',
+    '→': 'implies', '⇒': 'implies', '->': 'implies', '=>': 'implies',
+    '↔': 'iff', '⇔': 'iff', '≡': 'iff', '<->': 'iff', '<=>': 'iff'
+}
+
+_TOKEN_PATTERN = re.compile(r'\s*(<->|<=>|->|=>|&&|\|\||[()¬!~∧&·∨|+⊕^→⇒↔⇔≡]|[A-Za-z_][A-Za-z0-9_]*|\S)')
+
+# Opérations sur plans de bits empaquetés (uint8)
+_BIT_OPERATIONS = {
+    'and': np.bitwise_and,
+    'or': np.bitwise_or,
+    'xor': np.bitwise_xor,
+    'implies': lambda a, b: np.bitwise_or(np.invert(a), b),
+    'iff': lambda a, b: np.invert(np.bitwise_xor(a, b))
+}
+
+class BooleanSyntaxError(ValueError):
+    """Expression booléenne illisible"""
+
+class CompiledExpression(NamedTuple):
+    """Expression analysée : arbre syntaxique (tuples) et variables triées"""
+    source: str
+    tree: Tuple
+    variables: Tuple[str, ...]
+
+def _tokenize(text: str) -> List[str]:
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if not match:
+            break
+        token = match.group(1)
+        position = match.end()
+        # Mots-clés en majuscules seulement : « et », « ou », « non » d'un
+        # énoncé restent des mots (donc pas une expression)
+        alias = _TOKEN_ALIASES.get(token)
+        if alias:
+            tokens.append(alias)
+        elif token in '()':
+            tokens.append(token)
+        elif re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', token):
+            tokens.append('$' + token)
+        else:
+            raise BooleanSyntaxError(f"Symbole inattendu: {token!r}")
+    return tokens
+
+class _Parser:
+    """Descente récursive : ↔ < → < ∨ < ⊕ < ∧ < ¬"""
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.position = 0
+
+    def parse(self) -> Tuple:
+        tree = self._binary(0)
+        if self.position != len(self.tokens):
+            raise BooleanSyntaxError(f"Jeton en trop: {self.tokens[self.position]!r}")
+        return tree
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _binary(self, level: int) -> Tuple:
+        if level == len(BINARY_PRECEDENCE):
+            return self._unary()
+        left = self._binary(level + 1)
+        while self._peek() in BINARY_PRECEDENCE[level]:
+            operator = self.tokens[self.position]
+            self.position += 1
+            # → est associatif à droite, les autres à gauche
+            right = self._binary(level) if operator == 'implies' else self._binary(level + 1)
+            left = (operator, left, right)
+        return left
+
+    def _unary(self) -> Tuple:
+        token = self._peek()
+        if token is None:
+            raise BooleanSyntaxError("Expression incomplète")
+        self.position += 1
+        if token == 'not':
+            return ('not', self._unary())
+        if token == '(':
+            tree = self._binary(0)
+            if self._peek() != ')':
+                raise BooleanSyntaxError("Parenthèse non fermée")
+            self.position += 1
+            return tree
+        if token.startswith('$'):
+            return ('var', token[1:])
+        raise BooleanSyntaxError(f"Opérande attendu, trouvé {token!r}")
+
+def _variables(tree: Tuple) -> List[str]:
+    if tree[0] == 'var':
+        return [tree[1]]
+    return [name for child in tree[1:] for name in _variables(child)]
+
+@lru_cache(maxsize=256)
+def compile_expression(source: str) -> CompiledExpression:
+    """Analyse une expression (mis en cache par texte source)"""
+    tokens = _tokenize(source)
+    if not tokens:
+        raise BooleanSyntaxError("Expression vide")
+    tree = _Parser(tokens).parse()
+    variables = tuple(sorted(set(_variables(tree))))
+    if len(variables) > MAX_VARIABLES:
+        raise BooleanSyntaxError(f"{len(variables)} variables (maximum {MAX_VARIABLES})")
+    return CompiledExpression(source, tree, variables)
+
+def format_expression(tree: Tuple, parent: Optional[str] = None) -> str:
+    """
+    Réécrit un arbre en notation symbolique. Un opérateur binaire imbriqué
+    garde ses parenthèses, sauf s'il répète un opérateur associatif.
+    """
+    if tree[0] == 'var':
+        return tree[1]
+    if tree[0] == 'not':
+        return '¬' + format_expression(tree[1], 'not')
+    text = (f"{format_expression(tree[1], tree[0])} {OPERATOR_SYMBOLS[tree[0]]} "
+            f"{format_expression(tree[2], tree[0])}")
+    if parent is None or (parent == tree[0] and parent in ASSOCIATIVE_OPERATORS):
+        return text
+    return f"({text})"
+
+def variable_planes(n_variables: int) -> np.ndarray:
+    """
+    Plans de bits empaquetés (n × ⌈2^n / 8⌉) : la ligne r de la table donne
+    à la variable i le bit (r >> (n - 1 - i)) & 1, soit l'ordre classique.
+    """
+    rows = np.arange(1 << n_variables)
+    shifts = np.arange(n_variables - 1, -1, -1)
+    bits = ((rows[None, :] >> shifts[:, None]) & 1).astype(np.uint8)
+    return np.packbits(bits, axis=1)
+
+def _evaluate(tree: Tuple, planes: Dict[str, np.ndarray], memo: Dict[Tuple, np.ndarray]) -> np.ndarray:
+    if tree in memo:
+        return memo[tree]
+    if tree[0] == 'var':
+        result = planes[tree[1]]
+    elif tree[0] == 'not':
+        result = np.invert(_evaluate(tree[1], planes, memo))
+    else:
+        result = _BIT_OPERATIONS[tree[0]](_evaluate(tree[1], planes, memo),
+                                          _evaluate(tree[2], planes, memo))
+    memo[tree] = result
+    return result
+
+@lru_cache(maxsize=128)
+def truth_table(source: str, steps: bool = True) -> Tuple[Tuple[str, ...], np.ndarray]:
+    """
+    Table de vérité complète (2^n lignes, en lecture seule) : colonnes des
+    variables, puis (si steps) des opérandes non triviaux de la racine,
+    puis du résultat. Les sous-expressions communes ne sont évaluées qu'une fois.
+    """
+    compiled = compile_expression(source)
+    n_rows = 1 << len(compiled.variables)
+    planes = dict(zip(compiled.variables, variable_planes(len(compiled.variables))))
+    memo: Dict[Tuple, np.ndarray] = {}
+
+    columns = [('var', name) for name in compiled.variables]
+    if steps and compiled.tree[0] != 'var':
+        columns += [child for child in compiled.tree[1:] if child[0] != 'var']
+    if compiled.tree not in columns:
+        columns.append(compiled.tree)
+
+    packed = np.stack([_evaluate(column, planes, memo) for column in columns])
+    table = np.unpackbits(packed, axis=1)[:, :n_rows].T.astype(bool)
+    table.setflags(write=False)
+    return tuple(format_expression(column) for column in columns), table
+
+def extract_expression(content: str) -> Optional[str]:
+    """
+    Isole l'expression d'un énoncé du type « Logique booléenne: (A ∧ B) = ? ».
+    Retourne None si aucune expression lisible n'est trouvée.
+    """
+    candidate = content.rsplit(':', 1)[-1]
+    candidate = re.split(r'=(?![>])|\?', candidate, maxsplit=1)[0].strip()
+    try:
+        compiled = compile_expression(candidate)
+    except BooleanSyntaxError:
+        return None
+    # Un simple mot n'est pas une expression
+    return candidate if compiled.tree[0] != 'var' else None
+
+def gate_graph(source: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """
+    Schéma de portes en arbre : un sommet par opérateur et par occurrence
+    de variable, arêtes porte → entrées. Le sommet 0 est la porte de sortie.
+    """
+    labels: List[str] = []
+    edges: List[Tuple[int, int]] = []
+
+    def visit(node: Tuple) -> int:
+        index = len(labels)
+        if node[0] == 'var':
+            labels.append(node[1])
+            return index
+        labels.append(GATE_LABELS[node[0]])
+        for child in node[1:]:
+            edges.append((index, visit(child)))
+        return index
+
+    visit(compile_expression(source).tree)
+    return labels, edges
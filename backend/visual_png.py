@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+🗜️ OPTIMISATION DES PNG TESTIQ
+=============================
+
+Les diagrammes n'utilisent qu'une poignée de couleurs (VisualConfig) mais
+matplotlib les enregistre en RGBA complet. Ce module réencode la sortie :
+- palette indexée exacte quand l'image a ≤ 256 couleurs, sinon
+  quantification (si le profil l'autorise)
+- profondeur réduite (1/2/4 bits) pour les petites palettes
+- sinon RGB (RGBA si transparence) avec le même encodeur
+- filtre de ligne PNG et niveau/stratégie zlib réglables par profil
+- aucune métadonnée (tEXt, pHYs...) dans le fichier produit
+
+Avec l'anticrénelage, la plupart des figures dépassent 256 couleurs : un
+profil sans perte ne réencode un PNG existant (optimize_png) que si
+getcolors(256) montre que la palette s'applique. Aucun profil n'est
+appliqué par défaut (VisualConfig.png_profile = None).
+
+Usage: python3 visual_png.py image.png   (compare tous les profils)
+"""
+
+import base64
+import io
+import struct
+import sys
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+ZLIB_STRATEGIES = {
+    'default': zlib.Z_DEFAULT_STRATEGY,
+    'filtered': zlib.Z_FILTERED,
+    'rle': zlib.Z_RLE,
+    'huffman': zlib.Z_HUFFMAN_ONLY
+}
+
+PNG_FILTERS = {'none': 0, 'sub': 1, 'up': 2}
+
+@dataclass(frozen=True)
+class PngProfile:
+    """Paramètres d'encodage d'un profil PNG"""
+    compress_level: int = 6
+    strategy: str = 'default'
+    row_filter: str = 'none'
+    max_colors: Optional[int] = None  # None = palette uniquement si exacte
+    quantizer: str = 'mediancut'
+
+QUANTIZERS = {
+    'mediancut': Image.Quantize.MEDIANCUT,
+    'fastoctree': Image.Quantize.FASTOCTREE
+}
+
+# Sans perte : palette indexée seulement si l'image a ≤ 256 couleurs exactes,
+# sinon PNG RGBA réencodé tel quel. Avec perte (à demander explicitement) :
+# quantification des images trop colorées (dégradés, anticrénelage, heatmaps)
+PNG_PROFILES = {
+    'fast': PngProfile(compress_level=1),
+    'balanced': PngProfile(compress_level=6),
+    'quantized': PngProfile(compress_level=6, max_colors=256),
+    'fast_quantized': PngProfile(compress_level=1, max_colors=256, quantizer='fastoctree'),
+    'smallest': PngProfile(compress_level=9, max_colors=32)
+}
+
+def _chunk(chunk_type: bytes, payload: bytes) -> bytes:
+    return (struct.pack('>I', len(payload)) + chunk_type + payload +
+            struct.pack('>I', zlib.crc32(chunk_type + payload) & 0xffffffff))
+
+def _to_palette(image: Image.Image, profile: PngProfile) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Convertit l'image en (indices H×W, palette N×4 RGBA).
+    Palette exacte si possible, sinon quantifiée à max_colors, sinon None.
+    """
+    image = image.convert('RGBA')
+
+    # getcolors() s'arrête dès 257 couleurs : test bon marché avant np.unique
+    if image.getcolors(256) is not None:
+        rgba = np.asarray(image)
+        packed = rgba.view('>u4').reshape(rgba.shape[:2])
+        colors, inverse = np.unique(packed, return_inverse=True)
+        palette = colors.astype('>u4').view(np.uint8).reshape(-1, 4)
+        return inverse.reshape(packed.shape).astype(np.uint8), palette
+
+    if profile.max_colors is None:
+        return None
+
+    # Les figures sont opaques (facecolor) : quantification en RGB si possible,
+    # FASTOCTREE étant la seule méthode Pillow qui gère l'alpha
+    if image.getextrema()[3][0] < 255:
+        quantized = image.quantize(profile.max_colors, method=Image.Quantize.FASTOCTREE,
+                                   dither=Image.Dither.NONE)
+    else:
+        quantized = image.convert('RGB').quantize(profile.max_colors,
+                                                  method=QUANTIZERS[profile.quantizer],
+                                                  dither=Image.Dither.NONE)
+
+    indices = np.asarray(quantized)
+    mode, raw_palette = quantized.palette.getdata()
+    channels = len(mode)
+    palette = np.frombuffer(raw_palette, dtype=np.uint8).reshape(-1, channels)[:int(indices.max()) + 1]
+    if channels == 3:
+        palette = np.column_stack((palette, np.full(len(palette), 255, dtype=np.uint8)))
+    return indices, palette
+
+def _idat(rows: np.ndarray, bpp: int, profile: PngProfile) -> bytes:
+    """Lignes d'octets H×N filtrées (bpp octets par pixel) puis compressées"""
+    filter_type = PNG_FILTERS[profile.row_filter]
+    if filter_type == 1:
+        filtered = rows - np.pad(rows, ((0, 0), (bpp, 0)))[:, :-bpp]
+    elif filter_type == 2:
+        filtered = rows - np.pad(rows, ((1, 0), (0, 0)))[:-1]
+    else:
+        filtered = rows
+    scanlines = np.column_stack((np.full(len(rows), filter_type, dtype=np.uint8), filtered))
+
+    compressor = zlib.compressobj(profile.compress_level, zlib.DEFLATED, 15, 9,
+                                  ZLIB_STRATEGIES[profile.strategy])
+    return compressor.compress(scanlines.tobytes()) + compressor.flush()
+
+def encode_indexed_png(indices: np.ndarray, palette: np.ndarray, profile: PngProfile) -> bytes:
+    """Encode une image indexée en PNG minimal (IHDR, PLTE, tRNS, IDAT, IEND)"""
+    height, width = indices.shape
+    bit_depth = next(bits for bits in (1, 2, 4, 8) if len(palette) <= 1 << bits)
+
+    # Empaquetage des pixels sur bit_depth bits, vectorisé par ligne
+    per_byte = 8 // bit_depth
+    if per_byte > 1:
+        padded_width = -(-width // per_byte) * per_byte
+        padded = np.zeros((height, padded_width), dtype=np.uint8)
+        padded[:, :width] = indices
+        shifts = (8 - bit_depth) - bit_depth * np.arange(per_byte, dtype=np.uint8)
+        rows = (padded.reshape(height, -1, per_byte) << shifts).sum(axis=-1, dtype=np.uint8)
+    else:
+        rows = indices.astype(np.uint8)
+
+    # Filtre de ligne sur les octets empaquetés (bpp = 1 pour les images indexées)
+    idat = _idat(rows, 1, profile)
+
+    alpha = palette[:, 3]
+    opaque_tail = np.flatnonzero(alpha < 255)
+    chunks = [
+        _chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, bit_depth, 3, 0, 0, 0)),
+        _chunk(b'PLTE', palette[:, :3].tobytes())
+    ]
+    if len(opaque_tail):
+        chunks.append(_chunk(b'tRNS', alpha[:opaque_tail[-1] + 1].tobytes()))
+    chunks += [_chunk(b'IDAT', idat), _chunk(b'IEND', b'')]
+
+    return PNG_SIGNATURE + b''.join(chunks)
+
+def encode_truecolor_png(image: Image.Image, profile: PngProfile) -> bytes:
+    """Encode une image en PNG RGB 8 bits (RGBA si elle a de la transparence)"""
+    image = image.convert('RGBA')
+    rgba = np.asarray(image)
+    if image.getextrema()[3][0] == 255:
+        pixels, color_type = rgba[..., :3], 2
+    else:
+        pixels, color_type = rgba, 6
+    height, width, channels = pixels.shape
+
+    idat = _idat(pixels.reshape(height, width * channels), channels, profile)
+    return PNG_SIGNATURE + b''.join((
+        _chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)),
+        _chunk(b'IDAT', idat),
+        _chunk(b'IEND', b'')
+    ))
+
+def optimize_image(image: Image.Image, profile_name: str = 'balanced') -> bytes:
+    """Encode une image PIL en PNG selon un profil"""
+    profile = PNG_PROFILES[profile_name]
+
+    indexed = _to_palette(image, profile)
+    if indexed is not None:
+        return encode_indexed_png(*indexed, profile)
+
+    # Trop de couleurs pour ce profil : couleurs vraies, mêmes filtre et stratégie
+    return encode_truecolor_png(image, profile)
+
+def optimize_png(data: bytes, profile_name: str = 'balanced') -> bytes:
+    """
+    Réencode un PNG selon un profil ; garde l'original s'il est plus petit.
+    Sans perte, une image de plus de 256 couleurs n'est pas réencodée : le
+    gain d'un second passage zlib ne paie pas son coût.
+    """
+    image = Image.open(io.BytesIO(data))
+    if PNG_PROFILES[profile_name].max_colors is None and image.getcolors(256) is None:
+        return data
+    optimized = optimize_image(image, profile_name)
+    return optimized if len(optimized) < len(data) else data
+
+# === PLACEHOLDERS (LQIP) ===
+
+PLACEHOLDER_MAX_BYTES = 1024
+PLACEHOLDER_SIZES = (24, 16, 10)
+PLACEHOLDER_COLORS = 16
+
+def make_placeholder(image: Image.Image) -> Dict:
+    """
+    Vignette floue (< 1 Ko, en data URI) et couleur dominante d'un rendu,
+    pour peindre immédiatement la zone pendant que l'image complète arrive.
+    """
+    rgb = image.convert('RGB')
+    profile = PngProfile(compress_level=9)
+
+    for size in PLACEHOLDER_SIZES:
+        thumbnail = rgb.copy()
+        thumbnail.thumbnail((size, size), Image.BILINEAR)
+        thumbnail = thumbnail.filter(ImageFilter.GaussianBlur(0.6))
+        quantized = thumbnail.quantize(PLACEHOLDER_COLORS, method=Image.Quantize.MEDIANCUT)
+        colors = np.asarray(quantized.convert('RGB')).reshape(-1, 3)
+        indices = np.asarray(quantized).ravel()
+        data = encode_indexed_png(*_to_palette(quantized, profile), profile)
+        if len(data) <= PLACEHOLDER_MAX_BYTES:
+            break
+
+    # Couleur du premier pixel appartenant à l'entrée de palette la plus fréquente
+    dominant = colors[np.argmax(indices == np.bincount(indices).argmax())]
+
+    return {
+        'placeholder': "data:image/png;base64," + base64.b64encode(data).decode(),
+        'dominant_color': '#{:02x}{:02x}{:02x}'.format(*dominant),
+        'width': image.width,
+        'height': image.height
+    }
+
+def benchmark_profiles(data: bytes) -> Dict[str, Dict]:
+    """Taille avant/après et temps d'encodage pour chaque profil"""
+    results = {}
+    for name in PNG_PROFILES:
+        start = time.perf_counter()
+        optimized = optimize_png(data, name)
+        results[name] = {
+            'bytes_before': len(data),
+            'bytes_after': len(optimized),
+            'ratio': round(len(optimized) / len(data), 3),
+            'lossy': PNG_PROFILES[name].max_colors is not None,
+            'encode_ms': round((time.perf_counter() - start) * 1000, 1)
+        }
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python3 visual_png.py image.png")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'rb') as f:
+        png_data = f.read()
+
+    print(f"🗜️ Profils PNG pour {sys.argv[1]} ({len(png_data):,} octets)")
+    for name, result in benchmark_profiles(png_data).items():
+        print(f"   {name:14s} {result['bytes_after']:>10,} octets "
+              f"({result['ratio']:.1%}) en {result['encode_ms']} ms"
+              + (" (avec perte)" if result['lossy'] else ""))
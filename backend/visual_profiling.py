@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+🔬 PROFILAGE À LA DEMANDE DES RENDUS TESTIQ
+==========================================
+
+Profile un rendu précis (forcé par la requête) ou un échantillon des
+rendus (taux entre 0 et 1), sans redémarrer les workers : le taux et le
+mode sont relus dans un fichier de contrôle JSON dès qu'il change.
+
+Deux modes :
+- 'sampling' : un thread relève la pile du rendu toutes les `interval`
+  secondes ; sortie en piles repliées (flamegraph.pl, speedscope...)
+- 'cprofile' : cProfile complet, fichier .prof (pstats / snakeviz) plus
+  des piles repliées appelant;appelé pondérées par le temps propre
+
+Chaque pile repliée commence par « visual;<route>;<question_id> », la
+route étant la méthode generate_* choisie par _render_visual_for_question.
+
+Configuration :
+    TESTIQ_PROFILE_RATE=0.02             taux d'échantillonnage au démarrage
+    TESTIQ_PROFILE_MODE=sampling         ou cprofile
+    TESTIQ_PROFILE_DIR=visual_profiles   dossier de sortie
+    TESTIQ_PROFILE_CONTROL=/chemin.json  {"sample_rate": 0.05, "mode": "cprofile"}
+
+Usage: python3 visual_profiling.py profil1.folded [profil2.folded ...]   (fusion + top)
+"""
+
+import cProfile
+import itertools
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+PROFILE_MODES = ('sampling', 'cprofile')
+ROUTE_CALLER = '_render_visual_for_question'
+CONTROL_CHECK_INTERVAL = 1.0
+
+@dataclass
+class ProfileResult:
+    """Résultat d'un rendu profilé (rempli à la sortie du bloc)"""
+    question_id: str
+    mode: str
+    route: str = 'inconnue'
+    seconds: float = 0.0
+    samples: int = 0
+    paths: List[str] = field(default_factory=list)
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _route_from_stack(names: List[str]) -> Optional[str]:
+    """Fonction appelée directement par _render_visual_for_question"""
+    for caller, callee in zip(names, names[1:]):
+        if caller.startswith(ROUTE_CALLER + ' '):
+            return callee.split(' ', 1)[0]
+    return None
+
+def _safe_name(text: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', text)[:60]
+
+class _StackSampler(threading.Thread):
+    """Relève périodiquement la pile d'un thread (sys._current_frames)"""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True, name='visual-profiler')
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[tuple(reversed(labels))] += 1
+
+    def stop(self) -> Counter:
+        self._done.set()
+        self.join()
+        return self.stacks
+
+class RenderProfiler:
+    """Décide quels rendus profiler et écrit leurs profils"""
+
+    def __init__(self, sample_rate: float = 0.0, mode: str = 'sampling',
+                 output_dir: str = 'visual_profiles', interval: float = 0.002,
+                 control_path: Optional[str] = None):
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.output_dir = output_dir
+        self.interval = interval
+        self.control_path = control_path
+        self.profiled = 0
+        self._control_mtime = None
+        self._control_checked = 0.0
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    @classmethod
+    def from_environment(cls) -> 'RenderProfiler':
+        return cls(sample_rate=float(os.environ.get('TESTIQ_PROFILE_RATE', 0) or 0),
+                   mode=os.environ.get('TESTIQ_PROFILE_MODE', 'sampling'),
+                   output_dir=os.environ.get('TESTIQ_PROFILE_DIR', 'visual_profiles'),
+                   control_path=os.environ.get('TESTIQ_PROFILE_CONTROL'))
+
+    def _reload_control(self):
+        """Relit le fichier de contrôle s'il a changé (au plus une fois par seconde)"""
+        now = time.monotonic()
+        if not self.control_path or now - self._control_checked < CONTROL_CHECK_INTERVAL:
+            return
+        self._control_checked = now
+        try:
+            mtime = os.stat(self.control_path).st_mtime
+            if mtime == self._control_mtime:
+                return
+            with open(self.control_path, 'r', encoding='utf-8') as f:
+                control = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._control_mtime = mtime
+        self.sample_rate = float(control.get('sample_rate', self.sample_rate))
+        if control.get('mode') in PROFILE_MODES:
+            self.mode = control['mode']
+
+    def should_profile(self, force: Optional[bool] = None) -> bool:
+        """force=True/False l'emporte sur le taux d'échantillonnage"""
+        if force is not None:
+            return force
+        self._reload_control()
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def profile(self, question_id: str, force: Optional[bool] = None):
+        """
+        Profile le bloc si la requête le demande ou si elle est tirée au sort.
+        Produit None (pas de profilage) ou un ProfileResult complété à la sortie.
+        """
+        if not self.should_profile(force):
+            yield None
+            return
+
+        result = ProfileResult(question_id=question_id, mode=self.mode)
+        start = time.perf_counter()
+        if self.mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield result
+            finally:
+                profiler.disable()
+                result.seconds = time.perf_counter() - start
+                self._write_cprofile(result, profiler)
+        else:
+            sampler = _StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+            try:
+                yield result
+            finally:
+                stacks = sampler.stop()
+                result.seconds = time.perf_counter() - start
+                self._write_samples(result, stacks)
+
+        with self._lock:
+            self.profiled += 1
+
+    def _output_path(self, result: ProfileResult, extension: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        name = f"{stamp}_{os.getpid()}-{next(self._sequence)}_{_safe_name(result.question_id)}_{result.route}{extension}"
+        return os.path.join(self.output_dir, name)
+
+    def _write_folded(self, result: ProfileResult, stacks: Counter):
+        path = self._output_path(result, '.folded')
+        prefix = f"visual;{result.route};{_safe_name(result.question_id)}"
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{prefix};{';'.join(stack)} {count}\n")
+        result.paths.append(path)
+
+    def _write_samples(self, result: ProfileResult, stacks: Counter):
+        # Piles tronquées au rendu lui-même (les appelants du serveur n'importent pas)
+        trimmed: Counter = Counter()
+        for stack, count in stacks.most_common():
+            start = next((i for i, label in enumerate(stack) if label.startswith(ROUTE_CALLER + ' ')), 0)
+            trimmed[stack[start:]] += count
+            if result.route == 'inconnue':
+                result.route = _route_from_stack(list(stack)) or result.route
+        result.samples = sum(trimmed.values())
+        self._write_folded(result, trimmed)
+
+    def _write_cprofile(self, result: ProfileResult, profiler: cProfile.Profile):
+        stats = pstats.Stats(profiler)
+        labels = {function: f"{function[2]} ({os.path.basename(function[0])}:{function[1]})"
+                  for function in stats.stats}
+
+        # Route : appelé de _render_visual_for_question au plus grand temps cumulé
+        routes = [(cumulative, function[2]) for function, (_, _, _, cumulative, callers) in stats.stats.items()
+                  if any(caller[2] == ROUTE_CALLER for caller in callers)]
+        if routes:
+            result.route = max(routes)[1]
+        result.samples = sum(calls for _, calls, _, _, _ in stats.stats.values())
+
+        path = self._output_path(result, '.prof')
+        stats.dump_stats(path)
+        result.paths.append(path)
+
+        # cProfile ne garde que les arcs appelant → appelé : piles de profondeur 2,
+        # pondérées en microsecondes de temps propre réparti par appelant
+        edges: Counter = Counter()
+        for function, (_, _, _, _, callers) in stats.stats.items():
+            for caller, (_, _, own_time, _) in callers.items():
+                weight = int(own_time * 1e6)
+                if weight:
+                    edges[(labels.get(caller, caller[2]), labels[function])] += weight
+        self._write_folded(result, edges)
+
+RENDER_PROFILER = RenderProfiler.from_environment()
+
+def merge_folded(paths: List[str]) -> Counter:
+    """Additionne plusieurs fichiers de piles repliées"""
+    merged: Counter = Counter()
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack:
+                    merged[stack] += int(count)
+    return merged
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 visual_profiling.py profil1.folded [profil2.folded ...]")
+        sys.exit(1)
+
+    merged = merge_folded(sys.argv[1:])
+    leaves: Dict[str, int] = Counter()
+    for stack, count in merged.items():
+        leaves[stack.rsplit(';', 1)[-1]] += count
+    total = sum(leaves.values()) or 1
+
+    print(f"🔬 {len(sys.argv) - 1} profils, {total:,} échantillons")
+    for label, count in leaves.most_common(15):
+        print(f"   {count / total:6.1%}  {label}")
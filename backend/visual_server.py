@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+🚀 SERVICE HTTP DE RENDU DES VISUELS TESTIQ
+==========================================
+
+Processus Python persistant (au lieu d'un python3 par visuel) qui accepte
+des indications de préchargement : l'ordre des questions d'un test étant
+connu, le client envoie les prochaines questions d'une session et elles
+sont rendues en arrière-plan dans le store, avant que l'utilisateur ne
+clique sur « suivant ».
+
+    POST /render    {"id": "Q14", "question": {...}, "theme": "default", "panel": "stem"}
+                    → {"visual": "data:image/png;base64,...", "cached": bool, "outcome": "full"}
+    POST /prefetch  {"session": "abc", "questions": [{"id": "Q15", "question": {...}}, ...]}
+                    → 202 {"accepted": n, "deduplicated": n, "dropped": n, "cancelled": n}
+    GET  /stats
+
+"panel" (stem par défaut, solution, explanation) vaut aussi pour /prefetch :
+la revue d'un test peut précharger les explications.
+
+"deadline_ms" borne un /render : le rendu est dégradé pour tenir
+l'échéance (visual_deadlines.py), et une requête rattachée à un rendu
+plus long reçoit le placeholder « visuel indisponible » à l'échéance
+({"timed_out": true}). "outcome" vaut full, degraded ou placeholder.
+
+Un seul thread de rendu (pyplot n'est pas thread-safe), file à deux
+priorités : une requête /render passe devant tous les préchargements et
+promeut un préchargement déjà en file pour la même clé. Chaque session a
+un plafond de préchargements en cours ; une nouvelle indication annule
+ceux de la session qui n'y figurent plus.
+
+Usage: python3 visual_server.py [--port 8765] [--store visual_store] [--per-session 5]
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set
+
+from visual_deadlines import DEADLINE_TRACKER, FULL, PLACEHOLDER, Deadline
+from visual_generator import (STEM_PANEL, VISUAL_PANELS, VisualConfig, VisualGenerator,
+                              generate_visual_with_outcome)
+from visual_store import VisualStore, cache_key
+from visual_themes import DEFAULT_THEME, THEME_SPECS, get_theme
+
+FOREGROUND, BACKGROUND = 0, 1
+PREFETCH_PER_SESSION = 5
+PREFETCHED_KEYS_MAX = 10000     # préchargements pas encore servis dont on garde la trace
+
+@dataclass
+class RenderJob:
+    key: str
+    question_id: str
+    question_data: Dict
+    theme: str
+    panel: str
+    priority: int
+    session: Optional[str] = None
+    deadline: Optional[Deadline] = None
+    state: str = 'queued'              # queued → running → done / cancelled
+    future: Future = field(default_factory=Future)
+
+@dataclass
+class SchedulerStats:
+    foreground_renders: int = 0
+    background_renders: int = 0
+    cache_hits: int = 0
+    prefetch_hits: int = 0             # premier /render servi par un préchargement
+    joined_in_flight: int = 0          # /render rattaché à un rendu déjà en cours ou en file
+    promoted: int = 0
+    deduplicated: int = 0
+    dropped: int = 0
+    cancelled: int = 0
+    failures: int = 0
+    timed_out: int = 0                 # /render servi par le placeholder à l'échéance
+
+class RenderScheduler:
+    """File de rendus à deux priorités, dédupliquée par clé de cache"""
+
+    def __init__(self, store, config: Optional[VisualConfig] = None,
+                 per_session: int = PREFETCH_PER_SESSION):
+        self.store = store
+        self.config = config
+        self.per_session = per_session
+        self.stats = SchedulerStats()
+
+        self._heap: List = []
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, RenderJob] = {}            # en file ou en cours
+        self._sessions: Dict[str, Set[str]] = {}         # préchargements en cours par session
+        # Clés préchargées pas encore servies (LRU borné), pour compter les prefetch_hits
+        self._prefetched: 'OrderedDict[str, None]' = OrderedDict()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='visual-render')
+        self._thread.start()
+
+    # === API ===
+
+    def render(self, question_id: str, question_data: Dict, theme: str = DEFAULT_THEME,
+               panel: str = STEM_PANEL, deadline: Optional[float] = None) -> Dict:
+        """Rendu au premier plan ; bloque jusqu'au résultat ou jusqu'à l'échéance (secondes)"""
+        key = cache_key(question_id, question_data, theme, panel, self.config)
+        expires = None if deadline is None else Deadline.after(deadline)
+        cached = self.store.get_data_uri(key)
+        with self._condition:
+            if cached is not None:
+                self.stats.cache_hits += 1
+                if key in self._prefetched:
+                    del self._prefetched[key]
+                    self.stats.prefetch_hits += 1
+                return {'visual': cached, 'cached': True, 'outcome': FULL}
+            job = self._schedule(key, question_id, question_data, theme, panel, FOREGROUND,
+                                 deadline=expires)
+        try:
+            visual, outcome = job.future.result(None if expires is None else max(expires.remaining(), 0))
+        except FutureTimeout:
+            with self._condition:
+                self.stats.timed_out += 1
+            return {'visual': self._unavailable(theme), 'cached': False, 'outcome': PLACEHOLDER,
+                    'timed_out': True}
+        return {'visual': visual, 'cached': False, 'outcome': outcome}
+
+    def prefetch(self, session: str, questions: List[Dict], theme: str = DEFAULT_THEME,
+                 panel: str = STEM_PANEL) -> Dict:
+        """
+        Indication de préchargement : questions = [{'id', 'question'}] dans
+        l'ordre où elles seront présentées. Retourne les compteurs de tri.
+        """
+        result = {'accepted': 0, 'deduplicated': 0, 'dropped': 0, 'cancelled': 0}
+        hinted = [(item['id'], item.get('question', {}),
+                   cache_key(item['id'], item.get('question', {}), theme, panel, self.config))
+                  for item in questions]
+        cached = {key for _, _, key in hinted if key in self.store}
+
+        with self._condition:
+            # Les préchargements en file qui ne sont plus annoncés sont obsolètes
+            wanted = {key for _, _, key in hinted}
+            for key in list(self._sessions.get(session, ())):
+                job = self._jobs.get(key)
+                if job and job.state == 'queued' and job.priority == BACKGROUND and key not in wanted:
+                    self._cancel(job)
+                    result['cancelled'] += 1
+
+            for question_id, question_data, key in hinted:
+                if key in cached or key in self._jobs:
+                    result['deduplicated'] += 1
+                elif len(self._sessions.get(session, ())) >= self.per_session:
+                    result['dropped'] += 1
+                else:
+                    self._schedule(key, question_id, question_data, theme, panel, BACKGROUND, session)
+                    result['accepted'] += 1
+
+            self.stats.deduplicated += result['deduplicated']
+            self.stats.dropped += result['dropped']
+        return result
+
+    def snapshot(self) -> Dict:
+        with self._condition:
+            stats = dict(self.stats.__dict__)
+            stats['queued'] = sum(1 for job in self._jobs.values() if job.state == 'queued')
+            stats['sessions'] = {session: len(keys) for session, keys in self._sessions.items()}
+        stats['deadlines'] = DEADLINE_TRACKER.snapshot()
+        return stats
+
+    def _unavailable(self, theme: str) -> str:
+        return VisualGenerator(get_theme(theme).configure(self.config or VisualConfig())).unavailable_visual()
+
+    # === FILE ===
+
+    def _schedule(self, key: str, question_id: str, question_data: Dict, theme: str, panel: str,
+                  priority: int, session: Optional[str] = None,
+                  deadline: Optional[Deadline] = None) -> RenderJob:
+        """Appelé sous verrou. Rattache la demande à un travail existant si possible."""
+        job = self._jobs.get(key)
+        if job is not None:
+            if priority == FOREGROUND:
+                self.stats.joined_in_flight += 1
+                if job.state == 'queued' and deadline is not None and \
+                        (job.deadline is None or deadline.expires_at < job.deadline.expires_at):
+                    job.deadline = deadline
+                if job.priority == BACKGROUND and job.state == 'queued':
+                    # Nouvelle entrée prioritaire ; l'ancienne sera ignorée au dépilage
+                    job.priority = FOREGROUND
+                    heapq.heappush(self._heap, (FOREGROUND, next(self._sequence), job))
+                    self.stats.promoted += 1
+            return job
+
+        job = RenderJob(key, question_id, question_data, theme, panel, priority, session, deadline)
+        self._jobs[key] = job
+        if session is not None:
+            self._sessions.setdefault(session, set()).add(key)
+        heapq.heappush(self._heap, (priority, next(self._sequence), job))
+        self._condition.notify()
+        return job
+
+    def _cancel(self, job: RenderJob):
+        job.state = 'cancelled'
+        job.future.cancel()
+        self._forget(job)
+        self.stats.cancelled += 1
+
+    def _forget(self, job: RenderJob):
+        self._jobs.pop(job.key, None)
+        if job.session is not None:
+            keys = self._sessions.get(job.session)
+            if keys is not None:
+                keys.discard(job.key)
+                if not keys:
+                    del self._sessions[job.session]
+
+    def _next_job(self) -> RenderJob:
+        with self._condition:
+            while True:
+                while not self._heap:
+                    self._condition.wait()
+                priority, _, job = heapq.heappop(self._heap)
+                # Entrées périmées : travail annulé, ou promu (doublon dans le tas)
+                if job.state == 'queued' and priority == job.priority:
+                    job.state = 'running'
+                    return job
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            try:
+                rendered = generate_visual_with_outcome(job.question_id, job.question_data,
+                                                        store=self.store, config=self.config,
+                                                        theme=job.theme, panel=job.panel,
+                                                        deadline=None if job.deadline is None
+                                                        else max(job.deadline.remaining(), 0))
+            except Exception as error:
+                with self._condition:
+                    self.stats.failures += 1
+                    job.state = 'done'
+                    self._forget(job)
+                job.future.set_exception(error)
+                continue
+
+            with self._condition:
+                if job.priority == BACKGROUND:
+                    self.stats.background_renders += 1
+                    self._prefetched[job.key] = None
+                    self._prefetched.move_to_end(job.key)
+                    if len(self._prefetched) > PREFETCHED_KEYS_MAX:
+                        self._prefetched.popitem(last=False)
+                else:
+                    self.stats.foreground_renders += 1
+                job.state = 'done'
+                self._forget(job)
+            job.future.set_result(rendered)
+
+# === HTTP ===
+
+class VisualRequestHandler(BaseHTTPRequestHandler):
+    scheduler: RenderScheduler = None
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Optional[Dict]:
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            self._send_json(400, {'error': 'JSON invalide'})
+            return None
+        return payload
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, self.scheduler.snapshot())
+        else:
+            self._send_json(404, {'error': f'Chemin inconnu: {self.path}'})
+
+    def do_POST(self):
+        if self.path not in ('/render', '/prefetch'):
+            self._send_json(404, {'error': f'Chemin inconnu: {self.path}'})
+            return
+        payload = self._read_json()
+        if payload is None:
+            return
+
+        theme = payload.get('theme', DEFAULT_THEME)
+        panel = payload.get('panel', STEM_PANEL)
+        if panel not in VISUAL_PANELS:
+            self._send_json(400, {'error': f'Panneau inconnu: {panel}'})
+            return
+        if theme not in THEME_SPECS:
+            self._send_json(400, {'error': f'Thème inconnu: {theme}'})
+            return
+        if self.path == '/render':
+            questions = [payload.get('question', {})]
+        else:
+            items = payload.get('questions', [])
+            questions = [item.get('question', {}) if isinstance(item, dict) else None
+                         for item in items] if isinstance(items, list) else [None]
+        if not all(isinstance(question, dict) for question in questions):
+            self._send_json(400, {'error': 'Question invalide: objet JSON attendu'})
+            return
+        try:
+            if self.path == '/render':
+                deadline_ms = payload.get('deadline_ms')
+                result = self.scheduler.render(str(payload['id']), payload.get('question', {}), theme, panel,
+                                               None if deadline_ms is None else float(deadline_ms) / 1000)
+                self._send_json(200, result)
+            else:
+                result = self.scheduler.prefetch(str(payload['session']), payload.get('questions', []),
+                                                 theme, panel)
+                self._send_json(202, result)
+        except (KeyError, TypeError) as error:
+            self._send_json(400, {'error': f'Champ manquant ou invalide: {error}'})
+        except Exception as error:
+            self._send_json(500, {'error': str(error)})
+
+    def log_message(self, format, *args):
+        pass
+
+def make_server(port: int, scheduler: RenderScheduler, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    handler = type('BoundVisualRequestHandler', (VisualRequestHandler,), {'scheduler': scheduler})
+    return ThreadingHTTPServer((host, port), handler)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service HTTP de rendu avec préchargement")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--store', default='visual_store')
+    parser.add_argument('--per-session', type=int, default=PREFETCH_PER_SESSION)
+    args = parser.parse_args()
+
+    scheduler = RenderScheduler(VisualStore(args.store), per_session=args.per_session)
+    server = make_server(args.port, scheduler, args.host)
+    print(f"🚀 Service de visuels sur http://{args.host}:{args.port} (store: {args.store})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -15,6 +15,10 @@ class VisualService {
         this.pythonPath = 'python3'; // ou 'python' selon l'installation
         this.generatorScript = path.join(__dirname, 'visual_generator.py');
         this.cacheDir = path.join(__dirname, 'visual_cache');
+        // Échéance d'un rendu (secondes) : au-delà, Python sert un visuel dégradé ;
+        // le processus est tué s'il n'a toujours pas répondu après la marge
+        this.renderDeadline = 10;
+        this.killGrace = 5;
         this.initializeCache();
     }
 
@@ -30,14 +34,15 @@ class VisualService {
      * Génère un visuel pour une question donnée
      * @param {string} questionId - ID de la question (ex: Q14)  
      * @param {Object} questionData - Données de la question
+     * @param {string} panel - 'stem' (énoncé seul), 'solution' ou 'explanation' (revue)
      * @returns {Promise<string>} - Image en base64 ou URL
      */
-    async generateVisual(questionId, questionData) {
+    async generateVisual(questionId, questionData, panel = 'stem') {
         try {
-            console.log(`🎨 Génération du visuel pour ${questionId}...`);
+            console.log(`🎨 Génération du visuel pour ${questionId} (${panel})...`);
             
             // Vérifier le cache d'abord
-            const cacheKey = this.generateCacheKey(questionId, questionData);
+            const cacheKey = this.generateCacheKey(questionId, questionData, panel);
             const cachedVisual = await this.getCachedVisual(cacheKey);
             
             if (cachedVisual) {
@@ -46,10 +51,14 @@ class VisualService {
             }
 
             // Générer le visuel via Python
-            const visualBase64 = await this.runPythonGenerator(questionId, questionData);
+            const { visual: visualBase64, outcome } = await this.runPythonGenerator(questionId, questionData, panel);
             
-            // Mettre en cache
-            await this.setCachedVisual(cacheKey, visualBase64);
+            // Mettre en cache (jamais un visuel dégradé ni le placeholder de l'échéance)
+            if (outcome === 'full') {
+                await this.setCachedVisual(cacheKey, visualBase64);
+            } else {
+                console.log(`⏱️ Visuel ${outcome} pour ${questionId}, non mis en cache`);
+            }
             
             console.log(`✅ Visuel généré pour ${questionId}: ${visualBase64.length} caractères`);
             return visualBase64;
@@ -62,8 +71,9 @@ class VisualService {
 
     /**
      * Exécute le script Python de génération
+     * @returns {Promise<{visual: string, outcome: string}>} - outcome : 'full', 'degraded' ou 'placeholder'
      */
-    async runPythonGenerator(questionId, questionData) {
+    async runPythonGenerator(questionId, questionData, panel = 'stem') {
         return new Promise((resolve, reject) => {
             const pythonProcess = spawn(this.pythonPath, [
                 '-c',
@@ -72,22 +82,24 @@ import sys
 import os
 sys.path.append('${__dirname}')
 
-from visual_generator import generate_visual_for_question
+from visual_generator import generate_visual_with_outcome
 import json
 
 # Données de la question depuis Node.js
 question_data = ${JSON.stringify(questionData)}
 question_id = "${questionId}"
+panel = "${panel}"
+deadline = ${this.renderDeadline}
 
 try:
     # Génération du visuel
-    visual_b64 = generate_visual_for_question(question_id, question_data)
-    print(visual_b64)
+    visual_b64, outcome = generate_visual_with_outcome(question_id, question_data, panel=panel, deadline=deadline)
+    print(json.dumps({'visual': visual_b64, 'outcome': outcome}))
 except Exception as e:
     print(f"ERROR: {str(e)}", file=sys.stderr)
     sys.exit(1)
                 `
-            ]);
+            ], { timeout: (this.renderDeadline + this.killGrace) * 1000 });
 
             let result = '';
             let error = '';
@@ -101,8 +113,14 @@ except Exception as e:
             });
 
             pythonProcess.on('close', (code) => {
-                if (code === 0 && result.trim()) {
-                    resolve(result.trim());
+                let envelope = null;
+                try {
+                    envelope = code === 0 ? JSON.parse(result) : null;
+                } catch (parseError) {
+                    error = error || `Réponse illisible: ${parseError.message}`;
+                }
+                if (envelope && envelope.visual) {
+                    resolve(envelope);
                 } else {
                     reject(new Error(`Python script failed: ${error || 'Unknown error'}`));
                 }
@@ -117,14 +135,16 @@ except Exception as e:
     /**
      * Gestion du cache des visuels
      */
-    generateCacheKey(questionId, questionData) {
+    generateCacheKey(questionId, questionData, panel = 'stem') {
         const content = questionData.content || '';
         const category = questionData.category || '';
         const hash = require('crypto')
             .createHash('md5')
             .update(`${questionId}_${content}_${category}`)
             .digest('hex');
-        return `visual_${hash}.json`;
+        // Même schéma que cache_key() côté Python : panneau toujours suffixé
+        // (l'ancienne clé sans suffixe contenait la figure complète, réponse comprise)
+        return `visual_${hash}_${panel}.json`;
     }
 
     async getCachedVisual(cacheKey) {
@@ -186,6 +206,13 @@ except Exception as e:
         }
     }
 
+    /**
+     * Panneaux disponibles pour les visuels énoncé/solution
+     */
+    isValidPanel(panel) {
+        return ['stem', 'solution', 'explanation'].includes(panel);
+    }
+
     /**
      * Détecte si un visuel est nécessaire pour une question
      */
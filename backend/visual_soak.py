@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+🧪 TEST D'ENDURANCE DU GÉNÉRATEUR DE VISUELS
+===========================================
+
+Enchaîne des milliers de rendus sur toutes les routes de
+generate_visual_for_question (avec des échecs injectés entre la création
+de la figure et l'encodage) et vérifie que la mémoire reste plate :
+aucune figure vivante à la fin, pente de RSS sous le seuil.
+
+Durée : environ 8 rendus/s à 20 DPI sur un cœur, soit ~4 min pour les
+2 000 rendus par défaut ; --renders 20000 (~40 min) pour une vraie nuit.
+
+Usage: python3 visual_soak.py [--renders 2000] [--dpi 20] [--max-growth-mb 40]
+"""
+
+import argparse
+import sys
+import time
+from typing import Dict, List
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+from visual_generator import RENDER_CONTEXT, VisualConfig, generate_visual_for_question
+
+SOAK_DEFAULT_RENDERS = 2000
+
+# Une question par route de generate_visual_for_question
+ROUTE_SAMPLES: List[Dict] = [
+    {'id': 'dsl', 'data': {
+        'type': 'matrix3x3',
+        'rules': {'rows': [{'op': 'rotate', 'deg': 45}], 'cols': [{'op': 'sides', 'delta': 1}]},
+        'start': {'sides': 3, 'angle': 0, 'style': 'outline'},
+        'target': {'row': 2, 'col': 2},
+        'distractors': ['wrong_angle', 'wrong_sides', 'right_angle_wrong_fill']}},
+    {'id': 'alternating', 'data': {'content': 'Complétez la série', 'visualPattern': 'alternating_squares_series'}},
+    {'id': 'matrix_rotation', 'data': {'content': 'Matrice 2x2 avec rotation: trouvez l\'élément manquant', 'category': 'spatial'}},
+    {'id': 'venn', 'data': {'content': 'Principe inclusion-exclusion ensembles A et B', 'category': 'logique'}},
+    {'id': 'fibonacci', 'data': {'content': 'Suite de Fibonacci: 1, 1, 2, 3, 5, ?', 'category': 'numerique'}},
+    {'id': 'arithmetic', 'data': {'content': 'Continuez la séquence: 2, 4, 6, 8, ?', 'category': 'numerique'}},
+    {'id': 'transformation_3d', 'data': {'content': 'Transformation 3D du cube', 'category': 'spatial'}},
+    {'id': 'transformation_4d', 'data': {'content': 'Transformation géométrique en 4D', 'category': 'spatial'}},
+    {'id': 'pattern', 'data': {'content': 'Complétez le motif: quelle forme manque ?', 'category': 'spatial'}},
+    {'id': 'logic', 'data': {'content': 'Raisonnement: déduction à partir des prémisses', 'category': 'general'}},
+    {'id': 'spatial_fallback', 'data': {'content': 'Quelle figure correspond à la cible ?', 'category': 'spatial'}},
+    {'id': 'numeric_fallback', 'data': {'content': 'Trouvez le nombre caché', 'category': 'numerique'}},
+    {'id': 'fractal_escape', 'data': {'content': 'Ensemble de Mandelbrot', 'category': 'spatial',
+                                      'fractal': {'kind': 'mandelbrot', 'max_iter': 60}}},
+    {'id': 'fractal_ifs', 'data': {'content': 'Triangle de Sierpinski', 'category': 'spatial',
+                                   'fractal': {'kind': 'sierpinski_triangle'}}},
+    {'id': 'fractal_lsystem', 'data': {'content': 'Fractale auto-similaire : flocon de Koch', 'category': 'spatial'}},
+    {'id': 'truth_table', 'data': {'content': 'Table de vérité', 'category': 'logique', 'expression': '(A ∧ B) ∨ ¬C'}},
+    {'id': 'graph_tree', 'data': {'content': 'Arbre binaire : combien de feuilles ?', 'category': 'logique'}},
+    {'id': 'graph_force', 'data': {'content': 'Graphe : quel sommet a le plus d\'arêtes ?', 'category': 'logique'}}
+]
+
+class InjectedRenderError(RuntimeError):
+    """Échec volontaire au milieu d'un rendu"""
+
+def _failing_render(config: VisualConfig):
+    """Ouvre une figure puis échoue avant _save_to_base64, comme un helper buggé"""
+    with RENDER_CONTEXT.render():
+        fig, ax = plt.subplots(figsize=(12, 6), dpi=config.dpi)
+        ax.plot([0, 1], [0, 1])
+        raise InjectedRenderError("échec injecté")
+
+def run_soak(renders: int, config: VisualConfig, failure_every: int = 50,
+             sample_every: int = 100, warmup_ratio: float = 0.1) -> Dict:
+    """Exécute le test et retourne les mesures (RSS en octets)"""
+    rss_samples = []
+    RENDER_CONTEXT.rss_sample_every = sample_every
+    start = time.perf_counter()
+
+    for i in range(renders):
+        if failure_every and i % failure_every == failure_every - 1:
+            try:
+                _failing_render(config)
+            except InjectedRenderError:
+                pass
+        else:
+            sample = ROUTE_SAMPLES[i % len(ROUTE_SAMPLES)]
+            generate_visual_for_question(sample['id'], sample['data'], config=config)
+
+        if i % sample_every == sample_every - 1:
+            rss_samples.append(RENDER_CONTEXT.stats.rss_bytes)
+            print(f"\r   {i + 1:>7,}/{renders:,} rendus  RSS {rss_samples[-1] / 2**20:7.1f} Mo",
+                  end='', flush=True)
+    print()
+
+    # Pente de RSS après préchauffage (caches de polices, glyphes...)
+    steady = np.array(rss_samples[int(len(rss_samples) * warmup_ratio):], dtype=float)
+    growth = 0.0
+    if len(steady) >= 2:
+        slope = np.polyfit(np.arange(len(steady)), steady, 1)[0]
+        growth = slope * (len(steady) - 1)
+
+    return {
+        'renders': renders,
+        'seconds': time.perf_counter() - start,
+        'failures': RENDER_CONTEXT.stats.failures,
+        'figures_reclaimed': RENDER_CONTEXT.stats.figures_reclaimed,
+        'resets': RENDER_CONTEXT.stats.resets,
+        'live_figures': len(plt.get_fignums()),
+        'rss_start': int(steady[0]) if len(steady) else 0,
+        'rss_end': int(steady[-1]) if len(steady) else 0,
+        'rss_growth': growth
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Test d'endurance mémoire du générateur de visuels")
+    parser.add_argument('--renders', type=int, default=SOAK_DEFAULT_RENDERS,
+                        help="nombre de rendus (~8/s à 20 DPI sur un cœur)")
+    parser.add_argument('--dpi', type=int, default=20)
+    parser.add_argument('--failure-every', type=int, default=50)
+    parser.add_argument('--max-growth-mb', type=float, default=40.0)
+    args = parser.parse_args()
+
+    print(f"🧪 TEST D'ENDURANCE - {args.renders:,} rendus à {args.dpi} DPI")
+    result = run_soak(args.renders, VisualConfig(dpi=args.dpi, png_profile=None),
+                      failure_every=args.failure_every)
+
+    print(f"⏱️  {result['seconds']:.1f}s ({result['renders'] / result['seconds']:.0f} rendus/s)")
+    print(f"💥 Échecs injectés: {result['failures']}, figures récupérées: {result['figures_reclaimed']}, "
+          f"réinitialisations: {result['resets']}")
+    print(f"🧠 RSS {result['rss_start'] / 2**20:.1f} → {result['rss_end'] / 2**20:.1f} Mo "
+          f"(tendance {result['rss_growth'] / 2**20:+.1f} Mo)")
+
+    ok = result['live_figures'] == 0 and result['rss_growth'] <= args.max_growth_mb * 2**20
+    print("✅ Mémoire stable" if ok else f"❌ Fuite détectée ({result['live_figures']} figures vivantes)")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
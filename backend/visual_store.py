@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+🗄️ STOCKAGE DÉDUPLIQUÉ DES VISUELS TESTIQ
+=========================================
+
+Beaucoup de rendus ignorent leurs données d'entrée (transformation 3D,
+suite générique...) : la même image revient sous des dizaines de clés.
+Ce module stocke chaque image une seule fois, adressée par son SHA-256,
+et fait pointer autant de clés de questions que nécessaire sur ce blob.
+
+Un hash perceptuel (dHash 64 bits) permet en plus de signaler les
+quasi-doublons dans le rapport du corpus.
+
+L'index est un instantané (index.json) suivi d'un journal en ajout seul
+(index.log, une ligne JSON par put) : un put coûte une ligne, pas une
+réécriture de tout l'index. Les écritures de plusieurs processus passent
+par un verrou fcntl (fichier lock) ; chaque processus relit la fin du
+journal avant d'écrire et sur un défaut de cache. Le journal est replié
+dans l'instantané au-delà de INDEX_JOURNAL_MAX_ENTRIES lignes.
+
+Usage: python3 visual_store.py <dossier_du_store>
+"""
+
+import base64
+import dataclasses
+import fcntl
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+DATA_URI_PREFIX = "data:image/png;base64,"
+PHASH_NEAR_DUPLICATE_BITS = 6
+# Champs de question_data lus par les générateurs en plus de content / category
+RENDER_FIELDS = ('type', 'visualPattern', 'dsl', 'graph', 'expression', 'fractal')
+INDEX_JOURNAL_MAX_ENTRIES = 5000
+
+def _render_inputs(question_data: Dict, config=None) -> Dict:
+    """
+    Ce qui change le rendu en plus de l'énoncé et de la catégorie : champs
+    structurés de la question (toute la question pour une grille matrix3x3,
+    qui est sa propre spécification DSL) et VisualConfig hors défaut.
+    """
+    if question_data.get('type') == 'matrix3x3':
+        inputs = {field: value for field, value in question_data.items()
+                  if field not in ('id', 'content', 'category')}
+    else:
+        inputs = {field: question_data[field] for field in RENDER_FIELDS if field in question_data}
+    if config is not None and dataclasses.asdict(config) != dataclasses.asdict(type(config)()):
+        inputs['config'] = dataclasses.asdict(config)
+    return inputs
+
+def cache_key(question_id: str, question_data: Dict, theme: str = 'default',
+              panel: str = 'stem', config=None) -> str:
+    """
+    Clé de cache d'une question (même schéma que visual_service.js pour
+    une question sans champ structuré rendue avec la VisualConfig par
+    défaut). Les champs de RENDER_FIELDS et une configuration (DPI, profil
+    PNG...) hors défaut ajoutent une empreinte ; puis les thèmes autres que
+    le thème par défaut sont suffixés, et toujours le panneau : l'ancienne
+    clé sans suffixe désignait la figure complète (réponse comprise) et ne
+    doit plus être servie comme énoncé.
+    """
+    content = question_data.get('content', '')
+    category = question_data.get('category', '')
+    digest = hashlib.md5(f"{question_id}_{content}_{category}".encode()).hexdigest()
+    key = f"visual_{digest}"
+    inputs = _render_inputs(question_data, config)
+    if inputs:
+        fingerprint = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+        key += f"_r{hashlib.md5(fingerprint.encode()).hexdigest()[:12]}"
+    key = key if theme == 'default' else f"{key}_{theme}"
+    return f"{key}_{panel}"
+
+def perceptual_hash(data: bytes) -> int:
+    """dHash 64 bits : gradient horizontal d'une vignette 9×8 en niveaux de gris"""
+    image = Image.open(io.BytesIO(data)).convert('L').resize((9, 8), Image.LANCZOS)
+    pixels = np.asarray(image, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+def hamming_matrix(hashes: List[int]) -> np.ndarray:
+    """Distances de Hamming entre tous les couples de hashes (vectorisé)"""
+    values = np.array(hashes, dtype=np.uint64)
+    xor = values[:, None] ^ values[None, :]
+    return np.unpackbits(xor.view(np.uint8).reshape(len(values), len(values), 8), axis=-1).sum(axis=-1)
+
+@contextmanager
+def file_lock(path: str, shared: bool = False):
+    """Verrou fcntl inter-processus sur un fichier dédié (créé au besoin)"""
+    with open(path, 'a+b') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class VisualStore:
+    """Stockage adressé par contenu : plusieurs clés → un seul blob"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.index_path = os.path.join(root, 'index.json')
+        self.journal_path = os.path.join(root, 'index.log')
+        self.lock_path = os.path.join(root, 'lock')
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+        # index: clé → digest ; blobs: digest → {size, phash}
+        self.index: Dict[str, str] = {}
+        self.blobs: Dict[str, Dict] = {}
+        self._journal_id = b''              # première ligne du journal lu (b'' : pas de journal)
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._lock = threading.RLock()      # état en mémoire partagé par les threads
+        with file_lock(self.lock_path, shared=True):
+            self._reload()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}.png")
+
+    # === INDEX (instantané + journal) ===
+
+    def _reload(self):
+        """Relit l'instantané puis tout le journal"""
+        with self._lock:
+            self.index, self.blobs = {}, {}
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                self.index = saved.get('keys', {})
+                self.blobs = saved.get('blobs', {})
+            self._replay_journal(reloading=True)
+
+    def _replay_journal(self, reloading: bool = False):
+        """
+        Applique les lignes du journal ajoutées depuis la dernière lecture.
+        La première ligne identifie le journal : s'il a été créé ou replié
+        par un autre processus depuis (autre identifiant), tout l'index
+        est relu.
+        """
+        with self._lock:
+            try:
+                f = open(self.journal_path, 'rb')
+            except FileNotFoundError:
+                if reloading:
+                    self._journal_id, self._journal_offset, self._journal_entries = b'', 0, 0
+                return
+            with f:
+                header = f.readline()
+                if reloading:
+                    self._journal_id, self._journal_offset, self._journal_entries = header, len(header), 0
+                elif header != self._journal_id:
+                    self._reload()
+                    return
+                f.seek(self._journal_offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break          # ligne en cours d'écriture (lecteur sans verrou)
+                    self._journal_offset += len(line)
+                    self._journal_entries += 1
+                    entry = json.loads(line)
+                    self.index[entry['key']] = entry['digest']
+                    self.blobs.setdefault(entry['digest'], entry['blob'])
+
+    def _new_journal(self):
+        """Journal vide avec un nouvel identifiant (appelé sous verrou exclusif)"""
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps({'journal': os.urandom(8).hex()}).encode() + b'\n')
+        os.replace(tmp_path, self.journal_path)
+
+    def refresh(self):
+        """Prend en compte les clés ajoutées par d'autres processus"""
+        self._replay_journal()
+
+    def put(self, key: str, data: bytes) -> str:
+        """Enregistre une image sous une clé ; n'écrit le blob que s'il est nouveau"""
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self.blobs.get(digest) or {'size': len(data), 'phash': f"{perceptual_hash(data):016x}"}
+
+        with self._lock, file_lock(self.lock_path):
+            self._replay_journal()
+            path = self._blob_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+
+            if not os.path.exists(self.journal_path):
+                self._new_journal()
+                self._replay_journal(reloading=True)
+            if self.index.get(key) != digest:
+                line = json.dumps({'key': key, 'digest': digest, 'blob': blob}) + '\n'
+                with open(self.journal_path, 'ab') as f:
+                    f.write(line.encode())
+                self._replay_journal()
+            if self._journal_entries >= INDEX_JOURNAL_MAX_ENTRIES:
+                self._save_index()
+        return digest
+
+    def __contains__(self, key: str) -> bool:
+        if key not in self.index:
+            self._replay_journal()
+        return key in self.index
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Retourne les octets de l'image associée à la clé, ou None"""
+        digest = self.index.get(key)
+        if digest is None:
+            self._replay_journal()
+            digest = self.index.get(key)
+        if digest is None:
+            return None
+        try:
+            with open(self._blob_path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put_data_uri(self, key: str, data_uri: str) -> str:
+        """Variante de put() pour les data URI produites par VisualGenerator"""
+        return self.put(key, base64.b64decode(data_uri[len(DATA_URI_PREFIX):]))
+
+    def get_data_uri(self, key: str) -> Optional[str]:
+        data = self.get(key)
+        if data is None:
+            return None
+        return DATA_URI_PREFIX + base64.b64encode(data).decode()
+
+    def _save_index(self):
+        """
+        Replie le journal dans l'instantané (sous verrou exclusif) : nouvel
+        index.json, puis journal vide avec un nouvel identifiant.
+        """
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'keys': self.index, 'blobs': self.blobs}, f)
+        os.replace(tmp_path, self.index_path)
+        self._new_journal()
+        self._replay_journal(reloading=True)
+
+    def compact_index(self):
+        """Replie le journal dans index.json (les lectures restent valides pendant l'opération)"""
+        with self._lock, file_lock(self.lock_path):
+            self._replay_journal()
+            self._save_index()
+
+    def near_duplicates(self, max_distance: int = PHASH_NEAR_DUPLICATE_BITS) -> List[List[str]]:
+        """Groupes de blobs distincts mais perceptuellement proches"""
+        digests = list(self.blobs)
+        if len(digests) < 2:
+            return []
+
+        distances = hamming_matrix([int(self.blobs[d]['phash'], 16) for d in digests])
+        groups, seen = [], set()
+        for i, digest in enumerate(digests):
+            if digest in seen:
+                continue
+            close = [digests[j] for j in np.flatnonzero(distances[i] <= max_distance) if j != i]
+            if close:
+                group = [digest] + [d for d in close if d not in seen]
+                seen.update(group)
+                groups.append(group)
+
+        return groups
+
+    def report(self) -> Dict:
+        """Rapport du corpus : clés, blobs, octets économisés, quasi-doublons"""
+        logical_bytes = sum(self.blobs[d]['size'] for d in self.index.values())
+        stored_bytes = sum(blob['size'] for blob in self.blobs.values())
+
+        keys_per_blob: Dict[str, int] = {}
+        for digest in self.index.values():
+            keys_per_blob[digest] = keys_per_blob.get(digest, 0) + 1
+
+        return {
+            'keys': len(self.index),
+            'blobs': len(self.blobs),
+            'logical_bytes': logical_bytes,
+            'stored_bytes': stored_bytes,
+            'saved_bytes': logical_bytes - stored_bytes,
+            'shared_blobs': {d: n for d, n in keys_per_blob.items() if n > 1},
+            'near_duplicates': self.near_duplicates()
+        }
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python3 visual_store.py <dossier_du_store>")
+        sys.exit(1)
+
+    report = VisualStore(sys.argv[1]).report()
+
+    print("🗄️ RAPPORT DE DÉDUPLICATION DES VISUELS")
+    print("=" * 40)
+    print(f"Clés: {report['keys']} → Blobs: {report['blobs']}")
+    print(f"Octets logiques: {report['logical_bytes']:,}")
+    print(f"Octets stockés:  {report['stored_bytes']:,}")
+    print(f"💾 Économisés:   {report['saved_bytes']:,}")
+
+    for digest, count in sorted(report['shared_blobs'].items(), key=lambda x: x[1], reverse=True):
+        print(f"   {digest[:12]}… partagé par {count} clés")
+
+    if report['near_duplicates']:
+        print(f"\n🔍 Quasi-doublons (≤ {PHASH_NEAR_DUPLICATE_BITS} bits de dHash):")
+        for group in report['near_duplicates']:
+            print(f"   {', '.join(d[:12] for d in group)}")
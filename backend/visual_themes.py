@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+🎨 THÈMES DES VISUELS TESTIQ
+===========================
+
+Un thème regroupe :
+- des rcParams matplotlib (fond, texte, grille, police...)
+- les couleurs de VisualConfig (fond, accent, succès, erreur, encre...)
+
+Chaque thème est compilé une seule fois : style de base lu depuis la
+bibliothèque matplotlib, palette seaborn résolue, rcParams validés, polices
+résolues, puis réduit à sa différence avec le thème par défaut. Appliquer
+un thème à un rendu revient à poser puis restaurer ces quelques clés de
+rcParams : aucun état global modifié durablement, aucun fichier de style
+relu par requête.
+"""
+
+import dataclasses
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict
+
+import matplotlib
+import matplotlib.style
+import seaborn as sns
+from cycler import cycler
+from matplotlib import font_manager
+
+BASE_STYLE = 'seaborn-v0_8-darkgrid'
+BASE_PALETTE = 'husl'
+DEFAULT_THEME = 'default'
+
+# Paramètres de session, jamais portés par un thème (comme plt.style.use)
+_SESSION_KEYS = {
+    'backend', 'backend_fallback', 'interactive', 'toolbar', 'timezone', 'date.epoch',
+    'figure.max_open_warning', 'figure.raise_window', 'savefig.directory',
+    'tk.window_focus', 'docstring.hardcopy', 'webagg.port', 'webagg.address',
+    'webagg.port_retries', 'webagg.open_in_browser'
+}
+
+THEME_SPECS: Dict[str, Dict] = {
+    'default': {
+        'palette': BASE_PALETTE,
+        'rc': {},
+        'colors': {}
+    },
+    'dark': {
+        'palette': BASE_PALETTE,
+        'rc': {
+            'figure.facecolor': '#1e1e1e', 'axes.facecolor': '#2b2b2b',
+            'axes.edgecolor': '#555555', 'axes.labelcolor': '#e0e0e0',
+            'text.color': '#e0e0e0', 'xtick.color': '#cccccc', 'ytick.color': '#cccccc',
+            'grid.color': '#3c3c3c', 'legend.facecolor': '#2b2b2b', 'legend.edgecolor': '#555555'
+        },
+        'colors': {
+            'bg_color': '#1e1e1e', 'accent_color': '#4da3ff', 'success_color': '#4cd964',
+            'error_color': '#ff6b6b', 'warning_color': '#ffd166',
+            'ink_color': '#dddddd', 'muted_color': '#999999'
+        }
+    },
+    'high_contrast': {
+        'palette': 'bright',
+        'rc': {
+            'figure.facecolor': '#ffffff', 'axes.facecolor': '#ffffff',
+            'axes.edgecolor': '#000000', 'axes.linewidth': 2.0, 'axes.labelcolor': '#000000',
+            'text.color': '#000000', 'xtick.color': '#000000', 'ytick.color': '#000000',
+            'grid.color': '#000000', 'grid.alpha': 0.4, 'lines.linewidth': 3.0,
+            'font.weight': 'bold', 'axes.labelweight': 'bold', 'axes.titleweight': 'bold'
+        },
+        'colors': {
+            'bg_color': '#ffffff', 'accent_color': '#0033cc', 'success_color': '#006600',
+            'error_color': '#cc0000', 'warning_color': '#994d00',
+            'ink_color': '#000000', 'muted_color': '#333333'
+        }
+    }
+}
+
+@dataclass(frozen=True)
+class VisualTheme:
+    """Thème compilé : rcParams (différence avec le thème par défaut) et couleurs"""
+    name: str
+    rc: Dict
+    colors: Dict
+
+    @contextmanager
+    def context(self):
+        """
+        rcParams du thème pour la durée du bloc, restaurés ensuite. Seules
+        les clés du thème sont sauvegardées (rc_context copie tout rcParams).
+        """
+        if not self.rc:
+            yield self
+            return
+        rc = matplotlib.rcParams
+        saved = {key: rc[key] for key in self.rc}
+        rc.update(self.rc)
+        try:
+            yield self
+        finally:
+            rc.update(saved)
+
+    def configure(self, config):
+        """Copie de la VisualConfig avec les couleurs du thème"""
+        return dataclasses.replace(config, **self.colors) if self.colors else config
+
+def _full_rc(spec: Dict) -> Dict:
+    """rcParams complets et validés : style de base + palette + surcharges"""
+    # Point de départ : rcParams courants à la compilation (matplotlibrc compris)
+    rc = matplotlib.RcParams(matplotlib.rcParams)
+    rc.update(matplotlib.style.library[BASE_STYLE])
+    rc['axes.prop_cycle'] = cycler(color=sns.color_palette(spec['palette']).as_hex())
+    rc.update(spec['rc'])
+
+    # Résolution des polices maintenant plutôt qu'au premier rendu
+    font_manager.findfont(font_manager.FontProperties(family=rc['font.family'],
+                                                      weight=rc['font.weight']))
+    return {key: value for key, value in rc.items() if key not in _SESSION_KEYS}
+
+@lru_cache(maxsize=None)
+def _base_rc() -> Dict:
+    return _full_rc(THEME_SPECS[DEFAULT_THEME])
+
+@lru_cache(maxsize=None)
+def get_theme(name: str = DEFAULT_THEME) -> VisualTheme:
+    """Thème compilé (une seule fois par processus)"""
+    if name not in THEME_SPECS:
+        raise ValueError(f"Thème inconnu: {name} (disponibles: {', '.join(THEME_SPECS)})")
+    spec = THEME_SPECS[name]
+    base = _base_rc()
+    rc = {key: value for key, value in _full_rc(spec).items() if base.get(key) != value}
+    return VisualTheme(name, rc, dict(spec['colors']))
+
+def apply_base_theme():
+    """État global de référence (thème par défaut), sans relire de fichier de style"""
+    matplotlib.rcParams.update(_base_rc())
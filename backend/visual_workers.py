@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+🏭 POOL DE PROCESSUS DE RENDU TESTIQ
+===================================
+
+Répartit generate_visual_for_question sur plusieurs processus sans faire
+transiter les PNG par pickle : chaque tâche reçoit un segment de mémoire
+partagée (multiprocessing.shared_memory) tiré d'un pool recyclé, le
+worker y écrit les octets PNG et ne renvoie que (nom du segment, longueur).
+
+Le parent obtient un SharedPng dont .view est un memoryview sur le
+segment : il peut être passé tel quel à file.write / socket.sendall, puis
+release() rend le segment au pool. Le coût IPC par tâche ne dépend plus
+de la taille de l'image.
+
+Une échéance (deadline, en secondes) peut accompagner chaque tâche : elle
+court dès submit(), attente dans la file comprise, et le worker dégrade
+son rendu pour la tenir (voir visual_deadlines.py). SharedPng.outcome
+indique le profil servi.
+
+Usage: python3 visual_workers.py [--workers 4] [--rounds 20]   (mesure du transfert)
+"""
+
+import argparse
+import os
+import pickle
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import SimpleQueue, shared_memory
+from typing import Dict, List, Optional, Tuple
+
+from visual_deadlines import FULL, Deadline
+from visual_generator import (RENDER_CONTEXT, STEM_PANEL, VisualConfig, VisualGenerator,
+                              _render_within_deadline)
+from visual_profiling import RENDER_PROFILER
+from visual_store import cache_key
+from visual_themes import DEFAULT_THEME, get_theme
+
+DEFAULT_SEGMENT_SIZE = 1 << 20
+
+class SegmentPool:
+    """
+    Segments de mémoire partagée appartenant au parent, réutilisés d'une
+    tâche à l'autre. Quand une image dépasse la taille des segments, le
+    segment créé par le worker est adopté, la taille des nouveaux segments
+    passe à la puissance de deux supérieure et le segment trop petit est
+    supprimé : le pool se stabilise après quelques grandes images.
+    """
+
+    def __init__(self, segment_size: int = DEFAULT_SEGMENT_SIZE):
+        self.segment_size = segment_size
+        self._segments: Dict[str, shared_memory.SharedMemory] = {}
+        self._free: List[str] = []
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self) -> shared_memory.SharedMemory:
+        with self._lock:
+            if self._free:
+                self.reused += 1
+                return self._segments[self._free.pop()]
+            segment = shared_memory.SharedMemory(create=True, size=self.segment_size)
+            self._segments[segment.name] = segment
+            self.created += 1
+            return segment
+
+    def adopt(self, name: str) -> shared_memory.SharedMemory:
+        """Prend en charge un segment créé par un worker (il sera libéré par close())"""
+        segment = shared_memory.SharedMemory(name=name)
+        with self._lock:
+            self._segments[name] = segment
+            self.created += 1
+        return segment
+
+    def retire(self, name: str, needed: int):
+        """Supprime un segment trop petit et agrandit les prochains"""
+        with self._lock:
+            self.segment_size = max(self.segment_size, 1 << (needed - 1).bit_length())
+            segment = self._segments.pop(name, None)
+        if segment is not None:
+            segment.close()
+            segment.unlink()
+
+    def release(self, name: str):
+        with self._lock:
+            if name in self._segments and name not in self._free:
+                self._free.append(name)
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+                segment.unlink()
+            self._segments.clear()
+            self._free.clear()
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+class SharedPng:
+    """PNG rendu dans un segment partagé ; lecture sans copie via .view"""
+
+    def __init__(self, pool: SegmentPool, segment: shared_memory.SharedMemory, length: int,
+                 outcome: str = FULL):
+        self._pool = pool
+        self._segment = segment
+        self.length = length
+        self.outcome = outcome          # FULL, DEGRADED ou PLACEHOLDER
+        self.view: Optional[memoryview] = segment.buf[:length]
+
+    def tobytes(self) -> bytes:
+        """Copie explicite, pour les consommateurs qui gardent les octets"""
+        return bytes(self.view)
+
+    def release(self):
+        """Rend le segment au pool ; .view n'est plus utilisable ensuite"""
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+            self._pool.release(self._segment.name)
+
+    def __enter__(self) -> 'SharedPng':
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def __len__(self) -> int:
+        return self.length
+
+# === CÔTÉ WORKER ===
+
+class _RawPngGenerator(VisualGenerator):
+    """
+    Les méthodes generate_* finissent toutes par _save_to_base64 : dans le
+    worker, on garde les octets PNG bruts (pas de base64)
+    """
+
+    def _png_to_visual(self, png_data: bytes) -> bytes:
+        return png_data
+
+_worker_config: Optional[VisualConfig] = None
+_worker_generators: Dict[str, VisualGenerator] = {}
+
+def _init_worker(config: Optional[VisualConfig], pids: Optional[SimpleQueue] = None):
+    global _worker_config
+    _worker_config = config or VisualConfig()
+    if pids is not None:
+        pids.put(os.getpid())
+
+def _generator_for(theme: str) -> VisualGenerator:
+    """Un générateur par thème et par worker"""
+    generator = _worker_generators.get(theme)
+    if generator is None:
+        generator = _RawPngGenerator(get_theme(theme).configure(_worker_config))
+        _worker_generators[theme] = generator
+    return generator
+
+def _write_to_segment(data: bytes, segment_name: str) -> Tuple[str, int]:
+    """
+    Copie data dans le segment fourni ; s'il est trop petit, crée un
+    segment à la bonne taille que le parent adoptera. Le segment est mappé
+    le temps de la tâche seulement (~50 µs) : le parent peut le retirer
+    ensuite sans que les workers gardent un mapping sur un segment mort.
+    """
+    segment = shared_memory.SharedMemory(name=segment_name)
+    try:
+        if len(data) <= segment.size:
+            segment.buf[:len(data)] = data
+            return segment_name, len(data)
+    finally:
+        segment.close()
+
+    oversized = shared_memory.SharedMemory(create=True, size=len(data))
+    oversized.buf[:len(data)] = data
+    oversized.close()
+    return oversized.name, len(data)
+
+def _render_job(question_data: Dict, theme: str, panel: str, expires_at: Optional[float],
+                segment_name: str) -> Tuple[str, int, str]:
+    """Rendu dans le worker ; seuls (nom, longueur, profil servi) repassent par le pipe"""
+    question_id = str(question_data.get('id', 'worker'))
+    deadline = None if expires_at is None else Deadline(expires_at)
+    with RENDER_PROFILER.profile(question_id), RENDER_CONTEXT.render(), get_theme(theme).context():
+        key = cache_key(question_id, question_data, theme, panel, _worker_config)
+        data, outcome = _render_within_deadline(_generator_for(theme), question_data, panel, deadline, key)
+    if not data:
+        return segment_name, 0, outcome
+    return (*_write_to_segment(data, segment_name), outcome)
+
+def _payload_job(size: int, segment_name: str) -> Tuple[str, int, str]:
+    return (*_write_to_segment(os.urandom(size), segment_name), FULL)
+
+def _pickled_payload_job(size: int) -> bytes:
+    return os.urandom(size)
+
+# === CÔTÉ PARENT ===
+
+class RenderWorkerPool:
+    """
+    Pool de processus de rendu. submit() retourne un Future[SharedPng] ;
+    le SharedPng doit être libéré (release() ou bloc with) après usage.
+    """
+
+    def __init__(self, workers: Optional[int] = None, config: Optional[VisualConfig] = None,
+                 segment_size: int = DEFAULT_SEGMENT_SIZE):
+        self.segments = SegmentPool(segment_size)
+        self._started_pids = SimpleQueue()     # chaque worker y annonce son PID au démarrage
+        self._pids: List[int] = []
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                             initargs=(config, self._started_pids))
+        self.jobs = 0
+        self.oversized = 0
+        self.outcomes: Counter = Counter()
+
+    def submit(self, question_data: Dict, theme: str = DEFAULT_THEME, panel: str = STEM_PANEL,
+               deadline: Optional[float] = None) -> 'Future[SharedPng]':
+        expires_at = None if deadline is None else Deadline.after(deadline).expires_at
+        return self._submit(_render_job, question_data, theme, panel, expires_at)
+
+    def render(self, question_data: Dict, theme: str = DEFAULT_THEME, panel: str = STEM_PANEL,
+               deadline: Optional[float] = None) -> SharedPng:
+        return self.submit(question_data, theme, panel, deadline).result()
+
+    def _submit(self, job, *arguments) -> 'Future[SharedPng]':
+        segment = self.segments.acquire()
+        result: 'Future[SharedPng]' = Future()
+        self.jobs += 1
+
+        def done(future: Future):
+            try:
+                name, length, outcome = future.result()
+            except BaseException as error:
+                self.segments.release(segment.name)
+                result.set_exception(error)
+                return
+            target = segment
+            if name != segment.name:
+                # Image plus grande que le segment : le worker en a créé un autre
+                self.oversized += 1
+                self.segments.retire(segment.name, length)
+                target = self.segments.adopt(name)
+            self.outcomes[outcome] += 1
+            result.set_result(SharedPng(self.segments, target, length, outcome))
+
+        self._executor.submit(job, *arguments, segment.name).add_done_callback(done)
+        return result
+
+    def worker_pids(self) -> List[int]:
+        """PID des workers démarrés (ils le sont à la demande, au fil des tâches)"""
+        while not self._started_pids.empty():
+            self._pids.append(self._started_pids.get())
+        return list(self._pids)
+
+    def stats(self) -> Dict:
+        return {
+            'jobs': self.jobs,
+            'segments': len(self.segments),
+            'segments_created': self.segments.created,
+            'segments_reused': self.segments.reused,
+            'oversized': self.oversized,
+            'outcomes': dict(self.outcomes)
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.segments.close()
+
+    def __enter__(self) -> 'RenderWorkerPool':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def benchmark_transfer(workers: int, sizes: List[int], rounds: int = 20) -> Dict[int, Dict[str, float]]:
+    """
+    Temps moyen par tâche (ms) pour rapatrier `size` octets produits par un
+    worker : pickle via le pipe, ou segment partagé lu par memoryview.
+    """
+    results = {}
+    with RenderWorkerPool(workers, segment_size=max(sizes)) as pool, \
+            ProcessPoolExecutor(max_workers=workers) as plain:
+        for size in sizes:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                data = plain.submit(_pickled_payload_job, size).result()
+                checksum = data[-1]
+            pickled = (time.perf_counter() - start) / rounds
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                with pool._submit(_payload_job, size).result() as png:
+                    checksum = png.view[-1]
+            shared = (time.perf_counter() - start) / rounds
+
+            results[size] = {'pickle_ms': round(pickled * 1000, 2),
+                             'shared_ms': round(shared * 1000, 2),
+                             'pickle_bytes': len(pickle.dumps(data))}
+        results['pool'] = pool.stats()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transfert worker → parent : pickle vs mémoire partagée")
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    sizes = [64 << 10, 512 << 10, 4 << 20, 16 << 20]
+    print(f"🏭 Transfert de {len(sizes)} tailles, {args.rounds} tâches chacune, {args.workers} workers")
+    results = benchmark_transfer(args.workers, sizes, args.rounds)
+    for size in sizes:
+        result = results[size]
+        print(f"   {size >> 10:>6,} Ko  pickle {result['pickle_ms']:7.2f} ms   "
+              f"mémoire partagée {result['shared_ms']:7.2f} ms")
+    print(f"📦 Segments: {results['pool']}")
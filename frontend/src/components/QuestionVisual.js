@@ -7,9 +7,12 @@ import { api } from '../lib/api';
  * 
  * Affiche les visualisations générées par le système Python backend
  * pour les questions nécessitant des supports visuels (matrices, diagrammes de Venn, etc.)
+ * 
+ * panel : 'stem' (énoncé seul, pendant le test) ou 'explanation' / 'solution'
+ * (revue) — la solution n'est jamais envoyée tant qu'elle n'est pas demandée.
  */
 
-function QuestionVisual({ questionId, questionContent, category, className = "" }) {
+function QuestionVisual({ questionId, questionContent, category, panel = "stem", className = "" }) {
   const [visual, setVisual] = useState(null);
   const [loading, setLoading] = useState(true);
   const [hasVisual, setHasVisual] = useState(false);
@@ -26,7 +29,8 @@ function QuestionVisual({ questionId, questionContent, category, className = ""
         const response = await api.post('/api/visual', {
           questionId,
           questionContent,
-          category
+          category,
+          panel
         });
 
         if (response.data.success && response.data.hasVisual) {
@@ -50,7 +54,7 @@ function QuestionVisual({ questionId, questionContent, category, className = ""
     if (questionId && questionContent) {
       loadVisual();
     }
-  }, [questionId, questionContent, category]);
+  }, [questionId, questionContent, category, panel]);
 
   // Pas de rendu si pas de visuel
   if (!hasVisual && !loading) {
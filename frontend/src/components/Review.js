@@ -485,6 +485,7 @@ function Review({ user }) {
                 questionId={`Q${currentAnswer?.questionIndex || (currentQuestion + 1)}`}
                 questionContent={currentAnswer?.question}
                 category={currentAnswer?.category}
+                panel="explanation"
               />
             )}
             